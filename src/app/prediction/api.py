@@ -2,27 +2,41 @@
 
 import os
 import numpy as np
-# pandas is not strictly needed if we construct the SQL string directly,
-# but can be useful if you prefer to build a dict/series first.
-# For this version, we'll build the SQL string directly.
+# Requests are encoded into numpy feature rows by FeatureSchema (feature_schema.py);
+# the ML.PREDICT query text is fixed and values are bound as query parameters.
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
+import requests
 
 # --- Only if calling BQML directly from Flask ---
 from google.cloud import bigquery
 # --- ---
 
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from climatology import DEFAULT_CLIMATOLOGY_PATH, ClimatologyCube
+from feature_encoder import FEATURE_ENCODER_FILE, FeatureEncoder, category_token
+from feature_schema import FeatureSchema
+from gridpoint_lookup import GridpointLookup
+from inference import create_backend
+import noaa_client
+from prediction_cache import KMH_PER_MPH, create_prediction_cache
+from rankings import RankingsRefresher
+from risk_surface import RiskSurfaceRefresher
+from single_flight import SingleFlight
+from weather_cache import GridpointCache
+
 app = Flask(__name__)
 CORS(app)
 
 # --- Configuration for BigQuery ML ---
+# THIS IS THE MODEL YOU TRAINED WITH THE EXPANDED SQL
+MODEL_ID = "custom-sylph-460317-i5.power_outages.outage_model_v2"
+
 # Ensure your Flask environment has credentials (e.g., GOOGLE_APPLICATION_CREDENTIALS env var)
 # or that the service running Flask (e.g., Cloud Run) has appropriate IAM permissions.
 try:
     bq_client = bigquery.Client()
-    # THIS IS THE MODEL YOU TRAINED WITH THE EXPANDED SQL
-    MODEL_ID = "custom-sylph-460317-i5.power_outages.outage_model_v2" 
 except Exception as e:
     print(f"************************************************************")
     print(f"WARNING: Failed to initialize BigQuery client: {e}")
@@ -32,6 +46,7 @@ except Exception as e:
     bq_client = None
 # --- ---
 
+
 # This list MUST match all one-hot encoded county columns used in training.
 # Extracted from your bigquery_training_data.csv header.
 ALL_COUNTIES = [
@@ -47,6 +62,56 @@ ALL_COUNTIES = [
     'williamson', 'wilson'
 ]
 
+# Weather features sent to the model: (model feature, request key, fallback request key, default)
+# Default values should ideally come from your training data's statistics (mean/median/mode)
+# or be otherwise sensible if a feature is not provided by the frontend.
+WEATHER_FEATURE_SPEC = [
+    ("weather_apparentTemperature", "apparentTemperature", "temperature", 20.5),
+    ("weather_dewpoint", "dewpoint", None, 17.7),
+    ("weather_heatIndex", "heatIndex", "temperature", 22.2),
+    ("weather_iceAccumulation", "iceAccumulation", None, 0.0),
+    ("weather_mixingHeight", "mixingHeight", None, 542.8),
+    ("weather_probabilityOfPrecipitation", "precipitationChance", None, 18.0), # Mapped from precipitationChance
+    ("weather_quantitativePrecipitation", "quantitativePrecipitation", None, 0.0),
+    ("weather_relativeHumidity", "relativeHumidity", None, 74.0),
+    ("weather_skyCover", "skyCover", None, 50.0),
+    ("weather_snowfallAmount", "snowfallAmount", None, 0.0),
+    ("weather_temperature", "temperature", None, 20.5),
+    ("weather_transportWindSpeed", "transportWindSpeed", "windSpeed", 16.6),
+    ("weather_windDirection", "windDirection", None, 230.0),
+    ("weather_windGust", "windGust", None, 25.9),
+    ("weather_windSpeed", "windSpeed", None, 9.26),
+    ("weather_visibility", "visibility", None, 10000.0), # Default to ~6 miles if not 0
+]
+
+# Request bodies and /api/weather responses use the frontend's units (temperatures in °F, wind
+# speeds in mph); model features are in NOAA gridpoint units (°C, km/h), as in training.
+# Records are converted to model units just before encoding.
+FAHRENHEIT_KEYS = ("temperature", "dewpoint", "apparentTemperature", "heatIndex")
+MPH_KEYS = ("windSpeed", "windGust", "transportWindSpeed")
+DISPLAY_UNITS = {**{key: "degF" for key in FAHRENHEIT_KEYS}, **{key: "mph" for key in MPH_KEYS}}
+
+def to_display_units(key, value):
+    """Convert a request-key value from NOAA gridpoint units to the frontend's units"""
+    if key in FAHRENHEIT_KEYS:
+        return value * 9 / 5 + 32
+    if key in MPH_KEYS:
+        return value / KMH_PER_MPH
+    return value
+
+def to_model_units(record):
+    """Copy of a request record with temperatures and wind speeds in NOAA gridpoint units"""
+    record = dict(record)
+    for key in FAHRENHEIT_KEYS + MPH_KEYS:
+        try:
+            value = float(record[key])
+        except (KeyError, TypeError, ValueError):
+            continue
+        record[key] = (value - 32) * 5 / 9 if key in FAHRENHEIT_KEYS else value * KMH_PER_MPH
+    return record
+
+MAX_BATCH_SIZE = 2000
+
 # Helper to determine season from month
 def get_season(month_num):
     if month_num in [3, 4, 5]:
@@ -54,178 +119,390 @@ def get_season(month_num):
     elif month_num in [6, 7, 8]:
         return "summer"
     elif month_num in [9, 10, 11]:
-        return "autumn" # Your training data CSV implies autumn/winter by spring=0, summer=0
+        return "fall"  # Same names as data_loader.process_merged_data
     else:  # 12, 1, 2
         return "winter"
 
+# County x day-of-year weather medians built by training (climatology.py). Memory-mapped, so
+# every worker shares one copy; missing weather inputs take the county's seasonal median and
+# fall back to the static defaults above where the cube has no value.
+try:
+    climatology_cube = ClimatologyCube.load(DEFAULT_CLIMATOLOGY_PATH)
+    print(f"Loaded climatology cube from {DEFAULT_CLIMATOLOGY_PATH}: {climatology_cube.stats_summary()}")
+except (OSError, ValueError, KeyError) as e:
+    print(f"No climatology cube at {DEFAULT_CLIMATOLOGY_PATH} ({e}); using static weather defaults")
+    climatology_cube = None
+
+# --- Prediction backend selection ---
+# PREDICTION_BACKEND=bigquery (default) runs ML.PREDICT per request.
+# PREDICTION_BACKEND=local loads the forest saved by combined_model.save_model once at startup
+# and scores requests in-process.
+# PREDICTION_OFFLINE=1 swaps in local stand-ins for BigQuery / the saved model (for testing without GCP).
+PREDICTION_BACKEND = os.environ.get("PREDICTION_BACKEND", "bigquery").lower()
+LOCAL_MODEL_PATH = os.environ.get("LOCAL_MODEL_PATH", "models/outage_model_v2")
+PREDICTION_OFFLINE = os.environ.get("PREDICTION_OFFLINE", "0") == "1"
+# Offline only: make the BigQuery stand-in fail / stall to exercise the circuit breaker
+PREDICTION_FAULT_ERROR_RATE = float(os.environ.get("PREDICTION_FAULT_ERROR_RATE", 0.0))
+PREDICTION_FAULT_LATENCY_SECONDS = float(os.environ.get("PREDICTION_FAULT_LATENCY_SECONDS", 0.0))
+
+# Feature encoder fitted by training and saved with the model version (feature_encoder.py).
+# When present, the county/season one-hot columns and any other trained columns come from it.
+FEATURE_ENCODER_PATH = os.environ.get("FEATURE_ENCODER_PATH", os.path.join(LOCAL_MODEL_PATH, FEATURE_ENCODER_FILE))
+try:
+    feature_encoder = FeatureEncoder.load(FEATURE_ENCODER_PATH)
+    print(f"Loaded feature encoder from {FEATURE_ENCODER_PATH}: {len(feature_encoder)} columns")
+except (OSError, ValueError, KeyError) as e:
+    print(f"No feature encoder at {FEATURE_ENCODER_PATH} ({e}); using the built-in feature layout")
+    feature_encoder = None
+
+# Compiled once at import: fixed column index per feature, default row prefilled.
+if feature_encoder is not None:
+    FEATURE_SCHEMA = FeatureSchema.from_encoder(
+        feature_encoder,
+        WEATHER_FEATURE_SPEC,
+        season_of_month=get_season,
+        climatology=climatology_cube,
+    )
+else:
+    # Without an encoder, assume autumn/winter is the base case since only spring/summer are
+    # explicit in the BigQuery training data.
+    FEATURE_SCHEMA = FeatureSchema(
+        WEATHER_FEATURE_SPEC,
+        ALL_COUNTIES,
+        seasons=["spring", "summer"],
+        season_of_month=get_season,
+        climatology=climatology_cube,
+    )
+
+try:
+    prediction_backend = create_backend(
+        PREDICTION_BACKEND,
+        FEATURE_SCHEMA,
+        bq_client=bq_client,
+        model_id=MODEL_ID,
+        model_path=LOCAL_MODEL_PATH,
+        offline=PREDICTION_OFFLINE,
+        fault_error_rate=PREDICTION_FAULT_ERROR_RATE,
+        fault_latency_seconds=PREDICTION_FAULT_LATENCY_SECONDS,
+    )
+except Exception as e:
+    print(f"WARNING: Failed to initialize '{PREDICTION_BACKEND}' prediction backend: {e}")
+    prediction_backend = None
+# --- ---
+
+# --- Prediction cache ---
+# Model outputs are cached by quantized feature row (see prediction_cache.py) for one weather
+# refresh interval. PREDICTION_CACHE_URL=redis://... shares entries across gunicorn workers.
+WEATHER_REFRESH_SECONDS = int(os.environ.get("WEATHER_REFRESH_SECONDS", 600))
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 10000))
+
+prediction_cache, feature_quantizer = create_prediction_cache(
+    FEATURE_SCHEMA.names,
+    max_entries=PREDICTION_CACHE_SIZE,
+    ttl_seconds=WEATHER_REFRESH_SECONDS,
+    shared_url=os.environ.get("PREDICTION_CACHE_URL"),
+)
+
+# Concurrent requests for the same cache key share one in-flight backend call
+prediction_flight = SingleFlight()
+# --- ---
+
+# --- Circuit breaker ---
+# Backend calls get a deadline. When the rolling error rate or p95 latency crosses its threshold,
+# requests skip the backend and use the simple scorer until a background probe succeeds.
+PREDICTION_DEADLINE_SECONDS = float(os.environ.get("PREDICTION_DEADLINE_SECONDS", 2.0))
+
+prediction_breaker = CircuitBreaker(
+    probe=lambda timeout: prediction_backend.predict_batch(FEATURE_SCHEMA.default_row[None, :], timeout=timeout),
+    deadline_seconds=PREDICTION_DEADLINE_SECONDS,
+    window_size=int(os.environ.get("BREAKER_WINDOW", 20)),
+    min_calls=int(os.environ.get("BREAKER_MIN_CALLS", 5)),
+    error_rate_threshold=float(os.environ.get("BREAKER_ERROR_RATE", 0.5)),
+    latency_threshold_seconds=float(os.environ.get("BREAKER_LATENCY_SECONDS", 1.5)),
+    probe_interval_seconds=float(os.environ.get("BREAKER_PROBE_SECONDS", 15.0)),
+    max_workers=int(os.environ.get("BREAKER_MAX_IN_FLIGHT", 8)),
+)
+# --- ---
+
+# --- NOAA weather ---
+# Gridpoint forecasts are cached per county and revalidated in the background every
+# WEATHER_REFRESH_SECONDS (If-None-Match / If-Modified-Since, so unchanged forecasts cost a 304).
+# County centroids come from the same county boundaries CSV used for training.
+# NOAA_API_URL can point at noaa_stub_server.py for local testing.
+COUNTY_COORDINATES_PATH = os.environ.get("COUNTY_COORDINATES_PATH", "data/county_coordinates_tn.csv")
+NOAA_API_URL = os.environ.get("NOAA_API_URL", noaa_client.NOAA_API_URL)
+
+try:
+    COUNTY_COORDINATES = noaa_client.load_county_coordinates(COUNTY_COORDINATES_PATH)
+except (OSError, KeyError, ValueError) as e:
+    print(f"WARNING: County coordinates not loaded from '{COUNTY_COORDINATES_PATH}': {e}")
+    COUNTY_COORDINATES = {}
+
+# Counties scored by the rankings and the risk surface. With a trained encoder these are the
+# counties the model was trained on (named as in the coordinates table, so their gridpoints
+# resolve); otherwise the built-in list.
+if feature_encoder is not None:
+    county_name_by_token = {category_token(name): name for name in COUNTY_COORDINATES}
+    SCORED_COUNTIES = [county_name_by_token.get(token, token.replace("_", " ")) for token in FEATURE_SCHEMA.counties]
+else:
+    SCORED_COUNTIES = ALL_COUNTIES
+
+# NOAA property behind each model weather feature ("weather_windGust" -> "windGust")
+NOAA_PROPERTY_BY_FEATURE = {feature: feature[len("weather_"):] for feature, _, _, _ in WEATHER_FEATURE_SPEC}
+
+# Shared token bucket for all api.weather.gov requests from this process
+NOAA_REQUESTS_PER_SECOND = float(os.environ.get("NOAA_REQUESTS_PER_SECOND", 5))
+
+# Point -> gridpoint mappings persisted across restarts (GRIDPOINT_LOOKUP_PATH), so cold
+# fetches go straight to /gridpoints
+gridpoint_lookup = GridpointLookup()
+
+gridpoint_cache = GridpointCache(
+    COUNTY_COORDINATES,
+    WEATHER_REFRESH_SECONDS,
+    base_url=NOAA_API_URL,
+    requests_per_second=NOAA_REQUESTS_PER_SECOND,
+    lookup=gridpoint_lookup,
+)
+gridpoint_cache.start()
+# --- ---
+
+def score_feature_rows(X):
+    """
+    Score feature rows through the prediction cache.
+
+    Rows whose quantized key is cached are answered locally; the remaining distinct keys
+    are scored with one backend call and written back to the cache. Keys already being
+    scored by a concurrent request are shared with that call (single-flight). The backend
+    call runs under prediction_breaker, which raises CircuitOpenError while it is open.
+
+    Args:
+        X (np.ndarray): (rows, features) matrix in FEATURE_SCHEMA order
+
+    Returns:
+        tuple: (is_outage_likely array, probability array), in row order
+    """
+    X = np.atleast_2d(X)
+    keys = feature_quantizer.keys(X)
+    is_outage_likely = np.zeros(len(keys), dtype=bool)
+    probabilities = np.zeros(len(keys), dtype=np.float64)
+
+    missing = {}  # key -> row indices that need it
+    for i, key in enumerate(keys):
+        cached = prediction_cache.get(key) if key not in missing else None
+        if cached is None:
+            missing.setdefault(key, []).append(i)
+        else:
+            is_outage_likely[i], probabilities[i] = cached
+
+    if missing:
+        def compute(keys):
+            first_rows = [missing[key][0] for key in keys]
+            miss_likely, miss_probs = prediction_breaker.call(
+                lambda timeout: prediction_backend.predict_batch(X[first_rows], timeout=timeout)
+            )
+            values = [(bool(likely), float(probability)) for likely, probability in zip(miss_likely, miss_probs)]
+            for key, value in zip(keys, values):
+                prediction_cache.set(key, value)
+            return values
+
+        # Keys another request is already scoring are waited on instead of re-scored
+        results = prediction_flight.do_many(
+            list(missing), compute,
+            label_of=lambda key: FEATURE_SCHEMA.row_label(X[missing[key][0]])
+        )
+        for key, rows in missing.items():
+            is_outage_likely[rows], probabilities[rows] = results[key]
+
+    return is_outage_likely, probabilities
+
+def score_with_fallback(encode, fallback_probabilities):
+    """
+    Score a feature matrix with one backend call, falling back to the simple scorer
+
+    Args:
+        encode (callable): () -> feature matrix in FEATURE_SCHEMA order
+        fallback_probabilities (callable): () -> simple-scorer probability per row
+
+    Returns:
+        tuple: (is_outage_likely array, probability array, prediction_source, error_message or None)
+    """
+    if prediction_backend:
+        try:
+            is_outage_likely, probabilities = score_feature_rows(encode())
+            return is_outage_likely, probabilities, prediction_backend.name, None
+        except CircuitOpenError:
+            # Backend is known to be unhealthy; answer from the simple scorer without waiting on it
+            error_message = f"{prediction_backend.name} unavailable (circuit open)"
+            prediction_source = "mock_circuit_open"
+        except Exception as e:
+            print(f"Error executing {prediction_backend.name} batch prediction: {str(e)}")
+            error_message = f"{prediction_backend.name} prediction failed: {str(e)}"
+            prediction_source = f"mock_due_to_{prediction_backend.name}_error"
+    else:
+        error_message = None
+        prediction_source = "mock"
+
+    probabilities = np.asarray(fallback_probabilities(), dtype=np.float64)
+    return probabilities > 0.5, probabilities, prediction_source, error_message
+
+def score_records(records):
+    """
+    Score a list of request records with one backend call, falling back to the simple scorer
+
+    Returns:
+        tuple: (is_outage_likely array, probability array, prediction_source, error_message or None)
+    """
+    return score_with_fallback(
+        lambda: FEATURE_SCHEMA.encode([to_model_units(r) for r in records]),
+        lambda: [calculate_probability_simple(r) for r in records],
+    )
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     data = request.json # Data from Angular service
     
-    current_dt = datetime.now()
-    month_val = data.get("month", current_dt.month)
-    day_of_week_val = data.get("dayOfWeek", current_dt.weekday()) # 0=Monday, 6=Sunday for Python; BQ is 1=Sun, 7=Sat
-    hour_of_day_val = data.get("hour", current_dt.hour)
-    
     # Frontend sends county name like "Davidson"
     county_input = data.get("county", "Davidson") # Default for safety
-    county_normalized = county_input.lower().strip()
-    
-    if county_normalized not in ALL_COUNTIES:
+    if FEATURE_SCHEMA.county_position(county_input) < 0:
         print(f"Warning: County '{county_input}' not found in training data. Using fallback.")
 
-    county_input_lowercase = county_input.lower()
-
-    # --- Construct the features dictionary for BQML ---
-    # Default values should ideally come from your training data's statistics (mean/median/mode)
-    # or be otherwise sensible if a feature is not provided by the frontend.
-    features_for_bqml_dict = {
-        "weather_apparentTemperature": float(data.get("apparentTemperature", data.get("temperature", 20.5))),
-        "weather_dewpoint": float(data.get("dewpoint", 17.7)),
-        "weather_heatIndex": float(data.get("heatIndex", data.get("temperature", 22.2))),
-        "weather_iceAccumulation": float(data.get("iceAccumulation", 0.0)),
-        "weather_mixingHeight": float(data.get("mixingHeight", 542.8)),
-        "weather_probabilityOfPrecipitation": float(data.get("precipitationChance", 18.0)), # Mapped from precipitationChance
-        "weather_quantitativePrecipitation": float(data.get("quantitativePrecipitation", 0.0)),
-        "weather_relativeHumidity": float(data.get("relativeHumidity", 74.0)),
-        "weather_skyCover": float(data.get("skyCover", 50.0)),
-        "weather_snowfallAmount": float(data.get("snowfallAmount", 0.0)),
-        "weather_temperature": float(data.get("temperature", 20.5)),
-        "weather_transportWindSpeed": float(data.get("transportWindSpeed", data.get("windSpeed", 16.6))),
-        "weather_windDirection": float(data.get("windDirection", 230.0)),
-        "weather_windGust": float(data.get("windGust", 25.9)),
-        "weather_windSpeed": float(data.get("windSpeed", 9.26)),
-        "weather_visibility": float(data.get("visibility", 10000.0)), # Default to ~6 miles if not 0
-        "weather_alert_count": int(data.get("alertCount", 0)),
-        "weather_severe_alert": 1 if data.get("severeAlert", False) else 0,
-
-        "month": int(month_val),
-        "sin_month": np.sin(2 * np.pi * month_val / 12),
-        "cos_month": np.cos(2 * np.pi * month_val / 12),
-        "day_of_week": int(day_of_week_val), # Python: Mon=0, Sun=6. BQ: Sun=1, Sat=7. Adjust if your training data used BQ's convention
-        "hour_of_day": int(hour_of_day_val),
+    # --- Score through the cache / breaker; falls back to the simple scorer on any failure ---
+    likely, probabilities, prediction_source, error_message = score_records([data])
+    is_outage_likely, probability = bool(likely[0]), float(probabilities[0])
+
+    estimated_duration = calculate_estimated_duration_simple(data, is_outage_likely) # Can refine this later
+    recommendation = generate_recommendation(data, is_outage_likely, estimated_duration)
+    risk_factors = get_risk_factors_simple(data) # Can refine this later
+
+    response = {
+        "outage_likely": is_outage_likely,
+        "probability": probability,
+        "estimated_duration": round(estimated_duration, 1),
+        "recommendation": recommendation,
+        "risk_factors": risk_factors,
+        "lastUpdated": datetime.now().isoformat(),
+        "prediction_source": prediction_source
     }
+    if error_message:
+        response["recommendation"] = f"Fallback (Model Error): {recommendation}"
+        response["error_message"] = error_message
+    # Return 200 to frontend but indicate error and fallback
+    return jsonify(response)
 
-    # One-hot encode county
-    for c in ALL_COUNTIES:
-        features_for_bqml_dict[f"county_{c}"] = 1 if c == county_input_lowercase else 0
-    
-    # One-hot encode season (assuming autumn/winter is base case if only spring/summer are explicit)
-    current_season = get_season(month_val)
-    features_for_bqml_dict["season_spring"] = 1 if current_season == "spring" else 0
-    features_for_bqml_dict["season_summer"] = 1 if current_season == "summer" else 0
-    # If you had season_autumn and season_winter in your training data/SQL, add them:
-    # features_for_bqml_dict["season_autumn"] = 1 if current_season == "autumn" else 0
-    # features_for_bqml_dict["season_winter"] = 1 if current_season == "winter" else 0
-    
-    if not bq_client:
-        # Fallback to simplified logic if BQ client isn't available
-        print("WARNING: BigQuery client not available. Using MOCK prediction.")
-        probability = calculate_probability_simple(data) # data is the raw request.json here
-        is_outage_likely = probability > 0.5
-        estimated_duration = calculate_estimated_duration_simple(data, is_outage_likely)
-        recommendation = generate_recommendation(data, is_outage_likely, estimated_duration)
-        risk_factors = get_risk_factors_simple(data)
-        return jsonify({
-            "outage_likely": is_outage_likely,
-            "probability": probability,
-            "estimated_duration": estimated_duration,
-            "recommendation": recommendation,
-            "risk_factors": risk_factors,
-            "lastUpdated": datetime.now().isoformat(),
-            "prediction_source": "mock"
-        })
 
-    # Construct the SELECT statement part for the ML.PREDICT query
-    # Ensure order and names match the columns in your CREATE MODEL ... AS SELECT ...
-    # (though for ML.PREDICT with a subquery selecting named columns, order isn't strictly vital as long as names match)
-    select_expressions = []
-    for key, value in features_for_bqml_dict.items():
-        if isinstance(value, (int, np.integer)):
-            select_expressions.append(f"CAST({value} AS INT64) AS {key}")
-        elif isinstance(value, (float, np.floating)):
-            select_expressions.append(f"CAST({value} AS FLOAT64) AS {key}")
-        else: # Should not happen if types are correct
-            select_expressions.append(f"CAST('{value}' AS STRING) AS {key}") # Fallback, but likely error if not expected
-    
-    feature_select_string = ",\n      ".join(select_expressions)
-
-    query = f"""
-    SELECT
-      predicted_outage_occurred,
-      predicted_outage_occurred_probs[OFFSET(CASE predicted_outage_occurred WHEN 1 THEN 1 ELSE 0 END)].prob AS probability_of_outage -- More robust way to get prob for the predicted class
-      -- Or, if you always want prob of class 1 (outage):
-      -- (SELECT p.prob FROM UNNEST(predicted_outage_occurred_probs) p WHERE p.label = 1) AS probability_of_outage
-    FROM
-      ML.PREDICT(MODEL `{MODEL_ID}`,
-        (
-          SELECT
-            {feature_select_string}
-        )
-      )
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
     """
-    # print(f"--- BigQuery ML Query ---\n{query}\n-------------------------") # For debugging
+    Score many (county, hour, weather) records with a single backend call.
 
-    try:
-        query_job = bq_client.query(query)
-        results = query_job.result() 
-        
-        prediction_row = next(results, None)
-
-        if prediction_row:
-            # BQML returns 0 or 1 for predicted_outage_occurred
-            # predicted_outage_occurred_probs is an array of structs: [{label:0, prob:0.X}, {label:1, prob:0.Y}]
-            is_outage_likely = bool(prediction_row.predicted_outage_occurred == 1)
-            
-            # Find the probability for the positive class (outage_occurred = 1)
-            probability = 0.0 # Default
-            for prob_info in prediction_row.predicted_outage_occurred_probs:
-                if prob_info['label'] == 1: # Assuming 1 is the "outage occurred" label
-                    probability = prob_info['prob']
-                    break
-        else:
-            # This case should ideally not happen if the query is well-formed and the model exists.
-            print("Error: ML.PREDICT did not return any rows.")
-            return jsonify({"error": "Prediction query returned no results"}), 500
-
-        # Use the prediction results
-        # features_for_bqml_dict contains all features sent to BQML
-        # data contains the original request from frontend
-        estimated_duration = calculate_estimated_duration_simple(data, is_outage_likely) # Can refine this later
-        recommendation = generate_recommendation(data, is_outage_likely, estimated_duration)
-        risk_factors = get_risk_factors_simple(data) # Can refine this later
-
-        return jsonify({
-            "outage_likely": is_outage_likely,
+    Body: {"records": [{...}, ...]} or a bare list, each record shaped like the /api/predict body.
+    Predictions are returned in input order.
+    """
+    data = request.json
+    records = data.get("records", []) if isinstance(data, dict) else data
+    if not isinstance(records, list) or not records:
+        return jsonify({"error": "A non-empty list of records is required"}), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} records per batch"}), 400
+
+    is_outage_likely, probabilities, prediction_source, error_message = score_records(records)
+
+    predictions = []
+    for record, likely, probability in zip(records, is_outage_likely, probabilities):
+        likely = bool(likely)
+        estimated_duration = calculate_estimated_duration_simple(record, likely)
+        predictions.append({
+            "county": record.get("county", "Davidson"),
+            "hour": record.get("hour"),
+            "outage_likely": likely,
             "probability": float(probability),
             "estimated_duration": round(estimated_duration, 1),
-            "recommendation": recommendation,
-            "risk_factors": risk_factors,
-            "lastUpdated": datetime.now().isoformat(),
-            "prediction_source": "bigquery_ml"
+            "recommendation": generate_recommendation(record, likely, estimated_duration),
+            "risk_factors": get_risk_factors_simple(record),
         })
 
-    except Exception as e:
-        print(f"Error for county '{county_input}': {str(e)}")
-        print(f"Query attempted: {query[:500]}...")             
-        print(f"Error executing BigQuery ML.PREDICT query: {str(e)}")
-        # Fallback to your simple logic if BQML call fails
-        probability = calculate_probability_simple(data)
-        is_outage_likely = probability > 0.5
-        estimated_duration = calculate_estimated_duration_simple(data, is_outage_likely)
-        recommendation = generate_recommendation(data, is_outage_likely, estimated_duration)
-        risk_factors = get_risk_factors_simple(data)
-        
-        return jsonify({
-            "outage_likely": bool(is_outage_likely),
-            "probability": float(probability),
-            "estimated_duration": round(estimated_duration, 1),
-            "recommendation": f"Fallback (BQML Error): {recommendation}",
-            "risk_factors": risk_factors,
-            "error_message": f"BigQuery ML prediction failed: {str(e)}",
-            "lastUpdated": datetime.now().isoformat(),
-            "prediction_source": "mock_due_to_bqml_error"
-        }), 200 # Return 200 to frontend but indicate error and fallback
+    response = {
+        "predictions": predictions,
+        "lastUpdated": datetime.now().isoformat(),
+        "prediction_source": prediction_source
+    }
+    if error_message:
+        response["error_message"] = error_message
+    return jsonify(response)
+
+
+# --- Hourly risk timeline ---
+# The NOAA gridpoint forecast covers about 7 days hourly; the whole series is encoded into one
+# feature matrix and scored with a single backend call (repeated hours hit the prediction cache).
+TIMELINE_HOURS = 168
+PEAK_WINDOW_HOURS = 6
+
+def peak_risk_window(probabilities, window_hours):
+    """
+    Find the contiguous window with the highest mean probability
+
+    Returns:
+        tuple: (start index, end index exclusive, mean probability)
+    """
+    window_hours = max(1, min(window_hours, len(probabilities)))
+    sums = np.convolve(probabilities, np.ones(window_hours), mode="valid")
+    start = int(np.argmax(sums))
+    return start, start + window_hours, float(sums[start] / window_hours)
+
+@app.route('/api/predict/timeline', methods=['GET'])
+def predict_timeline():
+    """
+    Hourly outage probability for a county over the NOAA forecast horizon
+
+    Query: county (required), hours (default 168), window (peak window length, default 6)
+    """
+    county_input = request.args.get('county', '')
+    county = county_input.lower().strip()
+    if not county:
+        return jsonify({"error": "County name is required"}), 400
+    hours = min(max(request.args.get('hours', TIMELINE_HOURS, type=int), 1), TIMELINE_HOURS)
+    window_hours = request.args.get('window', PEAK_WINDOW_HOURS, type=int)
+
+    try:
+        entry = gridpoint_cache.get(county)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": f"NOAA gridpoint fetch failed: {e}"}), 502
+    if entry is None:
+        return jsonify({"error": f"No coordinates for county '{county_input}'"}), 404
+    payload = entry.payload
+
+    times, series = noaa_client.hourly_series(payload, NOAA_PROPERTY_BY_FEATURE.values(), hours=hours)
+    weather = {feature: series[prop] for feature, prop in NOAA_PROPERTY_BY_FEATURE.items()}
+
+    likely, probabilities, prediction_source, error_message = score_with_fallback(
+        lambda: FEATURE_SCHEMA.encode_hourly(county, times, weather),
+        lambda: calculate_probability_series(series),
+    )
+
+    start, end, mean_probability = peak_risk_window(probabilities, window_hours)
+    peak = int(np.argmax(probabilities))
+    timestamps = [f"{t}:00:00Z" for t in times.astype(str)]
+    response = {
+        "county": county.capitalize(),
+        "times": timestamps,
+        "probability": np.round(probabilities, 4).tolist(),
+        "outage_likely": likely.tolist(),
+        "peak": {"time": timestamps[peak], "probability": float(probabilities[peak])},
+        "peak_window": {
+            "start": timestamps[start],
+            "end": timestamps[end - 1],
+            "hours": end - start,
+            "mean_probability": round(mean_probability, 4),
+        },
+        "forecastUpdated": payload.get("properties", {}).get("updateTime"),
+        "lastUpdated": datetime.now().isoformat(),
+        "prediction_source": prediction_source,
+    }
+    if error_message:
+        response["error_message"] = error_message
+    return jsonify(response)
+# --- ---
 
 
 def calculate_probability_simple(features_data):
@@ -243,6 +520,18 @@ def calculate_probability_simple(features_data):
     
     return min(0.95, base_prob)
 
+def calculate_probability_series(series):
+    """calculate_probability_simple over hourly NOAA series (property -> array, km/h winds), vectorized"""
+    gust, speed, precip = (
+        np.nan_to_num(series[p]) for p in ("windGust", "windSpeed", "probabilityOfPrecipitation")
+    )
+    gust, speed = gust / KMH_PER_MPH, speed / KMH_PER_MPH
+    prob = np.full(len(gust), 0.05)
+    prob += np.where(gust > 50, 0.4, np.where(gust > 30, 0.25, 0.0))
+    prob += np.where(speed > 35, 0.3, np.where(speed > 20, 0.15, 0.0))
+    prob += np.where(precip > 80, 0.15, np.where(precip > 50, 0.05, 0.0))
+    return np.minimum(0.95, prob)
+
 def calculate_estimated_duration_simple(features_data, is_likely):
     if not is_likely:
         return 0.0
@@ -296,73 +585,191 @@ def generate_recommendation(features_data, is_outage_likely, duration):
 
 @app.route('/api/weather', methods=['GET'])
 def get_weather():
+    """
+    Current-hour conditions for a county from the cached NOAA gridpoint forecast.
+
+    Keys match the /api/predict request body, in the same units: temperatures in °F, wind
+    speeds in mph, everything else in NOAA gridpoint units (listed in "units").
+    """
     county_name = request.args.get('county', 'Davidson')
     if not county_name:
         return jsonify({"error": "County name is required"}), 400
+    county = county_name.lower().strip()
 
-    now = datetime.now()
-    temp_c = round(5 + np.random.rand() * 25, 1) # Temp in Celsius
-    wind_speed_mph = round(5 + np.random.rand() * 25, 1)
-    precip_chance = round(np.random.rand() * 100, 0)
-    
-    weather_data = {
-        "windDirection": round(np.random.rand() * 360, 1),
-        "windGust": round(wind_speed_mph + np.random.rand() * 15, 1),
-        "windSpeed": wind_speed_mph,
-        "relativeHumidity": round(30 + np.random.rand() * 60, 1),
-        "temperature": round(temp_c * 9/5 + 32, 1), # Fahrenheit
-        "dewpoint": round((temp_c - 5 - np.random.rand() * 10) * 9/5 + 32, 1), # Approx dewpoint in F
-        "precipitationChance": precip_chance, # %
-        "county": county_name.capitalize(),
-        "lastUpdated": now.isoformat(),
-        "weatherDescription": f"Mock conditions for {county_name.capitalize()}",
-        # Adding other fields based on your BQML model
-        "apparentTemperature": round((temp_c - np.random.rand()*3) * 9/5 + 32, 1),
-        "heatIndex": round((temp_c + np.random.rand()*2) * 9/5 + 32, 1),
-        "iceAccumulation": 0.0,
-        "mixingHeight": round(200 + np.random.rand() * 2000, 1), # meters
-        "quantitativePrecipitation": round(np.random.rand() * 5 if precip_chance > 50 else 0, 2), # mm
-        "skyCover": round(np.random.rand() * 100, 1), # %
-        "snowfallAmount": 0.0, # mm
-        "transportWindSpeed": round(wind_speed_mph * 0.9, 1), # mph
-        "visibility": round(16093 - np.random.rand() * 10000, 1), # meters (up to 10 miles)
+    try:
+        entry = gridpoint_cache.get(county)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": f"NOAA gridpoint fetch failed: {e}"}), 502
+    if entry is None:
+        return jsonify({"error": f"No coordinates for county '{county_name}'"}), 404
+
+    props = entry.payload.get("properties", {})
+    conditions = noaa_client.current_conditions(entry.payload, NOAA_PROPERTY_BY_FEATURE.values())
+    weather_data = {}
+    units = {}
+    for feature, key, _, _ in WEATHER_FEATURE_SPEC:
+        prop = NOAA_PROPERTY_BY_FEATURE[feature]
+        if prop in conditions:
+            weather_data[key] = round(to_display_units(key, conditions[prop]), 2)
+            units[key] = DISPLAY_UNITS.get(key, props.get(prop, {}).get("uom"))
+
+    weather_data.update({
+        "county": county.capitalize(),
+        "lastUpdated": datetime.fromtimestamp(entry.validated_at).isoformat(),
+        "forecastUpdated": props.get("updateTime"),
+        "weatherDescription": f"NOAA gridpoint forecast for {county.capitalize()}",
+        "units": units,
         "alertCount": 0, # Placeholder
         "severeAlert": False # Placeholder
-    }
+    })
     return jsonify(weather_data)
 
 
+# --- County risk rankings ---
+# Rankings are rebuilt in the background every RANKINGS_REFRESH_SECONDS by scoring all counties
+# in one batched call; requests are served from the latest immutable snapshot (503 until the
+# first one is built).
+RANKINGS_REFRESH_SECONDS = int(os.environ.get("RANKINGS_REFRESH_SECONDS", WEATHER_REFRESH_SECONDS))
 
+def county_ranking_records(counties):
+    """
+    One record per county at the current hour, with the county's current NOAA conditions
 
+    Weather keys and units match the /api/predict request body. Uncached counties are fetched once,
+    concurrently; a county whose fetch failed gets no weather keys, so the schema fills in its
+    defaults (it is not fetched again here).
+    """
+    now = datetime.now()
+    gridpoint_cache.prefetch(counties)
+    records = []
+    for county in counties:
+        record = {"county": county, "month": now.month, "dayOfWeek": now.weekday(), "hour": now.hour}
+        entry = gridpoint_cache.peek(county)
+        if entry is not None:
+            conditions = noaa_client.current_conditions(entry.payload, NOAA_PROPERTY_BY_FEATURE.values())
+            for feature, key, _, _ in WEATHER_FEATURE_SPEC:
+                prop = NOAA_PROPERTY_BY_FEATURE[feature]
+                if prop in conditions:
+                    record[key] = to_display_units(key, conditions[prop])
+        records.append(record)
+    return records
+
+def score_counties(counties):
+    _, probabilities, prediction_source, _ = score_records(county_ranking_records(counties))
+    return probabilities, prediction_source
+
+rankings_refresher = RankingsRefresher(SCORED_COUNTIES, score_counties, RANKINGS_REFRESH_SECONDS)
+rankings_refresher.start()
+# --- ---
 
 @app.route('/api/rankings', methods=['GET'])
 def get_rankings():
-    # For a production system, these rankings should be pre-calculated and stored,
-    # not computed on-the-fly for all counties in an API call.
-    # This mock generates random scores for demonstration.
-    rankings = []
-    for county_name_iter in ALL_COUNTIES:
-        # Simulate features for the simple probability calculation
-        mock_features_for_ranking = {
-            "windGust": np.random.uniform(5, 60),
-            "windSpeed": np.random.uniform(0, 40),
-            "precipitationChance": np.random.uniform(0, 100)
-        }
-        prob = calculate_probability_simple(mock_features_for_ranking) 
-        rankings.append({"county": county_name_iter.capitalize(), "probability": round(prob, 3)})
-
-    rankings.sort(key=lambda x: x["probability"], reverse=True)
-    
-    high_risk = rankings[:5]
-    low_risk = sorted(rankings, key=lambda x: x["probability"])[:5] # Get lowest 5
+    snapshot = rankings_refresher.snapshot
+    if snapshot is None:
+        return jsonify({"error": "Rankings are not available yet"}), 503
+    # Pre-serialized when the snapshot was built
+    return app.response_class(snapshot.body, mimetype="application/json")
 
-    return jsonify({
-        "high_risk": high_risk,
-        "low_risk": low_risk,
-        "lastUpdated": datetime.now().isoformat()
-    })
 
+# --- Statewide risk surface ---
+# Every county x every forecast hour, scored in one batched call and served as a gzip/ETag-cached
+# float32 array (see risk_surface.py). Rebuilt only when a county forecast, the start hour, or
+# the breaker state changes.
+RISK_SURFACE_HOURS = int(os.environ.get("RISK_SURFACE_HOURS", 168))
+
+def risk_surface_inputs():
+    """
+    Fingerprint of everything the surface depends on, and the inputs it is computed from
+
+    Uncached counties are fetched once, concurrently; counties whose fetch failed are left out
+    (NaN rows) until a later refresh fetches them.
 
+    Returns:
+        tuple: (fingerprint, (start hour, cached gridpoint entry or None per county))
+    """
+    gridpoint_cache.prefetch(SCORED_COUNTIES)
+    start = noaa_client.current_hour()
+    entries = [gridpoint_cache.peek(county) for county in SCORED_COUNTIES]
+    versions = []
+    for entry in entries:
+        if entry is None:
+            versions.append("-")
+        else:
+            versions.append(entry.payload.get("properties", {}).get("updateTime") or entry.etag or str(entry.fetched_at))
+    backend = prediction_backend.name if prediction_backend else "mock"
+    fingerprint = "|".join([str(start), backend, prediction_breaker.state] + versions)
+    return fingerprint, (start, entries)
+
+def compute_risk_surface(inputs):
+    """Score every county with a forecast over RISK_SURFACE_HOURS in one backend call"""
+    start, entries = inputs
+    rows, matrices, fallback = [], [], []
+    for i, (county, entry) in enumerate(zip(SCORED_COUNTIES, entries)):
+        if entry is None:
+            continue
+        times, series = noaa_client.hourly_series(
+            entry.payload, NOAA_PROPERTY_BY_FEATURE.values(), hours=RISK_SURFACE_HOURS, start=start
+        )
+        weather = {feature: series[prop] for feature, prop in NOAA_PROPERTY_BY_FEATURE.items()}
+        rows.append(i)
+        matrices.append(FEATURE_SCHEMA.encode_hourly(county, times, weather))
+        fallback.append(series)
+    if not rows:
+        raise ValueError("No county forecasts available")
+
+    _, probabilities, prediction_source, _ = score_with_fallback(
+        lambda: np.vstack(matrices),
+        lambda: np.concatenate([calculate_probability_series(series) for series in fallback]),
+    )
+    values = np.full((len(SCORED_COUNTIES), RISK_SURFACE_HOURS), np.nan, dtype=np.float32)
+    values[rows] = probabilities.reshape(len(rows), RISK_SURFACE_HOURS)
+    return [c.capitalize() for c in SCORED_COUNTIES], f"{start}:00:00Z", values, prediction_source
+
+risk_surface_refresher = RiskSurfaceRefresher(risk_surface_inputs, compute_risk_surface, WEATHER_REFRESH_SECONDS)
+risk_surface_refresher.start()
+# --- ---
+
+@app.route('/api/risk-surface', methods=['GET'])
+def get_risk_surface():
+    """
+    Counties x hours outage probabilities as a float32 array behind a JSON header.
+
+    See risk_surface.py for the wire format. Supports If-None-Match and gzip transfer.
+    """
+    surface = risk_surface_refresher.surface
+    if surface is None:
+        return jsonify({"error": "Risk surface is not ready yet"}), 503
+
+    use_gzip = bool(request.accept_encodings["gzip"])
+    etag = surface.gzip_etag if use_gzip else surface.etag
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    elif use_gzip:
+        response = app.response_class(surface.gzip_body, mimetype="application/octet-stream")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = app.response_class(surface.body, mimetype="application/octet-stream")
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Serving counters for monitoring"""
+    return jsonify({
+        "prediction_backend": prediction_backend.name if prediction_backend else None,
+        "prediction_cache": prediction_cache.stats(),
+        "request_coalescing": prediction_flight.stats(),
+        "circuit_breaker": prediction_breaker.stats(),
+        "rankings": rankings_refresher.stats(),
+        "weather_cache": gridpoint_cache.stats(),
+        "gridpoint_lookup": gridpoint_lookup.stats(),
+        "risk_surface": risk_surface_refresher.stats(),
+        "climatology": climatology_cube.stats_summary() if climatology_cube is not None else None,
+        "feature_encoder": {"path": FEATURE_ENCODER_PATH, "columns": len(feature_encoder)} if feature_encoder is not None else None,
+    })
 
 
 if __name__ == '__main__':
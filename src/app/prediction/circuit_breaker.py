@@ -0,0 +1,198 @@
+# app/circuit_breaker.py
+# Latency-budgeted circuit breaker around the prediction backend.
+#
+# Every backend call gets a deadline: it is passed to the backend and also enforced here, by
+# running the call on a small worker pool and waiting on its future for at most the deadline, so
+# a backend that ignores its timeout cannot hold up a request. A call that missed its deadline
+# keeps its worker until the backend gives up; when every worker is taken, further calls (probes
+# included) fail fast with CircuitOpenError rather than queueing behind the hung ones.
+# Outcomes and latencies of the last few calls are kept in a rolling window; when the error rate or p95 latency crosses its threshold the breaker opens and
+# callers go straight to the fallback scorer. While open, a background thread probes the backend
+# and closes the breaker once a probe succeeds within the deadline.
+
+import threading
+import time
+from collections import deque
+from concurrent import futures
+
+import numpy as np
+
+
+CLOSED = "closed"
+OPEN = "open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the backend while the breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Args:
+        probe (callable): Cheap backend call taking a timeout in seconds; used to test recovery
+        deadline_seconds (float): Per-call deadline, passed to the backend and enforced on the caller
+        window_size (int): Number of recent calls kept for the error rate / latency
+        min_calls (int): Calls required in the window before the breaker can trip
+        error_rate_threshold (float): Trip when this fraction of windowed calls failed
+        latency_threshold_seconds (float): Trip when p95 latency of the window exceeds this
+        probe_interval_seconds (float): Time between recovery probes while open
+        max_workers (int): Backend calls that can be in flight at once, counting calls that
+            missed their deadline but have not returned yet
+    """
+
+    def __init__(self, probe, deadline_seconds=2.0, window_size=20, min_calls=5,
+                 error_rate_threshold=0.5, latency_threshold_seconds=1.5, probe_interval_seconds=15.0,
+                 max_workers=8):
+        self.probe = probe
+        self.deadline_seconds = deadline_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_threshold_seconds = latency_threshold_seconds
+        self.probe_interval_seconds = probe_interval_seconds
+        self.max_workers = max_workers
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.trip_count = 0
+        self.rejected_count = 0
+        self.timeout_count = 0
+        self.saturated_count = 0
+        self.in_flight = 0
+        self.probe_count = 0
+        self.last_error = None
+
+        self._window = deque(maxlen=window_size)  # (ok, latency_seconds)
+        self._lock = threading.Lock()
+        self._probe_thread = None
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backend-call")
+
+    def _run(self, fn):
+        """
+        Run fn(deadline_seconds) on the worker pool and wait for it up to the deadline
+
+        Raises:
+            CircuitOpenError: if max_workers calls are already in flight (fn is not run)
+            TimeoutError: if fn has not returned by the deadline (it is left to finish in the
+                background, bounded by the timeout it was given)
+        """
+        with self._lock:
+            if self.in_flight >= self.max_workers:
+                self.saturated_count += 1
+                raise CircuitOpenError(f"All {self.max_workers} prediction backend calls are still in flight")
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(fn, self.deadline_seconds)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        done, _ = futures.wait([future], timeout=self.deadline_seconds)
+        if not done:
+            future.cancel()
+            with self._lock:
+                self.timeout_count += 1
+            raise TimeoutError(f"Prediction backend call exceeded its {self.deadline_seconds}s deadline")
+        return future.result()
+
+    def _release(self, future=None):
+        with self._lock:
+            self.in_flight -= 1
+
+    def call(self, fn):
+        """
+        Run fn(timeout) under the breaker
+
+        Raises:
+            CircuitOpenError: if the breaker is open or every worker is busy (the backend is
+                not called)
+            TimeoutError: if fn does not return within the deadline
+        """
+        with self._lock:
+            if self.state == OPEN:
+                self.rejected_count += 1
+                raise CircuitOpenError("Prediction backend circuit is open")
+
+        start = time.monotonic()
+        try:
+            result = self._run(fn)
+        except CircuitOpenError:
+            # The backend was not called: nothing to record
+            raise
+        except Exception as e:
+            self._record(False, time.monotonic() - start, e)
+            raise
+        self._record(True, time.monotonic() - start, None)
+        return result
+
+    def _record(self, ok, latency, error):
+        with self._lock:
+            self._window.append((ok, latency))
+            if error is not None:
+                self.last_error = str(error)
+            if self.state == CLOSED and self._should_trip():
+                self._trip()
+
+    def _should_trip(self):
+        # Called with the lock held
+        if len(self._window) < self.min_calls:
+            return False
+        error_rate, p95 = self._window_metrics()
+        return error_rate >= self.error_rate_threshold or p95 >= self.latency_threshold_seconds
+
+    def _window_metrics(self):
+        if not self._window:
+            return 0.0, 0.0
+        oks = np.array([ok for ok, _ in self._window])
+        latencies = np.array([latency for _, latency in self._window])
+        return 1.0 - oks.mean(), float(np.percentile(latencies, 95))
+
+    def _trip(self):
+        # Called with the lock held
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.trip_count += 1
+        print(f"WARNING: Prediction backend circuit opened (trip #{self.trip_count}): {self.last_error}")
+        self._probe_thread = threading.Thread(target=self._probe_until_closed, name="breaker-probe", daemon=True)
+        self._probe_thread.start()
+
+    def _probe_until_closed(self):
+        while True:
+            time.sleep(self.probe_interval_seconds)
+            with self._lock:
+                self.probe_count += 1
+            try:
+                self._run(self.probe)
+                ok = True
+            except Exception as e:
+                ok = False
+                with self._lock:
+                    self.last_error = str(e)
+            if ok:
+                with self._lock:
+                    self.state = CLOSED
+                    self.opened_at = None
+                    self._window.clear()
+                print("Prediction backend circuit closed after successful probe")
+                return
+
+    def stats(self):
+        """Breaker state and counters for monitoring"""
+        with self._lock:
+            error_rate, p95 = self._window_metrics()
+            latencies = [latency for _, latency in self._window]
+            return {
+                "state": self.state,
+                "opened_at": self.opened_at,
+                "trip_count": self.trip_count,
+                "rejected_count": self.rejected_count,
+                "timeout_count": self.timeout_count,
+                "saturated_count": self.saturated_count,
+                "in_flight": self.in_flight,
+                "probe_count": self.probe_count,
+                "window_calls": len(self._window),
+                "error_rate": round(float(error_rate), 4),
+                "p50_latency_ms": round(float(np.percentile(latencies, 50)) * 1000, 1) if latencies else None,
+                "p95_latency_ms": round(p95 * 1000, 1) if latencies else None,
+                "deadline_ms": self.deadline_seconds * 1000,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,225 @@
+# app/climatology.py
+# County x day-of-year x feature weather climatology, stored as a memory-mapped cube.
+#
+# The cube holds, for every county and day of the (leap) year, quantiles of each weather feature
+# over a +/-15 day window: the same seasonal statistics the training join computes (see
+# doy_window.py), kept instead of thrown away. It is saved as one dense float32 .npy plus a JSON
+# index and opened with mmap_mode="r", so every serving worker maps the same pages read-only
+# instead of holding its own copy. A lookup is an O(1) slice.
+#
+# Layout:
+#   {root}/cube.<version>.npy   float32 (counties, 366, features, stats)
+#   {root}/index.json           {"cube_file": "cube.<version>.npy", "counties": [...], "features": [...],
+#                                "stats": [...], ...}
+#
+# index.json names the cube it describes, so a save swaps both with a single rename and a reader
+# never pairs a new cube with an old index. Cubes written before versioning are read as cube.npy.
+#
+# Usage:
+#   python climatology.py [--archive data/weather_archive] [--root data/climatology]
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+
+DEFAULT_CLIMATOLOGY_PATH = os.environ.get("CLIMATOLOGY_PATH", "data/climatology")
+
+# Statistics stored per feature, in cube order
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+STATS = ["q10", "q25", "median", "q75", "q90"]
+
+# Leap-year day of year of the first of each month (index 0 unused)
+_MONTH_START = np.concatenate([[0], np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])])
+
+
+def day_of_year(month, day):
+    """Leap-year day of year (1-366) of a month/day, as used to index the cube"""
+    return _MONTH_START[month] + day
+
+
+def hour_day_of_year(times):
+    """Leap-year day of year of datetime64 hours"""
+    times = np.asarray(times, dtype="datetime64[h]")
+    month = times.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    day = (times.astype("datetime64[D]") - times.astype("datetime64[M]")).astype(np.int64) + 1
+    return day_of_year(month, day)
+
+
+class ClimatologyCube:
+    """
+    Args:
+        cube (np.ndarray): (counties, 366, features, stats) float32, NaN where unknown
+        counties (list): County names in cube order (matched case-insensitively)
+        features (list): Weather feature names in cube order (e.g. "temperature")
+        stats (list): Statistic names in cube order
+        metadata (dict, optional): Extra index fields (window, build time, ...)
+    """
+
+    def __init__(self, cube, counties, features, stats=STATS, metadata=None):
+        self.cube = cube
+        self.counties = [str(c).lower() for c in counties]
+        self.features = list(features)
+        self.stats = list(stats)
+        self.metadata = metadata or {}
+        self.county_index = {c: i for i, c in enumerate(self.counties)}
+        self.feature_index = {f: i for i, f in enumerate(self.features)}
+        self.stat_index = {s: i for i, s in enumerate(self.stats)}
+
+    @classmethod
+    def load(cls, root=DEFAULT_CLIMATOLOGY_PATH):
+        """
+        Open a saved cube memory-mapped (read-only, shared between processes)
+
+        Raises:
+            OSError: if the cube has not been built
+        """
+        for attempt in range(3):
+            with open(os.path.join(root, "index.json")) as f:
+                index = json.load(f)
+            try:
+                cube = np.load(os.path.join(root, index.pop("cube_file", "cube.npy")), mmap_mode="r")
+                break
+            except FileNotFoundError:
+                # Two saves replaced the cube since the index was read: read the new index
+                if attempt == 2:
+                    raise
+        return cls(cube, index.pop("counties"), index.pop("features"), index.pop("stats"), index)
+
+    def save(self, root=DEFAULT_CLIMATOLOGY_PATH):
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(os.path.join(root, "index.json")) as f:
+                previous = json.load(f).get("cube_file")
+        except (OSError, ValueError):
+            previous = None
+
+        # The cube goes to a new versioned file no index names yet; swapping in index.json is then
+        # the only step readers can observe. Workers that already mapped the old cube keep it.
+        cube_file = f"cube.{time.time_ns()}.{os.getpid()}.npy"
+        np.save(os.path.join(root, cube_file), np.asarray(self.cube, dtype=np.float32))
+        index = dict(self.metadata, cube_file=cube_file, counties=self.counties, features=self.features,
+                     stats=self.stats)
+        tmp_index = os.path.join(root, f"index.json.{os.getpid()}.tmp")
+        with open(tmp_index, "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_index, os.path.join(root, "index.json"))
+
+        # Keep the previous cube for readers that read the old index just before the swap
+        for name in os.listdir(root):
+            if name.startswith("cube.") and name.endswith(".npy") and name not in (cube_file, previous, "cube.npy"):
+                os.remove(os.path.join(root, name))
+        return self
+
+    def county_position(self, county):
+        """Index of a county in the cube, or -1 if unknown"""
+        return self.county_index.get(str(county).lower().strip(), -1)
+
+    def lookup(self, county, day, stat="median"):
+        """
+        Statistic of every feature for one county and day of year
+
+        Returns:
+            np.ndarray: (features,) float32, or None if the county is not in the cube
+        """
+        position = self.county_position(county)
+        if position < 0:
+            return None
+        return self.cube[position, int(day) - 1, :, self.stat_index[stat]]
+
+    def lookup_many(self, positions, days, stat="median"):
+        """
+        Statistic of every feature for many (county position, day) pairs
+
+        Args:
+            positions (np.ndarray): County positions (see county_position); -1 gives NaN
+            days (np.ndarray): Days of year (1-366)
+
+        Returns:
+            np.ndarray: (len(days), features) float64
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int64)
+        values = np.full((len(days), len(self.features)), np.nan)
+        known = positions >= 0
+        values[known] = self.cube[positions[known], days[known] - 1, :, self.stat_index[stat]]
+        return values
+
+    def window_table(self, stat="median"):
+        """
+        Long (county_key, dayofyear, weather_{feature}) table for doy_window.join_window_table
+
+        Returns:
+            pd.DataFrame: Rows for county/days with at least one value
+        """
+        import pandas as pd
+
+        n_counties = len(self.counties)
+        values = np.asarray(self.cube[:, :, :, self.stat_index[stat]], dtype=np.float64)
+        table = pd.DataFrame(values.reshape(n_counties * 366, len(self.features)),
+                             columns=[f"weather_{f}" for f in self.features])
+        table.insert(0, "dayofyear", np.tile(np.arange(1, 367), n_counties))
+        table.insert(0, "county_key", np.repeat(self.counties, 366))
+        return table.dropna(subset=list(table.columns[2:]), how="all").reset_index(drop=True)
+
+    def stats_summary(self):
+        return {
+            "counties": len(self.counties),
+            "features": len(self.features),
+            "stats": self.stats,
+            "coverage": float(np.mean(~np.isnan(self.cube[:, :, :, self.stat_index["median"]]))) if self.counties else 0.0,
+            **self.metadata,
+        }
+
+
+def build_cube(county_weather, features=None, window_days=15):
+    """
+    Build the cube from per-county hourly weather
+
+    Args:
+        county_weather (dict): County name -> weather DataFrame with a timestamp column
+        features (list, optional): Features to include; defaults to every numeric column seen
+        window_days (int): Half-width of the day-of-year window
+
+    Returns:
+        ClimatologyCube
+    """
+    # Training-side build only: keeps pandas out of the serving import path
+    import doy_window
+
+    if features is None:
+        features = sorted({c for df in county_weather.values() for c in doy_window._numeric_columns(df)})
+    counties = list(county_weather)
+    cube = np.full((len(counties), doy_window.DAYS_IN_YEAR, len(features), len(QUANTILES)), np.nan, dtype=np.float32)
+    for i, county in enumerate(counties):
+        cube[i] = doy_window.window_quantiles(county_weather[county], features, QUANTILES, window_days)
+    metadata = {"window_days": window_days, "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    return ClimatologyCube(cube, counties, features, STATS, metadata)
+
+
+def build_from_archive(archive, features=None, window_days=15):
+    """Build the cube from every county in a weather_archive.WeatherArchive"""
+    county_weather = {}
+    for partition in archive.partitions.values():
+        county_weather.setdefault(partition["county"], [])
+    for county in county_weather:
+        years = [p["year"] for p in archive.partitions.values() if p["county"] == county]
+        county_weather[county] = archive.read(county, f"{min(years)}-01-01", f"{max(years)}-12-31 23:00", features)
+    return build_cube(county_weather, features, window_days)
+
+
+if __name__ == '__main__':
+    from weather_archive import DEFAULT_ARCHIVE_PATH, WeatherArchive
+
+    parser = argparse.ArgumentParser(description="Build the county x day-of-year weather climatology cube")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH)
+    parser.add_argument("--root", default=DEFAULT_CLIMATOLOGY_PATH)
+    parser.add_argument("--window-days", type=int, default=15)
+    parser.add_argument("--features", nargs="*", default=None)
+    args = parser.parse_args()
+
+    cube = build_from_archive(WeatherArchive(args.archive), args.features, args.window_days).save(args.root)
+    print(cube.stats_summary())
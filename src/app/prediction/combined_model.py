@@ -26,6 +26,18 @@ from datetime import datetime, timedelta
 import requests
 import os
 from data_loader import load_merged_data, load_events_data, process_merged_data, prepare_modeling_data
+import noaa_client
+from gridpoint_lookup import GridpointLookup
+from gridpoint_stream import STREAM_CHUNK_BYTES, parse_gridpoint
+from gridpoint_store import GridpointStore
+from noaa_fetcher import RateLimitedSession, TokenBucket, iter_concurrent
+from climatology import DEFAULT_CLIMATOLOGY_PATH, build_cube, build_from_archive
+import doy_window
+from exposure_grid import DEFAULT_EXPOSURE_PATH, build_exposure_grid
+from feature_encoder import FeatureEncoder
+from negative_sampler import NEGATIVE_SEED, sample_negatives
+import weather_alerts
+from weather_archive import WeatherArchive
 
 ############## PART 1: LOAD FROM data_loader.py ##############
 def load_tennessee_data():
@@ -49,7 +61,8 @@ def load_tennessee_data():
     }
 
 # ############## PART 2: NOAA Weather API Functions ##############
-def fetch_noaa_weather(lat, lng, start_date=None, end_date=None, max_retries=3, timeout=30):
+def fetch_noaa_weather(lat, lng, start_date=None, end_date=None, max_retries=3, timeout=30, lookup=None,
+                       properties=None):
     """
     Fetch weather data from NOAA API for a specific location with improved error handling
 
@@ -60,6 +73,10 @@ def fetch_noaa_weather(lat, lng, start_date=None, end_date=None, max_retries=3,
         end_date (str, optional): End date in YYYY-MM-DD format
         max_retries (int): Maximum number of retry attempts
         timeout (int): Request timeout in seconds
+        lookup (GridpointLookup, optional): Persistent point -> gridpoint table; known locations
+            skip the /points request
+        properties (list, optional): Properties to keep; the response is decoded as a stream and
+            everything else is skipped (see gridpoint_stream.py)
 
     Returns:
         dict: Weather data from NOAA API
@@ -79,27 +96,40 @@ def fetch_noaa_weather(lat, lng, start_date=None, end_date=None, max_retries=3,
 
     while retries < max_retries:
         try:
-            # Send request with timeout
-            response = requests.get(point_url, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            point_data = response.json()
+            if lookup is not None:
+                forecast_url = lookup.gridpoint_url(lat, lng, timeout=timeout)
+            else:
+                # Send request with timeout
+                response = requests.get(point_url, headers=headers, timeout=timeout)
+                response.raise_for_status()
+                point_data = response.json()
 
-            # Extract grid info
-            grid_id = point_data['properties']['gridId']
-            grid_x = point_data['properties']['gridX']
-            grid_y = point_data['properties']['gridY']
+                # Extract grid info
+                grid_id = point_data['properties']['gridId']
+                grid_x = point_data['properties']['gridX']
+                grid_y = point_data['properties']['gridY']
 
-            # Get forecast data
-            forecast_url = f"https://api.weather.gov/gridpoints/{grid_id}/{grid_x},{grid_y}"
+                # Get forecast data
+                forecast_url = f"https://api.weather.gov/gridpoints/{grid_id}/{grid_x},{grid_y}"
 
             # Store forecast data
-            forecast_response = requests.get(forecast_url, headers=headers, timeout=timeout)
+            forecast_response = requests.get(forecast_url, headers=headers, timeout=timeout,
+                                             stream=properties is not None)
             forecast_response.raise_for_status()
-            forecast_data = forecast_response.json()
+            if properties is not None:
+                forecast_data = parse_gridpoint(forecast_response.iter_content(STREAM_CHUNK_BYTES), properties)
+            else:
+                forecast_data = forecast_response.json()
+
+            # A redirected gridpoint means the cached mapping is stale
+            if lookup is not None and forecast_response.history:
+                lookup.invalidate(lat, lng)
 
             return forecast_data
 
         except requests.exceptions.RequestException as err:
+            if lookup is not None and noaa_client.is_not_found(err):
+                lookup.invalidate(lat, lng)
             retries += 1
             if retries >= max_retries:
                 print(f"Error fetching weather data after {max_retries} attempts: {err}")
@@ -110,12 +140,14 @@ def fetch_noaa_weather(lat, lng, start_date=None, end_date=None, max_retries=3,
                 print(f"Retry {retries}/{max_retries} after {wait_time}s: {err}")
                 time.sleep(wait_time)
 
-def extract_weather_features(noaa_data):
+def extract_weather_features(noaa_data, properties=None):
     """
     Extract relevant weather features from NOAA API response
 
     Args:
         noaa_data (dict): NOAA API response
+        properties (list, optional): Properties to extract; everything else is skipped without
+            being parsed. Defaults to every supported property
 
     Returns:
         pd.DataFrame: DataFrame with weather features
@@ -123,7 +155,6 @@ def extract_weather_features(noaa_data):
     if not noaa_data or "properties" not in noaa_data:
         return pd.DataFrame()
 
-    records = []
     props = noaa_data["properties"]
 
     weather_properties = [
@@ -186,53 +217,17 @@ def extract_weather_features(noaa_data):
         "stability",
         "redFlagThreatIndex",
     ]
-    # Extract time series data for each property
-    for prop in weather_properties:
-        if prop in props:
-            for entry in props[prop]["values"]:
-                valid_time = entry["validTime"]
-
-                # https://www.w3.org/TR/NOTE-datetime
-                # 1994-11-05T08:15:30-05:00
-                # November 5, 1994, 8:15:30 am, US Eastern Standard Time.
-
-                time_parts = valid_time.split("T")
-                date_part = time_parts[0]
-                time_part = (
-                    time_parts[1].split("-")[0]
-                    if "-" in time_parts[1]
-                    else time_parts[1].split("+")[0]
-                )
-
-                # Combine date and time parts
-                datetime_str = f"{date_part} {time_part}"
-
-                # Convert to datetime
-                try:
-                    dt = datetime.strptime(datetime_str, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    # Try alternative format if the first one fails
-                    dt = datetime.strptime(
-                        f"{date_part} {time_part}", "%Y-%m-%d %H:%M:%S"
-                    )
+    if properties is not None:
+        weather_properties = [prop for prop in weather_properties if prop in properties]
 
-                # Create record
-                record = {"timestamp": dt, "property": prop, "value": entry["value"]}
-                records.append(record)
-
-            # Create DataFrame
-    df = pd.DataFrame(records)
-
-    # Pivot to create wide format
-    if not df.empty:
-        df_pivot = df.pivot_table(
-            index="timestamp", columns="property", values="value", aggfunc="first"
-        ).reset_index()
-        return df_pivot
-
-        df_pivot = df_pivot.ffill().bfill()
+    # Columnar build: each wanted property goes straight into an array on a shared hourly grid
+    times, columns = noaa_client.hourly_columns({prop: props[prop]["values"] for prop in weather_properties if prop in props})
+    if not columns:
+        return pd.DataFrame()
 
-    return pd.DataFrame()
+    data = {"timestamp": times.astype("datetime64[ns]")}
+    data.update((prop, columns[prop]) for prop in sorted(columns))
+    return pd.DataFrame(data)
 
 def clean_weather_data(weather_df):
     """
@@ -290,198 +285,128 @@ def get_county_coordinates():
 
     return counties_df
 
-def fetch_weather_for_counties(county_coords_df, start_date, end_date):
+def iter_weather_for_counties(county_coords_df, start_date, end_date, max_workers=8, requests_per_second=5,
+                              lookup=None, store=None):
     """
-    Fetch weather data for all counties using the county coordinates DataFrame
+    Fetch weather data for all counties concurrently, yielding each county as soon as it completes
+
+    Requests share one pooled session and a global token bucket, and 429/5xx responses are retried
+    with jittered backoff (see noaa_fetcher.py), so wall-clock time is bounded by the rate limit.
 
     Args:
         county_coords_df (pd.DataFrame): County coordinates from get_county_coordinates()
         start_date (str): Start date in YYYY-MM-DD format
         end_date (str): End date in YYYY-MM-DD format
-
-    Returns:
-        dict: Dictionary with county name as key and weather data as value
+        max_workers (int): Concurrent county fetches
+        requests_per_second (float): Global request rate against api.weather.gov
+        lookup (GridpointLookup, optional): Point -> gridpoint table; defaults to the persistent
+            table at GRIDPOINT_LOOKUP_PATH, built from the county coordinates before fetching
+        store (GridpointStore, optional): Compressed response store; defaults to the store at
+            GRIDPOINT_STORE_PATH. With WEATHER_REPLAY=1 every county is read from the store and
+            no requests are made
+
+    Yields:
+        tuple: (county name, weather DataFrame), in completion order
     """
-    county_weather = {}
-
-    for _, row in county_coords_df.iterrows():
-        print(f"Fetching weather data for {row['county']}...")
-        county_name = row['county']
-
-        # Fetch weather data using latitude and longitude
-        weather_data = fetch_noaa_weather(
-            row['latitude'],
-            row['longitude'],
-            start_date,
-            end_date
+    session = RateLimitedSession(TokenBucket(requests_per_second), pool_size=max_workers)
+    lookup = lookup or GridpointLookup()
+    store = store or GridpointStore()
+    if store.replay:
+        print("Replaying stored gridpoint responses (no network requests)")
+    else:
+        lookup.build(zip(county_coords_df['latitude'], county_coords_df['longitude']), session=session, max_workers=max_workers)
+
+    def fetch(row):
+        # Retries happen inside the session; a second attempt only re-resolves an invalidated gridpoint
+        # Only the properties select_priority_features keeps are decoded (streamed) and parsed
+        weather_data = noaa_client.fetch_gridpoint(
+            row['latitude'], row['longitude'], session=session, max_retries=2, lookup=lookup, store=store,
+            properties=PRIORITY_WEATHER_FEATURES,
         )
+        return extract_weather_features(weather_data, PRIORITY_WEATHER_FEATURES)
 
-        if weather_data:
-            # Extract features
-            weather_df = extract_weather_features(weather_data)
-            if not weather_df.empty:
-                weather_df['county'] = county_name
-                weather_df['fips'] = row['fips']  # Keep FIPS for mapping
-                county_weather[county_name] = weather_df
+    rows = county_coords_df.to_dict('records')
+    # Replay reads local files only; one worker keeps county order stable so runs are reproducible
+    workers = 1 if store.replay else max_workers
+    for row, weather_df, error in iter_concurrent(rows, fetch, max_workers=workers):
+        county_name = row['county']
+        if error is not None:
+            print(f"Error fetching weather data for {county_name}: {error}")
+            continue
+        if not weather_df.empty:
+            weather_df['county'] = county_name
+            weather_df['fips'] = row['fips']  # Keep FIPS for mapping
+            print(f"Fetched weather data for {county_name}")
+            yield county_name, weather_df
 
+def fetch_weather_for_counties(county_coords_df, start_date, end_date):
+    """
+    Fetch weather data for all counties using the county coordinates DataFrame
 
+    Args:
+        county_coords_df (pd.DataFrame): County coordinates from get_county_coordinates()
+        start_date (str): Start date in YYYY-MM-DD format
+        end_date (str): End date in YYYY-MM-DD format
 
-    return county_weather
+    Returns:
+        dict: Dictionary with county name as key and weather data as value
+    """
+    return dict(iter_weather_for_counties(county_coords_df, start_date, end_date))
 
-def combine_outage_and_weather_hybrid(historical_df, current_weather):
+def combine_outage_and_weather_hybrid(historical_df, current_weather, climatology_cube=None):
     """
     Match historical outages with current weather by season/conditions with improved error handling
 
+    Each outage gets the median of its county's weather over the days within 15 days of its day
+    of year (see doy_window.py). The medians are precomputed per county for all 366 days and
+    joined onto the outages in one merge.
+
     Args:
         historical_df (pd.DataFrame): Historical outage data
         current_weather (dict): Dictionary mapping county names to weather DataFrames
+        climatology_cube (ClimatologyCube, optional): Cube built from current_weather; its
+            medians are joined instead of being computed again
 
     Returns:
         pd.DataFrame: Combined outage and weather data
     """
-    import pandas as pd
-    import numpy as np
-    from datetime import datetime
-
     # Return empty dataframe if inputs are empty
-    if historical_df.empty or not current_weather:
+    if historical_df.empty or not current_weather or 'county' not in historical_df.columns:
         return pd.DataFrame()
 
-    combined_data = []
-
-    # Process each historical outage
-    for idx, outage in historical_df.iterrows():
-        # Skip if county is missing or not in weather data
-        if 'county' not in outage or pd.isna(outage['county']):
-            continue
-
-        county = outage['county']
-
-        # Safely handle county matching - convert to string and lowercase
-        county_str = str(county).lower()
-
-        # Find matching county in weather data keys
-        matching_county = None
-        for weather_county in current_weather.keys():
-            if str(weather_county).lower() == county_str:
-                matching_county = weather_county
-                break
-
-        # Skip if no matching county found
-        if matching_county is None:
-            continue
-
-        # Get weather data for the matching county
-        weather_df = current_weather[matching_county]
-
-        # Skip if weather data is empty
-        if weather_df.empty:
-            continue
-
-        # Get historical date info
-        if not pd.api.types.is_datetime64_dtype(outage['start_time']):
-            hist_date = pd.to_datetime(outage['start_time'])
-        else:
-            hist_date = outage['start_time']
-
-        hist_month = hist_date.month
-        hist_day = hist_date.day
-
-        # Make sure timestamp column is datetime
-        if 'timestamp' in weather_df.columns and not pd.api.types.is_datetime64_dtype(weather_df['timestamp']):
-            weather_df['timestamp'] = pd.to_datetime(weather_df['timestamp'])
-
-        # Skip if no timestamp column
-        if 'timestamp' not in weather_df.columns:
-            continue
-
-        # Match by similar month (within 15 days)
-        try:
-            year = 2024
-            if hist_month == 2 and hist_day > 29:
-                hist_day = 29
-
-            days_in_month = {
-                1: 31, 2: 29, 3: 31, 4: 30, 5: 31, 6: 30,
-                7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31
-            }
-
-            if hist_day > days_in_month.get(hist_month, 30):
-                hist_day = days_in_month.get(hist_month, 30)
-
-            ref_date = pd.Timestamp(year=year, month=hist_month, day=hist_day)
-
-            # Calculate day of year for each weather timestamp with explicit int conversion
-            weather_df['dayofyear'] = weather_df['timestamp'].dt.dayofyear
-            ref_dayofyear = ref_date.dayofyear
-
-
-            matched_rows = []
-            for idx, row in weather_df.iterrows():
-                if abs(row['dayofyear'] - ref_dayofyear) <= 15:
-                    matched_rows.append(idx)
-
-            matched_weather = weather_df.loc[matched_rows].copy()
-
-            # Clean up temporary column
-            weather_df.drop('dayofyear', axis=1, inplace=True)
-            if 'dayofyear' in matched_weather.columns:
-                matched_weather.drop('dayofyear', axis=1, inplace=True)
-        except Exception as e:
-            print(f"Error matching dates: {e}")
-            continue
-
-        if not matched_weather.empty:
-            # Take the median for each weather parameter
-            weather_cols = [col for col in matched_weather.columns
-                          if col not in ['timestamp', 'county', 'fips', 'dayofyear']]
-            weather_features = {}
-
-            for col in weather_cols:
-                # Only include numeric columns
-                if matched_weather[col].dtype in [np.float64, np.int64] and not matched_weather[col].isna().all():
-                    try:
-                        # Use median to avoid extreme values
-                        weather_features[f'weather_{col}'] = matched_weather[col].median()
-                    except Exception as e:
-                        print(f"Error calculating median for {col}: {e}")
-
-            # Combine with outage data
-            outage_dict = outage.to_dict()
-
-            # Check if any weather features were found
-            if weather_features:
-                combined_row = {**outage_dict, **weather_features}
-                combined_data.append(combined_row)
-
-    # Return a DataFrame or empty DataFrame
-    if combined_data:
-        return pd.DataFrame(combined_data)
+    if climatology_cube is not None:
+        table = climatology_cube.window_table()
     else:
+        table = doy_window.window_table(current_weather)
+    combined_df = doy_window.join_window_table(historical_df, table)
+
+    if combined_df.empty:
         print("Warning: No matching data found after combining outage and weather.")
         return pd.DataFrame()
+    return combined_df
 
-def select_priority_features(weather_df):
-    # Define feature priority groups
-    essential_features = [
-        "temperature", "windSpeed", "probabilityOfPrecipitation",
-        "quantitativePrecipitation", "relativeHumidity"
-    ]
+# Weather feature priority groups kept for modeling (see select_priority_features)
+ESSENTIAL_WEATHER_FEATURES = [
+    "temperature", "windSpeed", "probabilityOfPrecipitation",
+    "quantitativePrecipitation", "relativeHumidity"
+]
 
-    high_priority = [
-        "windGust", "dewpoint", "heatIndex", "skyCover",
-        "hazards", "snowfallAmount", "visibility"
-    ]
+HIGH_PRIORITY_WEATHER_FEATURES = [
+    "windGust", "dewpoint", "heatIndex", "skyCover",
+    "hazards", "snowfallAmount", "visibility"
+]
 
-    medium_priority = [
-        "apparentTemperature", "iceAccumulation", "transportWindSpeed",
-        "mixingHeight", "windDirection"
-    ]
+MEDIUM_PRIORITY_WEATHER_FEATURES = [
+    "apparentTemperature", "iceAccumulation", "transportWindSpeed",
+    "mixingHeight", "windDirection"
+]
 
+PRIORITY_WEATHER_FEATURES = ESSENTIAL_WEATHER_FEATURES + HIGH_PRIORITY_WEATHER_FEATURES + MEDIUM_PRIORITY_WEATHER_FEATURES
+
+def select_priority_features(weather_df):
     # Check available columns
     available_columns = [col for col in weather_df.columns
-                         if any(feature in col for feature in
-                               essential_features + high_priority + medium_priority)]
+                         if any(feature in col for feature in PRIORITY_WEATHER_FEATURES)]
 
     # Select columns, adding 'timestamp', 'county', 'fips' if present
     base_cols = ['timestamp', 'county', 'fips']
@@ -524,23 +449,23 @@ def fetch_weather_alerts(county_fips, date=None):
         print(f"Error fetching alerts: {e}")
         return None
 
-def prepare_features_with_weather(combined_df):
+def prepare_features_with_weather(combined_df, exposure=None):
     """
     Prepare features for the prediction model including weather data
 
     Args:
         combined_df (pd.DataFrame): Combined outage and weather data
+        exposure (ExposureGrid, optional): Outage hours per county; negatives are kept out of them
 
     Returns:
-        tuple: X (features) and y (labels) for model training
+        tuple: X (features), y (labels) and the fitted FeatureEncoder (None if there is no data)
     """
     import pandas as pd
     import numpy as np
-    from datetime import datetime, timedelta
 
     # Return empty data if input is empty
     if combined_df.empty:
-        return pd.DataFrame(), pd.Series()
+        return pd.DataFrame(), pd.Series(), None
 
     # Create a copy to avoid modifying the original
     df = combined_df.copy()
@@ -573,146 +498,41 @@ def prepare_features_with_weather(combined_df):
             df['age_bin'] = pd.cut(
                 df['infrastructure_age'],
                 bins=[0, 5, 10, 20, 30, 100],
-                labels=['0-5', '6-10', '11-20', '21-30', '30+']
+                labels=['0-5', '6-10', '11-20', '21-30', '30_plus']
             )
-            # One-hot encode age bins
-            try:
-                age_dummies = pd.get_dummies(df['age_bin'], prefix='age', dummy_na=False)
-                df = pd.concat([df, age_dummies], axis=1)
-            except Exception as e:
-                print(f"Error creating age dummies: {e}")
-
-    # One-hot encode categorical variables
-    categorical_cols = [col for col in ['county', 'season', 'infrastructure_type',
-                                     'infrastructure_condition']
-                     if col in df.columns]
 
-    for col in categorical_cols:
-        try:
-            df[col] = df[col].astype(str)
-            dummies = pd.get_dummies(df[col], prefix=col, dummy_na=False)
-            # Clean column names for compatibility
-            dummies.columns = [col_name.replace(" ", "_").replace("-", "_").lower()
-                            for col_name in dummies.columns]
-            df = pd.concat([df, dummies], axis=1)
-        except Exception as e:
-            print(f"Error creating dummies for {col}: {e}")
-
-    # Generate negative examples (non-outage events)
-    non_outages = []
-
-    for _, outage in df.iterrows():
-        try:
-            non_outage = outage.copy()
-
-            # Shift time by a random amount (1-30 days)
-            day_shift = np.random.randint(1, 30)
-            shift_direction = 1 if np.random.random() > 0.5 else -1
-
-            # Make sure we're working with datetime objects
-            if 'start_time' in non_outage:
-                if isinstance(non_outage['start_time'], str):
-                    non_outage_time = datetime.strptime(non_outage['start_time'], '%Y-%m-%d %H:%M:%S')
-                elif pd.isna(non_outage['start_time']):
-                    # Skip if start_time is missing
-                    continue
-                else:
-                    non_outage_time = non_outage['start_time']
-
-                non_outage_time = non_outage_time + timedelta(days=day_shift * shift_direction)
-                non_outage['start_time'] = non_outage_time
-
-                # Update derived time features if they exist
-                if 'month' in non_outage:
-                    non_outage['month'] = non_outage_time.month
-                if 'day_of_week' in non_outage:
-                    non_outage['day_of_week'] = non_outage_time.weekday()
-                if 'hour_of_day' in non_outage:
-                    non_outage['hour_of_day'] = non_outage_time.hour
-                if 'sin_month' in non_outage:
-                    non_outage['sin_month'] = np.sin(2 * np.pi * non_outage_time.month / 12)
-                if 'cos_month' in non_outage:
-                    non_outage['cos_month'] = np.cos(2 * np.pi * non_outage_time.month / 12)
-
-            # Modify weather values slightly to reflect non-outage conditions
-            weather_cols = [col for col in non_outage.index if isinstance(col, str) and
-                          col.startswith('weather_') and not isinstance(non_outage[col], pd.Series)]
-            for col in weather_cols:
-                try:
-                    if pd.notna(non_outage[col]) and isinstance(non_outage[col], (int, float)):
-                        # Decrease extreme values to make conditions less severe
-                        if 'wind' in col or 'precip' in col:
-                            non_outage[col] *= 0.7  # Reduce precipitation and wind by 30%
-                except Exception as e:
-                    print(f"Error modifying weather values for column {col}: {e}")
-
-            # Set target to 0 (no outage)
-            non_outage['outage_occurred'] = 0
-
-            non_outages.append(non_outage)
-        except Exception as e:
-            print(f"Error generating non-outage example: {e}")
-            continue
-
-    # Combine outage and non-outage data
-    if non_outages:
-        try:
-            all_data = pd.concat([df, pd.DataFrame(non_outages)], ignore_index=True)
-        except Exception as e:
-            print(f"Error combining outage and non-outage data: {e}")
-            all_data = df
-    else:
+    # Generate negative examples (non-outage events): shifted copies with calmer weather
+    try:
+        non_outages = sample_negatives(df, seed=NEGATIVE_SEED, exposure=exposure)
+        all_data = pd.concat([df, non_outages], ignore_index=True)
+    except Exception as e:
+        print(f"Error generating non-outage examples: {e}")
         all_data = df
 
     # Select features for model - ensure we're only using strings as column names
     weather_features = [col for col in all_data.columns
-                      if isinstance(col, str) and col.startswith('weather_')]
-
-    # Check if time features exist in the data
-    valid_time_features = []
-    for feature in ['month', 'day_of_week', 'hour_of_day', 'sin_month', 'cos_month']:
-        if feature in all_data.columns:
-            valid_time_features.append(feature)
-    time_features = valid_time_features
-
-    infra_features = [col for col in all_data.columns
-                     if isinstance(col, str) and
-                     (col.startswith('age_') or col.startswith('infrastructure_'))]
-
-    county_features = [col for col in all_data.columns
-                      if isinstance(col, str) and col.startswith('county_')]
-
-    season_features = [col for col in all_data.columns
-                      if isinstance(col, str) and col.startswith('season_')]
-
-    # Combine all feature groups
-    feature_cols = (weather_features + time_features + infra_features +
-                  county_features + season_features)
-
-    # Keep only columns that exist in the data
-    feature_cols = [col for col in feature_cols if col in all_data.columns]
-
-    # Create X and y for model training
-    X = all_data[feature_cols].copy()
-    y = all_data['outage_occurred'].copy()
-
-    # Convert boolean columns to int
-    for col in X.columns:
-        if X[col].dtype == bool:
-            X[col] = X[col].astype(int)
+                      if isinstance(col, str) and col.startswith('weather_')
+                      and pd.api.types.is_numeric_dtype(all_data[col])]
+    time_features = ['month', 'day_of_week', 'hour_of_day', 'sin_month', 'cos_month']
+    infra_features = ['infrastructure_age']
+
+    # Fit the encoding (column order, one-hot vocabularies, compact dtypes) and encode every row
+    # straight into float32 / small-int / uint8 columns, NaN -> 0 on conversion; the encoder is
+    # saved with the model so serving builds the same columns
+    encoder = FeatureEncoder.fit(
+        all_data,
+        numeric=weather_features + time_features + infra_features,
+        categorical=['county', 'season', 'infrastructure_type', 'infrastructure_condition', 'age_bin'],
+        prefixes={'age_bin': 'age'},
+    )
+    X = encoder.transform_frame(all_data).reset_index(drop=True)
+    y = all_data['outage_occurred'].reset_index(drop=True)
 
-    # Handle any remaining NaN values
-    X = X.fillna(0)
-    # Then explicitly convert to appropriate types
-    X = X.infer_objects(copy=False)  # Address the pandas FutureWarning
-    
     if not X.empty:
-        combined_df = X.copy()
-        combined_df['outage_occurred'] = y
-        combined_df.to_csv('bigquery_training_data.csv', index=False)
-        print(f"Exported {len(combined_df)} records to bigquery_training_data.csv")
+        X.assign(outage_occurred=y).to_csv('bigquery_training_data.csv', index=False)
+        print(f"Exported {len(X)} records to bigquery_training_data.csv")
 
-    return X, y
+    return X, y, encoder
 
 
 
@@ -734,16 +554,17 @@ def build_and_train_model(X, y, test_size=0.2, validation_size=0.25):
         print("Error: Empty input data")
         return None, {"error": "Empty input data"}
 
-    # Ensure all column names are strings
-    X = X.copy()
-    X.columns = [str(col) for col in X.columns]
+    # Ensure all column names are strings (set_axis does not copy the data)
+    X = X.set_axis([str(col) for col in X.columns], axis=1)
 
-    # Ensure there are no NaN values
-    for col in X.columns:
-        X[col] = np.where(pd.isna(X[col]), 0, X[col])
+    # Ensure there are no NaN values. Frames from FeatureEncoder.transform_frame have none, so
+    # only columns that still hold NaN are filled (and copied)
+    nan_cols = [col for col in X.columns if X[col].dtype.kind in "fO" and X[col].isna().any()]
+    if nan_cols:
+        X[nan_cols] = X[nan_cols].fillna(0)
 
     # Convert any Series to strings where appropriate
-    for col in X.columns:
+    for col in X.select_dtypes(include="object").columns:
         if isinstance(X[col].iloc[0], pd.Series):
             print(f"Converting Series column: {col}")
             X[col] = X[col].apply(lambda s: str(s) if isinstance(s, pd.Series) else s)
@@ -767,9 +588,10 @@ def build_and_train_model(X, y, test_size=0.2, validation_size=0.25):
 
     # Create TF Datasets using numpy arrays with larger batch size to avoid the warning
     try:
-        # Convert X DataFrames to dictionaries of numpy arrays
+        # Convert X DataFrames to dictionaries of float32 arrays: the compact training columns
+        # are widened once, per split, to the float32 inputs the serving backends feed the model
         def df_to_dict(df):
-            return {str(col): df[col].values for col in df.columns}
+            return {str(col): df[col].to_numpy(dtype=np.float32) for col in df.columns}
 
         train_features = df_to_dict(X_train)
         val_features = df_to_dict(X_val)
@@ -883,6 +705,38 @@ def build_and_train_model(X, y, test_size=0.2, validation_size=0.25):
 
     return model, evaluation_dict
 
+def save_model(model, model_dir='models', version='outage_model_v2', feature_encoder=None):
+    """
+    Save the trained model so api.py can serve it in-process (PREDICTION_BACKEND=local)
+
+    Args:
+        model: Trained TensorFlow Decision Forests model
+        model_dir (str): Directory to save the model
+        version (str): Model version, used as the subdirectory name
+        feature_encoder (FeatureEncoder, optional): Encoding the model was trained with, saved
+            in the same version directory
+
+    Returns:
+        str: Path to saved model
+    """
+    save_path = os.path.join(model_dir, version)
+    os.makedirs(model_dir, exist_ok=True)
+    model.save(save_path)
+    if feature_encoder is not None:
+        save_feature_encoder(feature_encoder, model_dir, version)
+    return save_path
+
+def save_feature_encoder(feature_encoder, model_dir='models', version='outage_model_v2'):
+    """
+    Save the fitted feature encoder in the model version directory, where api.py loads it
+
+    Returns:
+        str: Path to the saved encoder
+    """
+    save_path = os.path.join(model_dir, version)
+    os.makedirs(save_path, exist_ok=True)
+    return feature_encoder.save(save_path)
+
 # src/main.py
 def main(start_date='2022-01-01', end_date='2022-12-31'):
     """
@@ -924,6 +778,10 @@ def main(start_date='2022-01-01', end_date='2022-12-31'):
         tn_data = load_tennessee_data()
         processed_df = tn_data['processed_df']
 
+        # County x hour bitset of every outage, so negatives never fall inside a real one
+        exposure = build_exposure_grid(tn_data['merged_df']).save(DEFAULT_EXPOSURE_PATH)
+        print(f"Saved outage exposure grid to {DEFAULT_EXPOSURE_PATH}: {exposure.stats_summary()}")
+
         # 2. Filter data for the specified date range
         processed_df['start_time'] = pd.to_datetime(processed_df['start_time'])
         date_filtered_df = processed_df[
@@ -933,28 +791,44 @@ def main(start_date='2022-01-01', end_date='2022-12-31'):
 
         print(f"Filtered data to {len(date_filtered_df)} outages between {start_date} and {end_date}")
 
-        # 3. Get county coordinates
-        county_coords = get_county_coordinates()
-        print(f"Found {len(county_coords)} counties with coordinate data")
-
-        # 4. Fetch weather data for each county
-        print("Fetching weather data for all counties...")
-        county_weather = fetch_weather_for_counties(county_coords, start_date, end_date)
-        print(f"Successfully fetched weather data for {len(county_weather)} counties")
-
-        # 5. Clean and select priority features from weather data
-        print("Cleaning and selecting priority weather features...")
-        for county, weather_df in county_weather.items():
-            # Clean NaN values
-            weather_df = clean_weather_data(weather_df)
-            # Select priority features
-            weather_df = select_priority_features(weather_df)
-            # Update the dictionary with cleaned data
-            county_weather[county] = weather_df
-
-        # 6. Combine outage and weather data
-        print("Combining outage and weather data...")
-        combined_df = combine_outage_and_weather_hybrid(date_filtered_df, county_weather)
+        weather_archive = WeatherArchive()
+        if weather_archive.partitions:
+            # 3-6. Join each outage to the archived weather at its hour (see weather_archive.py)
+            print(f"Joining outages to archived historical weather ({weather_archive.stats()['partitions']} partitions)...")
+            archive_columns = [c for c in weather_archive.columns if c in PRIORITY_WEATHER_FEATURES] or None
+            combined_df = weather_archive.join_outages(date_filtered_df, archive_columns)
+            archived = [c for c in combined_df.columns if c.startswith('weather_')]
+            combined_df = combined_df.dropna(subset=archived, how='all').reset_index(drop=True)
+
+            # Seasonal medians per county/day for serving defaults
+            build_from_archive(weather_archive, archive_columns).save(DEFAULT_CLIMATOLOGY_PATH)
+            print(f"Saved climatology cube to {DEFAULT_CLIMATOLOGY_PATH}")
+        else:
+            # 3. Get county coordinates
+            county_coords = get_county_coordinates()
+            print(f"Found {len(county_coords)} counties with coordinate data")
+
+            # 4. Fetch weather data for each county
+            print("Fetching weather data for all counties...")
+            county_weather = fetch_weather_for_counties(county_coords, start_date, end_date)
+            print(f"Successfully fetched weather data for {len(county_weather)} counties")
+
+            # 5. Clean and select priority features from weather data
+            print("Cleaning and selecting priority weather features...")
+            for county, weather_df in county_weather.items():
+                # Clean NaN values
+                weather_df = clean_weather_data(weather_df)
+                # Select priority features
+                weather_df = select_priority_features(weather_df)
+                # Update the dictionary with cleaned data
+                county_weather[county] = weather_df
+
+            # 6. Combine outage and weather data through the county x day-of-year climatology
+            # cube, which is saved so the API can use the same medians as serving defaults
+            print("Combining outage and weather data...")
+            climatology_cube = build_cube(county_weather).save(DEFAULT_CLIMATOLOGY_PATH)
+            print(f"Saved climatology cube to {DEFAULT_CLIMATOLOGY_PATH}")
+            combined_df = combine_outage_and_weather_hybrid(date_filtered_df, county_weather, climatology_cube)
         print(f"Created combined dataset with {len(combined_df)} records")
 
         if combined_df.empty:
@@ -965,29 +839,22 @@ def main(start_date='2022-01-01', end_date='2022-12-31'):
 
         # 7. Add alert data if available
         try:
-            print("Fetching weather alerts for counties...")
-            alert_count = 0
-            for idx, row in combined_df.iterrows():
-                if 'fips' in row and pd.notna(row['fips']):
-                    try:
-                        fips = str(int(row['fips']))
-
-                        # Get alerts for this county
-                        alerts = fetch_weather_alerts(fips)
-
-                        if alerts and 'features' in alerts:
-                            # Count alerts by type
-                            alert_types = [feature['properties']['event'] for feature in alerts['features']]
-                            combined_df.at[idx, 'weather_alert_count'] = len(alert_types)
-
-                            # Flag severe alerts
-                            severe_types = ['Tornado', 'Severe Thunderstorm', 'Flood', 'Winter Storm']
-                            combined_df.at[idx, 'weather_severe_alert'] = any(t in severe_types for t in alert_types)
-                            alert_count += 1
-                    except Exception as alert_err:
-                        print(f"Error processing alert for FIPS {row.get('fips', 'unknown')}: {alert_err}")
-                        continue
-
+            print("Fetching active weather alerts for the state...")
+            if 'fips' in combined_df.columns:
+                # One statewide request (or one per distinct zone if that fails), joined onto
+                # every row at once
+                try:
+                    alerts = weather_alerts.fetch_active_alerts('TN')
+                except requests.exceptions.RequestException as state_err:
+                    print(f"Statewide alert fetch failed ({state_err}); fetching per zone")
+                    zones = weather_alerts.zone_ids_from_fips(combined_df['fips']).dropna().unique()
+                    alerts = weather_alerts.fetch_zone_alerts(zones)
+                zone_table = weather_alerts.alert_zone_table(alerts)
+                combined_df = weather_alerts.join_alerts(combined_df, zone_table)
+                alert_count = int((combined_df['weather_alert_count'] > 0).sum())
+                print(f"Active alerts in {len(zone_table)} zones")
+            else:
+                alert_count = 0
             print(f"Added alert data for {alert_count} records")
         except Exception as e:
             print(f"Error fetching alerts: {e}")
@@ -996,14 +863,15 @@ def main(start_date='2022-01-01', end_date='2022-12-31'):
 
         # 8. Prepare features for modeling
         print("Preparing features for modeling...")
-        X, y = prepare_features_with_weather(combined_df)
+        X, y, feature_encoder = prepare_features_with_weather(combined_df, exposure)
         print(f"Prepared features: {X.shape[0]} samples, {X.shape[1]} features")
+        if feature_encoder is not None:
+            # Kept with the model version the exported data trains, for serving
+            print(f"Saved feature encoder to {save_feature_encoder(feature_encoder)}")
             
         if not X.empty:
-            bigquery_df = X.copy()
-            bigquery_df['outage_occurred'] = y
-            bigquery_df.to_csv('bigquery_final_data.csv', index=False)
-            print(f"Exported final dataset with {len(bigquery_df)} records to bigquery_final_data.csv")
+            X.assign(outage_occurred=y).to_csv('bigquery_final_data.csv', index=False)
+            print(f"Exported final dataset with {len(X)} records to bigquery_final_data.csv")
             
             
 
@@ -1045,7 +913,7 @@ def main(start_date='2022-01-01', end_date='2022-12-31'):
         # UNCOMMENT IF ITS YOUR FIRST TIME SAVING THE MODEL
         # if model is not None:
         #     try:
-        #         save_path = save_model(model)
+        #         save_path = save_model(model, feature_encoder=feature_encoder)
         #         print(f"Model saved to {save_path}")
         #     except Exception as e:
         #         print(f"Error saving model: {e}")
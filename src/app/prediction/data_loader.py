@@ -76,6 +76,9 @@ from datetime import datetime
 import os
 import glob
 
+from feature_encoder import FeatureEncoder
+from interval_join import event_flags
+
 pd.set_option('display.max_columns', None)
 pd.set_option('display.max_rows', None)
 
@@ -512,41 +515,25 @@ def prepare_modeling_data(merged_df, events_df=None):
 
     # Add event flags if events data is available
     if events_df is not None and not events_df.empty:
-        # Create event type flags
-        event_types = events_df['Event Type'].unique()
-
-        # Initialize event flags as False
-        for event_type in event_types:
-            safe_col_name = event_type.lower().replace(' ', '_').replace('-', '_')
-            model_df[f'event_{safe_col_name}'] = False
-
-        # Match outages with events based on county and time
-        for idx, row in model_df.iterrows():
-            # Find matching events
-            matching_events = events_df[
-                (events_df['county'] == row['county']) &
-                (events_df['start_time'] <= row['start_time']) &
-                (events_df['end_time'] >= row['start_time'])
-            ]
-
-            # Set event flags
-            for _, event in matching_events.iterrows():
-                event_type = event['Event Type']
-                safe_col_name = event_type.lower().replace(' ', '_').replace('-', '_')
-                model_df.at[idx, f'event_{safe_col_name}'] = True
+        # Flag each outage with the types of the events in its county that were active when it
+        # started (sorted interval join, see interval_join.py)
+        flags = event_flags(
+            model_df, events_df,
+            column_of=lambda event_type: f"event_{event_type.lower().replace(' ', '_').replace('-', '_')}",
+        )
+        model_df[list(flags.columns)] = flags.to_numpy()
 
     # Add seasonal features for modeling
     model_df['sin_month'] = np.sin(2 * np.pi * model_df['month'] / 12)
     model_df['cos_month'] = np.cos(2 * np.pi * model_df['month'] / 12)
 
-    # One-hot encode categorical variables
-    if 'county' in model_df.columns:
-        county_dummies = pd.get_dummies(model_df['county'], prefix='county')
-        model_df = pd.concat([model_df, county_dummies], axis=1)
-
-    if 'season' in model_df.columns:
-        season_dummies = pd.get_dummies(model_df['season'], prefix='season')
-        model_df = pd.concat([model_df, season_dummies], axis=1)
+    # One-hot encode categorical variables with the same encoding training and serving use
+    # (feature_encoder.py), in one block
+    categorical = [col for col in ['county', 'season'] if col in model_df.columns]
+    if categorical:
+        encoder = FeatureEncoder.fit(model_df, numeric=[], categorical=categorical)
+        dummies = encoder.transform_frame(model_df)
+        model_df = pd.concat([model_df, dummies], axis=1)
 
     return model_df
 
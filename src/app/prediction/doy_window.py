@@ -0,0 +1,146 @@
+# app/doy_window.py
+# Day-of-year window medians of weather, and the join of outages onto them.
+#
+# Training matches each outage to the weather of its county around the same time of year: the
+# median of every numeric weather column over the days within +/-15 days of the outage's day of
+# year (wrapping around the new year). window_table precomputes those medians once per county for
+# all 366 days, so attaching weather to outages is a single merge on (county, day of year).
+#
+# Days of year are counted on a leap-year calendar (Mar 1 is always day 61), so the same date
+# maps to the same day in every year.
+
+import numpy as np
+import pandas as pd
+
+
+DAYS_IN_YEAR = 366
+WINDOW_DAYS = 15
+
+# Day of year of the first of each month in a leap year
+_MONTH_START = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+def leap_day_of_year(times):
+    """
+    Day of year (1-366) of each time on a leap-year calendar
+
+    Args:
+        times (pd.Series): datetime-like
+
+    Returns:
+        np.ndarray: int64 days (0 where the time is missing)
+    """
+    times = pd.to_datetime(times, errors="coerce")
+    month = times.dt.month.fillna(1).to_numpy(dtype=np.int64)
+    day = times.dt.day.fillna(0).to_numpy(dtype=np.int64)
+    return _MONTH_START[month - 1] + day
+
+
+def _numeric_columns(weather_df):
+    return [c for c in weather_df.select_dtypes(include="number").columns
+            if c not in ("timestamp", "county", "fips", "dayofyear")]
+
+
+def window_quantiles(weather_df, columns, quantiles, window_days=WINDOW_DAYS):
+    """
+    Quantiles of weather columns over a circular +/-window_days window, for each day of year
+
+    Args:
+        weather_df (pd.DataFrame): Weather rows with a timestamp column
+        columns (list): Columns to summarize (absent columns give NaN)
+        quantiles (list): Quantiles in [0, 1], e.g. [0.5]
+        window_days (int): Half-width of the window in days
+
+    Returns:
+        np.ndarray: (366, len(columns), len(quantiles)) float64, day 1 first; NaN where no
+            weather row falls in the window
+    """
+    result = np.full((DAYS_IN_YEAR, len(columns), len(quantiles)), np.nan)
+    if weather_df.empty or "timestamp" not in weather_df.columns:
+        return result
+
+    # Rows sorted by day of year, so each day's window is one or two contiguous slices
+    row_days = leap_day_of_year(weather_df["timestamp"])
+    order = np.argsort(row_days, kind="stable")
+    row_days = row_days[order]
+    values = np.full((len(order), len(columns)), np.nan)
+    for j, column in enumerate(columns):
+        if column in weather_df.columns:
+            values[:, j] = weather_df[column].to_numpy(dtype=float)[order]
+
+    for day in range(1, DAYS_IN_YEAR + 1):
+        lo, hi = day - window_days, day + window_days
+        bounds = [(max(lo, 1), min(hi, DAYS_IN_YEAR))]
+        if lo < 1:
+            bounds.append((lo + DAYS_IN_YEAR, DAYS_IN_YEAR))
+        if hi > DAYS_IN_YEAR:
+            bounds.append((1, hi - DAYS_IN_YEAR))
+        slices = [values[np.searchsorted(row_days, a):np.searchsorted(row_days, b, side="right")] for a, b in bounds]
+        window = slices[0] if len(slices) == 1 else np.concatenate(slices)
+        has_value = ~np.isnan(window).all(axis=0) if len(window) else np.zeros(len(columns), dtype=bool)
+        if has_value.any():
+            # nanquantile puts the quantile axis first: (quantiles, columns)
+            result[day - 1, has_value, :] = np.nanquantile(window[:, has_value], quantiles, axis=0).T
+    return result
+
+
+def window_medians(weather_df, window_days=WINDOW_DAYS):
+    """
+    Median of every numeric weather column over a circular +/-window_days window, for each day
+
+    Args:
+        weather_df (pd.DataFrame): Weather rows with a timestamp column
+        window_days (int): Half-width of the window in days
+
+    Returns:
+        pd.DataFrame: 366 rows indexed by dayofyear (1-366), one column per numeric weather column;
+            NaN where no weather row falls in the window
+    """
+    columns = _numeric_columns(weather_df)
+    medians = window_quantiles(weather_df, columns, [0.5], window_days)[:, :, 0]
+    return pd.DataFrame(medians, columns=columns, index=pd.Index(np.arange(1, DAYS_IN_YEAR + 1), name="dayofyear"))
+
+
+def window_table(county_weather, window_days=WINDOW_DAYS):
+    """
+    Window medians for every county, ready to merge onto outages
+
+    Args:
+        county_weather (dict): County name -> weather DataFrame
+        window_days (int): Half-width of the window in days
+
+    Returns:
+        pd.DataFrame: county_key (lowercased county), dayofyear and weather_{column} columns;
+            only days with at least one median
+    """
+    tables = []
+    for county, weather_df in county_weather.items():
+        medians = window_medians(weather_df, window_days).dropna(how="all")
+        if medians.empty:
+            continue
+        medians = medians.add_prefix("weather_").reset_index()
+        medians.insert(0, "county_key", str(county).lower())
+        tables.append(medians)
+    if not tables:
+        return pd.DataFrame(columns=["county_key", "dayofyear"])
+    return pd.concat(tables, ignore_index=True)
+
+
+def join_window_table(outages, table, time_column="start_time", county_column="county"):
+    """
+    Attach each outage's county/day-of-year window medians in one merge
+
+    Counties are matched case-insensitively; outages with no matching county, time or window
+    are dropped.
+
+    Returns:
+        pd.DataFrame: outage columns followed by the weather_{column} columns
+    """
+    keys = pd.DataFrame({
+        "county_key": outages[county_column].astype(str).str.lower().where(outages[county_column].notna()).to_numpy(),
+        "dayofyear": leap_day_of_year(outages[time_column]),
+    })
+    keyed = pd.concat([outages.reset_index(drop=True), keys], axis=1)
+    keyed = keyed[pd.to_datetime(outages[time_column], errors="coerce").notna().to_numpy()]
+    joined = keyed.merge(table, on=["county_key", "dayofyear"], how="inner", sort=False)
+    return joined.drop(columns=["county_key", "dayofyear"]).reset_index(drop=True)
@@ -0,0 +1,242 @@
+# app/exposure_grid.py
+# County x hour bitset of when each county had an outage in progress.
+#
+# Every outage in the merged EAGLE-I data covers the hours from its start to start + duration.
+# build_exposure_grid rasterizes all of them at once with difference arrays (+1 at the first
+# hour, -1 after the last, cumulative sum per county) and packs the result to one bit per
+# county-hour: 95 counties x 2014-2022 is about 7.5M cells, under 1 MB on disk. Membership is an
+# index computation and a bit test, and outage-free county-hours can be sampled directly, so
+# training can draw genuine negatives at any ratio without scanning DataFrames.
+#
+# Layout:
+#   {root}/bits.<version>.npy   uint8 (counties, ceil(hours / 8)), np.packbits along the hour axis
+#   {root}/index.json           {"bits_file": "bits.<version>.npy", "counties": [...],
+#                                "start": "2014-01-01T00", "hours": N, ...}
+#
+# As for the climatology cube, index.json names its bitset so a save swaps both with one rename.
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_EXPOSURE_PATH = os.environ.get("EXPOSURE_GRID_PATH", "data/exposure_grid")
+
+# Same years as data_loader.load_merged_data
+DEFAULT_START = "2014-01-01"
+DEFAULT_END = "2023-01-01"
+
+
+def _hours(times):
+    # datetime-like Series -> datetime64[h] (UTC if tz-aware); NaT stays NaT
+    times = pd.to_datetime(times, errors="coerce")
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert(None)
+    return times.to_numpy(dtype="datetime64[ns]").astype("datetime64[h]")
+
+
+class ExposureGrid:
+    """
+    Args:
+        bits (np.ndarray): Packed uint8 (counties, ceil(hours / 8)); a set bit is an outage hour
+        counties (list): County names in row order (matched case-insensitively)
+        start (str or np.datetime64): First hour of the grid
+        hours (int): Number of hours covered
+        metadata (dict, optional): Extra index fields (build time, outage count, ...)
+    """
+
+    def __init__(self, bits, counties, start, hours, metadata=None):
+        self.bits = bits
+        self.counties = [str(c).strip() for c in counties]
+        self.start = np.datetime64(start, "h")
+        self.hours = int(hours)
+        self.metadata = metadata or {}
+        self.county_index = pd.Index([c.lower() for c in self.counties])
+
+    @classmethod
+    def load(cls, root=DEFAULT_EXPOSURE_PATH):
+        """
+        Open a saved grid memory-mapped
+
+        Raises:
+            OSError: if the grid has not been built
+        """
+        for attempt in range(3):
+            with open(os.path.join(root, "index.json")) as f:
+                index = json.load(f)
+            try:
+                bits = np.load(os.path.join(root, index.pop("bits_file", "bits.npy")), mmap_mode="r")
+                break
+            except FileNotFoundError:
+                # Two saves replaced the bitset since the index was read: read the new index
+                if attempt == 2:
+                    raise
+        return cls(bits, index.pop("counties"), index.pop("start"), index.pop("hours"), index)
+
+    def save(self, root=DEFAULT_EXPOSURE_PATH):
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(os.path.join(root, "index.json")) as f:
+                previous = json.load(f).get("bits_file")
+        except (OSError, ValueError):
+            previous = None
+
+        # New versioned bitset first, then the index naming it, swapped in with one rename
+        bits_file = f"bits.{time.time_ns()}.{os.getpid()}.npy"
+        np.save(os.path.join(root, bits_file), np.asarray(self.bits, dtype=np.uint8))
+        index = dict(self.metadata, bits_file=bits_file, counties=self.counties, start=str(self.start),
+                     hours=self.hours)
+        tmp_index = os.path.join(root, f"index.json.{os.getpid()}.tmp")
+        with open(tmp_index, "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_index, os.path.join(root, "index.json"))
+
+        # Keep the previous bitset for readers that read the old index just before the swap
+        for name in os.listdir(root):
+            if name.startswith("bits.") and name.endswith(".npy") and name not in (bits_file, previous, "bits.npy"):
+                os.remove(os.path.join(root, name))
+        return self
+
+    def positions(self, counties):
+        """Row of each county in the grid (-1 if unknown)"""
+        keys = pd.Series(np.asarray(counties, dtype=object)).astype(str).str.lower().str.strip()
+        return self.county_index.get_indexer(keys.to_numpy()).astype(np.int64)
+
+    def hour_offsets(self, times):
+        """Hour of each time relative to the grid start (outside [0, hours) or NaT -> -1)"""
+        hours = _hours(pd.Series(times))
+        offsets = (hours - self.start).astype(np.int64)
+        offsets[np.isnat(hours) | (offsets < 0) | (offsets >= self.hours)] = -1
+        return offsets
+
+    def occupied(self, positions, offsets):
+        """
+        Whether each (county row, hour offset) had an outage in progress
+
+        Pairs outside the grid (position or offset -1) are reported as not occupied.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        inside = (positions >= 0) & (offsets >= 0)
+        result = np.zeros(len(positions), dtype=bool)
+        row, hour = positions[inside], offsets[inside]
+        result[inside] = (np.asarray(self.bits[row, hour >> 3]) >> (7 - (hour & 7))) & 1 == 1
+        return result
+
+    def contains(self, counties, times):
+        """Whether each county had an outage in progress at each time"""
+        return self.occupied(self.positions(counties), self.hour_offsets(times))
+
+    def occupied_count(self):
+        """Number of county-hours with an outage in progress"""
+        return int(np.unpackbits(np.asarray(self.bits), axis=1, count=self.hours).sum()) if self.counties else 0
+
+    def sample_free(self, n, seed=None, rng=None, counties=None):
+        """
+        Draw outage-free county-hours uniformly (with replacement)
+
+        Args:
+            n (int): Number of samples
+            seed (int, optional): Seed of the Generator
+            rng (np.random.Generator, optional): Generator to draw from instead of a seeded one
+            counties (list, optional): Restrict to these counties
+
+        Returns:
+            pd.DataFrame: county and start_time (hour) columns; fewer than n rows only if no
+                county-hour is free
+        """
+        rng = rng or np.random.default_rng(seed)
+        rows = np.arange(len(self.counties)) if counties is None else self.positions(counties)
+        rows = rows[rows >= 0]
+        if len(rows):
+            free_fraction = 1 - np.unpackbits(np.asarray(self.bits[rows]), axis=1, count=self.hours).mean()
+        else:
+            free_fraction = 0.0
+
+        if free_fraction >= 0.5:
+            # Mostly free: draw uniformly and redraw the occupied cells
+            row_of = np.zeros(0, dtype=np.int64)
+            hour_of = np.zeros(0, dtype=np.int64)
+            while len(row_of) < n:
+                want = int((n - len(row_of)) / free_fraction * 1.1) + 16
+                r = rows[rng.integers(0, len(rows), want)]
+                h = rng.integers(0, self.hours, want)
+                free = ~self.occupied(r, h)
+                row_of, hour_of = np.r_[row_of, r[free]], np.r_[hour_of, h[free]]
+            row_of, hour_of = row_of[:n], hour_of[:n]
+        elif free_fraction > 0:
+            # Mostly occupied: enumerate the free cells and draw from them
+            cells = np.flatnonzero(~np.unpackbits(np.asarray(self.bits[rows]), axis=1, count=self.hours).astype(bool))
+            pick = cells[rng.integers(0, len(cells), n)]
+            row_of, hour_of = rows[pick // self.hours], pick % self.hours
+        else:
+            row_of = hour_of = np.zeros(0, dtype=np.int64)
+
+        return pd.DataFrame({
+            "county": np.asarray(self.counties, dtype=object)[row_of],
+            "start_time": (self.start + hour_of).astype("datetime64[ns]"),
+        })
+
+    def stats_summary(self):
+        cells = len(self.counties) * self.hours
+        occupied = self.occupied_count()
+        return {
+            "counties": len(self.counties),
+            "hours": self.hours,
+            "start": str(self.start),
+            "occupied_fraction": occupied / cells if cells else 0.0,
+            "bytes": int(np.asarray(self.bits).nbytes),
+            **self.metadata,
+        }
+
+
+def build_exposure_grid(merged_df, start=DEFAULT_START, end=DEFAULT_END, county_column="county",
+                        time_column="start_time", duration_column="duration"):
+    """
+    Rasterize outages onto a county x hour bitset
+
+    An outage occupies every hour it overlaps, from the hour of its start to the hour of
+    start + duration (at least its starting hour). Outages outside [start, end) are clipped.
+
+    Args:
+        merged_df (pd.DataFrame): Outages as returned by data_loader.load_merged_data
+        start, end (str): Grid bounds (end exclusive)
+        county_column, time_column (str): County name and start time columns
+        duration_column (str): Duration in hours (missing -> the starting hour only)
+
+    Returns:
+        ExposureGrid
+    """
+    first = np.datetime64(pd.Timestamp(start), "h")
+    hours = int((np.datetime64(pd.Timestamp(end), "h") - first).astype(np.int64))
+    valid = merged_df[county_column].notna() & pd.to_datetime(merged_df[time_column], errors="coerce").notna()
+    outages = merged_df[valid]
+    codes, counties = pd.factorize(outages[county_column].astype(str).str.strip())
+    codes = codes.astype(np.int64)
+
+    start_time = pd.to_datetime(outages[time_column], errors="coerce")
+    if start_time.dt.tz is not None:
+        start_time = start_time.dt.tz_convert(None)
+    duration = pd.to_numeric(outages[duration_column], errors="coerce").fillna(0).clip(lower=0) \
+        if duration_column in outages.columns else pd.Series(0.0, index=outages.index)
+    end_time = start_time + pd.to_timedelta(duration.to_numpy(), unit="h")
+
+    # Hour offsets [lo, hi) covered by each outage, clipped to the grid
+    lo = (start_time.to_numpy(dtype="datetime64[ns]").astype("datetime64[h]") - first).astype(np.int64)
+    hi = (end_time.dt.ceil("h").to_numpy(dtype="datetime64[ns]").astype("datetime64[h]") - first).astype(np.int64)
+    hi = np.maximum(hi, lo + 1)
+    inside = (hi > 0) & (lo < hours)
+    lo, hi, codes = np.clip(lo[inside], 0, hours), np.clip(hi[inside], 0, hours), codes[inside]
+
+    # Difference array per county: +1 at the first hour, -1 after the last
+    width = hours + 1
+    size = len(counties) * width
+    diff = np.bincount(codes * width + lo, minlength=size) - np.bincount(codes * width + hi, minlength=size)
+    active = np.cumsum(diff.reshape(len(counties), width), axis=1, dtype=np.int32)[:, :hours] > 0
+    bits = np.packbits(active, axis=1)
+
+    metadata = {"outages": int(inside.sum()), "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    return ExposureGrid(bits, list(counties), first, hours, metadata)
@@ -0,0 +1,280 @@
+# app/feature_encoder.py
+# Fitted feature encoding shared by training and serving.
+#
+# Training fits a FeatureEncoder on its feature frame: the numeric columns, the vocabulary of
+# every categorical column (e.g. county, season) and the resulting column order and dtypes. The
+# encoder is saved as JSON inside the model version directory (see combined_model.save_model),
+# and api.py builds its FeatureSchema from it, so the one-hot columns served are exactly the
+# ones the model was trained on.
+#
+# Encoding writes into one preallocated float32 matrix: numeric columns are copied, and each
+# categorical block is filled with a single scatter through precomputed token -> column maps,
+# instead of a get_dummies + concat per column.
+#
+# The recorded dtypes are compact: float32 for real-valued columns, the smallest signed int that
+# holds an integer column's training range (int8 for calendar fields), uint8 for flags and
+# one-hot columns. transform_frame builds the training frame directly in those dtypes, with
+# missing values set to 0 as each column is converted.
+#
+# Only numpy is imported at module level: serving loads the encoder without pulling in pandas.
+
+import json
+import os
+import re
+
+import numpy as np
+
+
+FEATURE_ENCODER_FILE = "feature_encoder.json"
+
+_NON_IDENTIFIER_RE = re.compile(r"[^a-z0-9_]")
+
+
+def category_token(value):
+    """
+    Column-name token of a category value, e.g. "Van Buren" -> "van_buren", "30+" -> "30_"
+
+    Every character outside [a-z0-9_] becomes "_", so one-hot column names are valid SQL
+    identifiers and BigQuery query parameter names.
+    """
+    return _NON_IDENTIFIER_RE.sub("_", str(value).strip().lower())
+
+
+def _compact_dtype(values):
+    # Smallest dtype holding a training column: uint8 flags, signed ints by range, else float32
+    kind = values.dtype.kind
+    if kind == "b":
+        return "uint8"
+    if kind in "iu" and len(values):
+        low, high = int(values.min()), int(values.max())
+        for dtype in ("int8", "int16", "int32"):
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return dtype
+        return "int64"
+    return "int8" if kind in "iu" else "float32"
+
+
+class FeatureEncoder:
+    """
+    Args:
+        numeric (list): Numeric columns, copied as-is (missing values -> 0)
+        categorical (dict): Categorical column -> vocabulary tokens, in column order
+        prefixes (dict, optional): Categorical column -> one-hot column prefix (default: the column)
+        dtypes (dict, optional): Output column -> numpy dtype name recorded at fit time
+    """
+
+    def __init__(self, numeric, categorical, prefixes=None, dtypes=None):
+        self.numeric = list(numeric)
+        self.categorical = {column: list(vocab) for column, vocab in categorical.items()}
+        self.prefixes = {column: (prefixes or {}).get(column, column) for column in self.categorical}
+
+        self.columns = list(self.numeric)
+        self._offsets = {}
+        self._token_index = {}
+        for column, vocab in self.categorical.items():
+            self._offsets[column] = len(self.columns)
+            self._token_index[column] = {token: i for i, token in enumerate(vocab)}
+            self.columns.extend(f"{self.prefixes[column]}_{token}" for token in vocab)
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self.dtypes = dtypes or {name: "float32" for name in self.columns}
+
+    def __len__(self):
+        return len(self.columns)
+
+    @classmethod
+    def fit(cls, df, numeric, categorical, prefixes=None):
+        """
+        Record the columns, vocabularies and dtypes of a training frame
+
+        Args:
+            df (pd.DataFrame): Training rows
+            numeric (list): Numeric columns to keep (absent ones are skipped)
+            categorical (list): Categorical columns to one-hot encode (absent ones are skipped);
+                vocabularies are the sorted tokens seen, or every category of a Categorical column
+            prefixes (dict, optional): Categorical column -> one-hot column prefix
+
+        Returns:
+            FeatureEncoder
+        """
+        import pandas as pd
+
+        numeric = [c for c in numeric if c in df.columns]
+        vocabularies = {}
+        for column in categorical:
+            if column not in df.columns:
+                continue
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = pd.Series(values.cat.categories)
+            tokens = {category_token(v) for v in values.dropna().unique()}
+            vocabularies[column] = sorted(tokens)
+
+        dtypes = {column: _compact_dtype(df[column]) for column in numeric}
+        encoder = cls(numeric, vocabularies, prefixes)
+        dtypes.update((name, "uint8") for name in encoder.columns[len(numeric):])
+        encoder.dtypes = dtypes
+        return encoder
+
+    def is_int(self, column):
+        """Whether a column was recorded with an integer (or flag) dtype"""
+        return np.dtype(self.dtypes.get(column, "float32")).kind in "biu"
+
+    def vocabulary(self, column):
+        """Vocabulary tokens of a categorical column (empty if it was not encoded)"""
+        return list(self.categorical.get(column, []))
+
+    def positions(self, column, values):
+        """
+        Position of each value in a column's vocabulary (-1 for unknown or missing)
+
+        Args:
+            column (str): Categorical column
+            values (array-like): Raw values
+
+        Returns:
+            np.ndarray: int64 positions
+        """
+        import pandas as pd
+
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        token_index = self._token_index[column]
+        # Tokenize each distinct value once; code -1 (missing) picks the trailing -1
+        lookup = np.array([token_index.get(category_token(u), -1) for u in uniques] + [-1], dtype=np.int64)
+        return lookup[codes]
+
+    def transform(self, df):
+        """
+        Encode a frame into a feature matrix
+
+        Args:
+            df (pd.DataFrame): Rows with (some of) the fitted columns; absent columns give zeros
+
+        Returns:
+            np.ndarray: C-contiguous (len(df), len(encoder)) float32 matrix in column order
+        """
+        import pandas as pd
+
+        n_rows = len(df)
+        X = np.zeros((n_rows, len(self.columns)), dtype=np.float32)
+        for i, column in enumerate(self.numeric):
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+                X[:, i] = np.nan_to_num(values, nan=0.0)
+
+        rows = np.arange(n_rows)
+        for column, offset in self._offsets.items():
+            if column not in df.columns:
+                continue
+            position = self.positions(column, df[column].to_numpy())
+            known = position >= 0
+            X[rows[known], offset + position[known]] = 1
+        return X
+
+    def transform_frame(self, df):
+        """
+        Encode a frame into a DataFrame with the recorded compact dtypes
+
+        Unlike to_frame(transform(df)), no wide float32 matrix is built first: each numeric
+        column is converted straight to its dtype (missing -> 0) and each one-hot block is one
+        uint8 array.
+
+        Args:
+            df (pd.DataFrame): Rows with (some of) the fitted columns; absent columns give zeros
+
+        Returns:
+            pd.DataFrame: Columns in encoder order, indexed like df
+        """
+        import pandas as pd
+
+        n_rows = len(df)
+        data = {}
+        for column in self.numeric:
+            dtype = np.dtype(self.dtypes.get(column, "float32"))
+            if column not in df.columns:
+                data[column] = np.zeros(n_rows, dtype=dtype)
+                continue
+            values = pd.to_numeric(df[column], errors="coerce")
+            if dtype.kind == "f":
+                data[column] = values.to_numpy(dtype=dtype, na_value=0)
+            else:
+                data[column] = values.to_numpy(dtype=np.float64, na_value=0).astype(dtype)
+
+        rows = np.arange(n_rows)
+        for column, offset in self._offsets.items():
+            vocab = self.categorical[column]
+            block = np.zeros((n_rows, len(vocab)), dtype=np.uint8)
+            if column in df.columns:
+                position = self.positions(column, df[column].to_numpy())
+                known = position >= 0
+                block[rows[known], position[known]] = 1
+            for j in range(len(vocab)):
+                data[self.columns[offset + j]] = block[:, j]
+        return pd.DataFrame(data, index=df.index)
+
+    def transform_one(self, record):
+        """
+        Encode a single dict (column -> raw value) into a feature row
+
+        Returns:
+            np.ndarray: 1-D float32 row in column order
+        """
+        row = np.zeros(len(self.columns), dtype=np.float32)
+        for i, column in enumerate(self.numeric):
+            value = record.get(column)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if not np.isnan(value):
+                row[i] = value
+        for column, offset in self._offsets.items():
+            if record.get(column) is not None:
+                position = self._token_index[column].get(category_token(record[column]), -1)
+                if position >= 0:
+                    row[offset + position] = 1
+        return row
+
+    def to_frame(self, X, index=None):
+        """Feature matrix -> DataFrame with the recorded column dtypes (for training/export)"""
+        import pandas as pd
+
+        frame = pd.DataFrame(X, columns=self.columns, index=index)
+        return frame.astype({name: self.dtypes.get(name, "float32") for name in self.columns})
+
+    def save(self, path):
+        """
+        Write the encoder as JSON (write-then-rename)
+
+        Args:
+            path (str): File path, or a model version directory to save FEATURE_ENCODER_FILE in
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, FEATURE_ENCODER_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "numeric": self.numeric,
+                "categorical": self.categorical,
+                "prefixes": self.prefixes,
+                "dtypes": self.dtypes,
+            }, f, indent=1)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a saved encoder
+
+        Args:
+            path (str): File path, or a model version directory holding FEATURE_ENCODER_FILE
+
+        Raises:
+            OSError: if no encoder was saved there
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, FEATURE_ENCODER_FILE)
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec["numeric"], spec["categorical"], spec.get("prefixes"), spec.get("dtypes"))
@@ -0,0 +1,300 @@
+# app/feature_schema.py
+# Fixed feature layout for the serving path.
+#
+# The schema is compiled once at import (see api.py): every feature name gets a fixed column
+# index, and requests are encoded by writing straight into a numpy row/matrix that starts
+# from a prefilled default row. Backends receive the matrix in schema order.
+#
+# With a climatology cube, weather features missing from a request take the county's median
+# for that day of year instead of the static statewide default.
+#
+# FeatureSchema.from_encoder takes the county/season vocabularies and any other trained columns
+# from the FeatureEncoder saved with the model (feature_encoder.py), so serving sends exactly
+# the columns training produced.
+
+import numpy as np
+from datetime import datetime
+
+from climatology import day_of_year, hour_day_of_year
+from feature_encoder import category_token
+
+
+# Time features computed from the request, in model order
+TIME_FEATURES = ["month", "sin_month", "cos_month", "day_of_week", "hour_of_day"]
+
+
+class FeatureSchema:
+    """
+    Column layout of the model input.
+
+    Args:
+        weather_spec (list): (model feature, request key, fallback request key, default) tuples
+        counties (list): Lowercase county names, one one-hot column each
+        seasons (list): Seasons with an explicit one-hot column
+        season_of_month (callable): Month number -> season name
+        climatology (ClimatologyCube, optional): Per county/day defaults for weather features
+            (features are matched by name without the "weather_" prefix)
+        extra (list, optional): (name, is_int) of further model columns requests cannot set;
+            they are always sent as 0
+    """
+
+    def __init__(self, weather_spec, counties, seasons, season_of_month, climatology=None, extra=None):
+        extra = list(extra or [])
+        self.names = (
+            [feature for feature, _, _, _ in weather_spec]
+            + ["weather_alert_count", "weather_severe_alert"]
+            + TIME_FEATURES
+            + [f"county_{c}" for c in counties]
+            + [f"season_{s}" for s in seasons]
+            + [name for name, _ in extra]
+        )
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.counties = list(counties)
+        self.county_index = {c: i for i, c in enumerate(self.counties)}
+
+        int_columns = {"weather_alert_count", "weather_severe_alert", "month", "day_of_week", "hour_of_day"}
+        int_columns.update(f"county_{c}" for c in counties)
+        int_columns.update(f"season_{s}" for s in seasons)
+        int_columns.update(name for name, is_int in extra if is_int)
+        self.is_int = np.array([name in int_columns for name in self.names])
+        self.bq_types = ["INT64" if is_int else "FLOAT64" for is_int in self.is_int]
+
+        # Default row: weather defaults filled in, everything else zero
+        self.default_row = np.zeros(len(self.names), dtype=np.float64)
+        self._weather_fields = []
+        for feature, key, fallback_key, default in weather_spec:
+            i = self.index[feature]
+            self.default_row[i] = default
+            self._weather_fields.append((i, key, fallback_key, default))
+
+        self._alert_count = self.index["weather_alert_count"]
+        self._severe_alert = self.index["weather_severe_alert"]
+        self._month = self.index["month"]
+        self._sin_month = self.index["sin_month"]
+        self._cos_month = self.index["cos_month"]
+        self._day_of_week = self.index["day_of_week"]
+        self._hour_of_day = self.index["hour_of_day"]
+        self._county_offset = self.index[f"county_{counties[0]}"] if counties else -1
+
+        # Column index of the season one-hot for each month, -1 if the season is the base case
+        # with no explicit column; index 0 (-1) stands for any month outside 1..12
+        self.season_column_by_month = np.full(13, -1, dtype=np.int64)
+        for month in range(1, 13):
+            season = season_of_month(month)
+            if season in seasons:
+                self.season_column_by_month[month] = self.index[f"season_{season}"]
+
+        # (schema column, cube feature) pairs, and cube position of each schema county
+        self.climatology = climatology
+        self._climate_fields = []
+        if climatology is not None:
+            for i, _, _, _ in self._weather_fields:
+                feature = climatology.feature_index.get(self.names[i][len("weather_"):], -1)
+                if feature >= 0:
+                    self._climate_fields.append((i, feature))
+            self._climate_county = np.array([climatology.county_position(c) for c in self.counties] + [-1], dtype=np.int64)
+
+    def season_columns(self, month):
+        """Season one-hot column per month (array or int); -1 for the base case and for months outside 1..12"""
+        month = np.asarray(month, dtype=np.int64)
+        return self.season_column_by_month[np.where((month >= 1) & (month <= 12), month, 0)]
+
+    @classmethod
+    def from_encoder(cls, encoder, weather_spec, season_of_month, climatology=None):
+        """
+        Schema matching the columns of a fitted training encoder
+
+        Counties and seasons come from the encoder's vocabularies, weather features the model
+        was not trained on are left out, and trained columns a request cannot set (e.g.
+        infrastructure or event flags) are sent as 0.
+
+        Args:
+            encoder (FeatureEncoder): Encoder saved with the model
+            weather_spec, season_of_month, climatology: See FeatureSchema
+
+        Returns:
+            FeatureSchema
+        """
+        trained = set(encoder.columns)
+        weather_spec = [spec for spec in weather_spec if spec[0] in trained]
+        counties = encoder.vocabulary("county")
+        seasons = encoder.vocabulary("season")
+        covered = {spec[0] for spec in weather_spec}
+        covered.update(["weather_alert_count", "weather_severe_alert"] + TIME_FEATURES)
+        covered.update(f"county_{c}" for c in counties)
+        covered.update(f"season_{s}" for s in seasons)
+        extra = [(name, encoder.is_int(name)) for name in encoder.columns if name not in covered]
+        return cls(weather_spec, counties, seasons, season_of_month, climatology, extra)
+
+    def __len__(self):
+        return len(self.names)
+
+    def county_position(self, county):
+        """Index of a county name in the one-hot block, or -1 if unknown"""
+        return self.county_index.get(category_token(county), -1)
+
+    def _fill_climatology(self, X, county_pos, days):
+        # Overwrite static weather defaults with the cube's county/day medians where known
+        if not self._climate_fields:
+            return
+        # county_pos -1 (unknown county) indexes the trailing -1 entry
+        values = self.climatology.lookup_many(self._climate_county[county_pos], days)
+        for i, feature in self._climate_fields:
+            column = values[:, feature]
+            X[:, i] = np.where(np.isnan(column), X[:, i], column)
+
+    @staticmethod
+    def _request_day(month, now, explicit_month):
+        # Day of year for a request: today, or the 15th of a month other than the current one
+        day = np.where(explicit_month & (month != now.month), 15, now.day)
+        return day_of_year(np.clip(month, 1, 12), day)
+
+    def encode_one(self, data, now=None):
+        """
+        Encode a single request dict into a feature row
+
+        Args:
+            data (dict): Request body (same keys as /api/predict)
+            now (datetime, optional): Reference time for missing month/day/hour
+
+        Returns:
+            np.ndarray: 1-D float64 row in schema order
+        """
+        now = now or datetime.now()
+        row = self.default_row.copy()
+        month = int(data.get("month", now.month))
+        county_pos = self.county_position(data.get("county", "Davidson"))
+
+        if self._climate_fields:
+            days = self._request_day(np.array([month]), now, np.array(["month" in data]))
+            self._fill_climatology(row[None, :], np.array([county_pos]), days)
+
+        for i, key, fallback_key, default in self._weather_fields:
+            if key in data:
+                row[i] = data[key]
+            elif fallback_key and fallback_key in data:
+                row[i] = data[fallback_key]
+
+        row[self._alert_count] = data.get("alertCount", 0)
+        row[self._severe_alert] = 1 if data.get("severeAlert", False) else 0
+
+        row[self._month] = month
+        row[self._sin_month] = np.sin(2 * np.pi * month / 12)
+        row[self._cos_month] = np.cos(2 * np.pi * month / 12)
+        # Python: Mon=0, Sun=6. BQ: Sun=1, Sat=7. Adjust if your training data used BQ's convention
+        row[self._day_of_week] = data.get("dayOfWeek", now.weekday())
+        row[self._hour_of_day] = data.get("hour", now.hour)
+
+        if county_pos >= 0:
+            row[self._county_offset + county_pos] = 1
+
+        season_col = int(self.season_columns(month))
+        if season_col >= 0:
+            row[season_col] = 1
+
+        return row
+
+    def encode(self, records, now=None):
+        """
+        Encode a list of request dicts into a feature matrix in one pass
+
+        Args:
+            records (list): Request dicts
+            now (datetime, optional): Reference time for missing month/day/hour
+
+        Returns:
+            np.ndarray: (len(records), len(schema)) float64 matrix, rows in input order
+        """
+        now = now or datetime.now()
+        n_rows = len(records)
+        X = np.tile(self.default_row, (n_rows, 1))
+        month = np.array([r.get("month", now.month) for r in records], dtype=np.int64)
+        county_pos = np.array([self.county_position(r.get("county", "Davidson")) for r in records], dtype=np.int64)
+
+        if self._climate_fields:
+            explicit_month = np.array(["month" in r for r in records], dtype=bool)
+            self._fill_climatology(X, county_pos, self._request_day(month, now, explicit_month))
+
+        for i, key, fallback_key, default in self._weather_fields:
+            # Absent keys keep the row's default (static, or from the climatology cube)
+            defaults = X[:, i]
+            if fallback_key:
+                X[:, i] = [r.get(key, r.get(fallback_key, d)) for r, d in zip(records, defaults)]
+            else:
+                X[:, i] = [r.get(key, d) for r, d in zip(records, defaults)]
+
+        X[:, self._alert_count] = [r.get("alertCount", 0) for r in records]
+        X[:, self._severe_alert] = [bool(r.get("severeAlert", False)) for r in records]
+
+        X[:, self._month] = month
+        X[:, self._sin_month] = np.sin(2 * np.pi * month / 12)
+        X[:, self._cos_month] = np.cos(2 * np.pi * month / 12)
+        X[:, self._day_of_week] = [r.get("dayOfWeek", now.weekday()) for r in records]
+        X[:, self._hour_of_day] = [r.get("hour", now.hour) for r in records]
+
+        # One-hot blocks are filled with a single scatter each
+        rows = np.arange(n_rows)
+        known = county_pos >= 0
+        X[rows[known], self._county_offset + county_pos[known]] = 1
+
+        season_col = self.season_columns(month)
+        has_season = season_col >= 0
+        X[rows[has_season], season_col[has_season]] = 1
+
+        return X
+
+    def encode_hourly(self, county, times, weather):
+        """
+        Encode an hourly weather series for one county into a feature matrix
+
+        Args:
+            county (str): County name
+            times (np.ndarray): datetime64 hours, one per row
+            weather (dict): Model feature name (e.g. "weather_windGust") -> float array aligned
+                with times; NaN or absent features take the schema default (or the climatology
+                median for the county and day)
+
+        Returns:
+            np.ndarray: (len(times), len(schema)) float64 matrix
+        """
+        times = np.asarray(times, dtype="datetime64[h]")
+        n_rows = len(times)
+        X = np.tile(self.default_row, (n_rows, 1))
+        county_pos = self.county_position(county)
+
+        if self._climate_fields:
+            self._fill_climatology(X, np.full(n_rows, county_pos), hour_day_of_year(times))
+
+        for i, _, _, default in self._weather_fields:
+            values = weather.get(self.names[i])
+            if values is not None:
+                X[:, i] = np.where(np.isnan(values), X[:, i], values)
+
+        month = times.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        X[:, self._month] = month
+        X[:, self._sin_month] = np.sin(2 * np.pi * month / 12)
+        X[:, self._cos_month] = np.cos(2 * np.pi * month / 12)
+        # 1970-01-01 was a Thursday; Mon=0 like datetime.weekday()
+        X[:, self._day_of_week] = (times.astype("datetime64[D]").astype(np.int64) + 3) % 7
+        X[:, self._hour_of_day] = times.astype(np.int64) % 24
+
+        if county_pos >= 0:
+            X[:, self._county_offset + county_pos] = 1
+
+        season_col = self.season_columns(month)
+        has_season = season_col >= 0
+        X[np.flatnonzero(has_season), season_col[has_season]] = 1
+
+        return X
+
+    def columns(self, X):
+        """Feature name -> column view of a feature matrix"""
+        X = np.atleast_2d(X)
+        return {name: X[:, i] for i, name in enumerate(self.names)}
+
+    def row_label(self, row):
+        """Readable 'county@hour' label for a feature row (used in monitoring output)"""
+        county_block = row[self._county_offset:self._county_offset + len(self.counties)]
+        hot = np.flatnonzero(county_block)
+        county = self.counties[hot[0]] if len(hot) else "unknown"
+        return f"{county}@{int(row[self._hour_of_day])}"
@@ -0,0 +1,113 @@
+# app/gridpoint_lookup.py
+# Persistent point -> gridpoint lookup table.
+#
+# The NOAA /points lookup (lat,lng -> gridId/gridX/gridY) is the first of the two requests behind
+# every forecast fetch, and its answer practically never changes for a county centroid. The table
+# is stored as JSON keyed by rounded lat/lng, loaded into memory once, and consulted before
+# /points is called. An entry is dropped only when NOAA answers its gridpoint URL with a redirect
+# or a 404.
+
+import json
+import os
+import threading
+
+import noaa_client
+from noaa_fetcher import iter_concurrent
+
+
+DEFAULT_LOOKUP_PATH = os.environ.get("GRIDPOINT_LOOKUP_PATH", "data/gridpoint_lookup.json")
+
+
+class GridpointLookup:
+    """
+    Args:
+        path (str): JSON file backing the table (created on first save)
+        precision (int): Decimal places lat/lng are rounded to in keys (NOAA /points uses 4)
+    """
+
+    def __init__(self, path=DEFAULT_LOOKUP_PATH, precision=4):
+        self.path = path
+        self.precision = precision
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.invalidations = 0
+        try:
+            with open(path) as f:
+                self._table = json.load(f)
+        except (OSError, ValueError):
+            self._table = {}
+
+    def __len__(self):
+        return len(self._table)
+
+    def key(self, lat, lng):
+        return f"{round(float(lat), self.precision):.{self.precision}f},{round(float(lng), self.precision):.{self.precision}f}"
+
+    def gridpoint_url(self, lat, lng, session=None, base_url=noaa_client.NOAA_API_URL, timeout=30):
+        """
+        Gridpoint URL for a location, calling /points only if the table has no entry
+
+        Returns:
+            str: e.g. https://api.weather.gov/gridpoints/OHX/50,57
+        """
+        key = self.key(lat, lng)
+        self.lookups += 1
+        entry = self._table.get(key)
+        if entry is not None:
+            self.hits += 1
+            return noaa_client.gridpoint_url(entry["gridId"], entry["gridX"], entry["gridY"], base_url)
+
+        grid_id, grid_x, grid_y = noaa_client.resolve_gridpoint(lat, lng, session, base_url, timeout)
+        with self._lock:
+            self._table[key] = {"gridId": grid_id, "gridX": grid_x, "gridY": grid_y}
+            self._save()
+        return noaa_client.gridpoint_url(grid_id, grid_x, grid_y, base_url)
+
+    def peek(self, lat, lng, base_url=noaa_client.NOAA_API_URL):
+        """Gridpoint URL from the table only (no request), or None if the location is unknown"""
+        entry = self._table.get(self.key(lat, lng))
+        if entry is None:
+            return None
+        return noaa_client.gridpoint_url(entry["gridId"], entry["gridX"], entry["gridY"], base_url)
+
+    def invalidate(self, lat, lng):
+        """Drop a location's entry (its gridpoint URL redirected or returned 404)"""
+        with self._lock:
+            if self._table.pop(self.key(lat, lng), None) is not None:
+                self.invalidations += 1
+                self._save()
+
+    def build(self, locations, session=None, base_url=noaa_client.NOAA_API_URL, max_workers=8):
+        """
+        Resolve every location not yet in the table
+
+        Args:
+            locations (iterable): (lat, lng) pairs, e.g. from get_county_coordinates()
+        """
+        missing = [(lat, lng) for lat, lng in locations if self.key(lat, lng) not in self._table]
+        for (lat, lng), _, error in iter_concurrent(
+            missing, lambda point: self.gridpoint_url(point[0], point[1], session, base_url), max_workers
+        ):
+            if error is not None:
+                print(f"Error resolving gridpoint for {lat},{lng}: {error}")
+        return self
+
+    def _save(self):
+        # Called with the lock held; write-then-rename so a crash never leaves a torn file. The
+        # temp name is unique per process and thread, so two writers never share one
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._table, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        return {
+            "entries": len(self._table),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "invalidations": self.invalidations,
+        }
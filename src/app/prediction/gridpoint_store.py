@@ -0,0 +1,222 @@
+# app/gridpoint_store.py
+# Compressed, content-addressed store of NOAA gridpoint responses.
+#
+# Objects are stored gzip'd once per distinct content, addressed by the SHA-256 of their
+# uncompressed bytes: canonical JSON for put, the raw response body for fetch_stream. A small index maps each gridpoint ("OHX/50,57") to the versions seen, keyed by the payload's
+# updateTime. A stored version younger than ttl_seconds is served without a request.
+#
+# In replay mode nothing is fetched: every gridpoint is served from its latest stored version
+# (or the latest at or before replay_as_of), so training reruns do no network I/O and always
+# see the same payloads.
+#
+# Layout:
+#   {root}/index.json
+#   {root}/objects/ab/abcdef....json.gz
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from gridpoint_stream import STREAM_CHUNK_BYTES
+
+
+DEFAULT_STORE_PATH = os.environ.get("GRIDPOINT_STORE_PATH", "data/gridpoint_store")
+DEFAULT_TTL_SECONDS = int(os.environ.get("GRIDPOINT_STORE_TTL_SECONDS", 3600))
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when the store has no version of a gridpoint"""
+
+
+class GridpointStore:
+    """
+    Args:
+        root (str): Store directory (created on first write)
+        ttl_seconds (float): How long a stored version is served without refetching
+        replay (bool): Serve only stored versions and never fetch; defaults to WEATHER_REPLAY=1
+        replay_as_of (str, optional): In replay mode, use the latest version whose updateTime is
+            at or before this ISO time (pins a benchmark run to a snapshot)
+    """
+
+    def __init__(self, root=DEFAULT_STORE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, replay=None, replay_as_of=None):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.replay = os.environ.get("WEATHER_REPLAY", "0") == "1" if replay is None else replay
+        self.replay_as_of = replay_as_of or os.environ.get("WEATHER_REPLAY_AS_OF")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+        self.new_objects = 0
+        try:
+            with open(os.path.join(root, "index.json")) as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.json.gz")
+
+    def _write_object(self, chunks, parse=None):
+        """
+        Write an object from its uncompressed bytes, addressed by their SHA-256
+
+        The chunks are hashed and gzip'd to a temp file as they are read; an object already
+        stored under the same digest is kept and the temp file dropped.
+
+        Args:
+            chunks (iterable): Object bytes in chunks
+            parse (callable, optional): Consumes the chunks as they are written (e.g. decoding a
+                response body); any chunks it leaves are still stored
+
+        Returns:
+            tuple: (digest, result of parse or None)
+        """
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        tmp_path = os.path.join(self.root, "objects", f"object.{os.getpid()}.{threading.get_ident()}.tmp")
+        sha = hashlib.sha256()
+        try:
+            # mtime=0 keeps the compressed bytes reproducible
+            with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as out:
+                def tee(chunks):
+                    for chunk in chunks:
+                        sha.update(chunk)
+                        out.write(chunk)
+                        yield chunk
+
+                body = tee(chunks)
+                result = parse(body) if parse is not None else None
+                for _ in body:
+                    pass
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        digest = sha.hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            self.new_objects += 1
+        return digest, result
+
+    def _add_version(self, key, payload, digest):
+        update_time = payload.get("properties", {}).get("updateTime") or ""
+        with self._lock:
+            self._index.setdefault(key, {})[update_time] = {"sha256": digest, "fetched_at": time.time()}
+            self._save_index()
+
+    def put(self, key, payload):
+        """
+        Store a payload version for a gridpoint, as canonical JSON
+
+        Returns:
+            str: SHA-256 of the stored (uncompressed) canonical JSON
+        """
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+        digest, _ = self._write_object([body])
+        self._add_version(key, payload, digest)
+        return digest
+
+    def load(self, digest):
+        with gzip.open(self._object_path(digest), "rb") as f:
+            return json.load(f)
+
+    def latest(self, key, as_of=None):
+        """
+        Latest stored version of a gridpoint
+
+        Returns:
+            tuple: (updateTime, version dict with sha256 / fetched_at), or None
+        """
+        versions = self._index.get(key)
+        if not versions:
+            return None
+        update_times = sorted(t for t in versions if as_of is None or t <= as_of)
+        if not update_times:
+            return None
+        return update_times[-1], versions[update_times[-1]]
+
+    def fetch(self, key, fetch_payload):
+        """
+        Payload for a gridpoint: a fresh stored version, or fetch_payload() stored as a new version
+
+        Args:
+            key (str): Gridpoint key (see noaa_client.gridpoint_key)
+            fetch_payload (callable): () -> payload, called only when online and stale
+
+        Raises:
+            ReplayMissError: in replay mode, if the gridpoint was never stored
+        """
+        if self.replay:
+            latest = self.latest(key, self.replay_as_of)
+            if latest is None:
+                raise ReplayMissError(f"No stored gridpoint response for {key}")
+            self.hits += 1
+            return self.load(latest[1]["sha256"])
+
+        latest = self.latest(key)
+        if latest is not None and time.time() - latest[1]["fetched_at"] < self.ttl_seconds:
+            self.hits += 1
+            return self.load(latest[1]["sha256"])
+
+        payload = fetch_payload()
+        self.fetches += 1
+        if payload:
+            self.put(key, payload)
+        return payload
+
+    def fetch_stream(self, key, open_body, parse):
+        """
+        Like fetch, for payloads decoded incrementally (see gridpoint_stream.parse_gridpoint)
+
+        The raw body is written gzip'd to the store while parse consumes it, so the full payload
+        is kept on disk without ever being held in memory. Stored versions are parsed straight
+        from their gzip file. As for put, the object is addressed by the SHA-256 of the bytes
+        stored, here the raw body, so the same payload stored by put and by fetch_stream is
+        kept as two objects.
+
+        Args:
+            key (str): Gridpoint key (see noaa_client.gridpoint_key)
+            open_body (callable): () -> iterable of bytes chunks, called only when online and stale
+            parse (callable): iterable of bytes chunks -> payload
+
+        Raises:
+            ReplayMissError: in replay mode, if the gridpoint was never stored
+        """
+        latest = self.latest(key, self.replay_as_of if self.replay else None)
+        if self.replay and latest is None:
+            raise ReplayMissError(f"No stored gridpoint response for {key}")
+        if latest is not None and (self.replay or time.time() - latest[1]["fetched_at"] < self.ttl_seconds):
+            self.hits += 1
+            with gzip.open(self._object_path(latest[1]["sha256"]), "rb") as f:
+                return parse(iter(lambda: f.read(STREAM_CHUNK_BYTES), b""))
+
+        digest, payload = self._write_object(open_body(), parse)
+        self.fetches += 1
+        self._add_version(key, payload, digest)
+        return payload
+
+    def _save_index(self):
+        # Called with the lock held
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "index.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        return {
+            "gridpoints": len(self._index),
+            "versions": sum(len(v) for v in self._index.values()),
+            "replay": self.replay,
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "new_objects": self.new_objects,
+        }
@@ -0,0 +1,177 @@
+# app/gridpoint_stream.py
+# Incremental, projecting decoder for NOAA gridpoint payloads.
+#
+# A gridpoint document carries ~60 properties of several thousand interval values each; decoding
+# it with response.json() builds the whole object tree before extraction keeps a handful of them.
+# parse_gridpoint reads the body chunk by chunk and decodes it one property at a time, keeping
+# only the properties asked for (plus scalar metadata such as updateTime). Every other property
+# is skipped without being decoded: its brackets are matched (outside strings) and its text is
+# dropped as it is scanned, so memory per fetch is bounded by the chunk size plus the projected
+# properties, whatever the size of the payload.
+
+import codecs
+import json
+import re
+
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE_RE = re.compile(r"\s*")
+# Non-bracket text with whole strings; then the same with flat (innermost) containers too, so
+# that skipping a list of small objects takes one regex match per chunk rather than one step per
+# bracket. Stops at a bracket of a nested container, an unterminated string or the buffer end.
+_RUN = r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*'
+_SKIP_RE = re.compile(rf'{_RUN}(?:(?:\{{{_RUN}\}}|\[{_RUN}\]){_RUN})*')
+_CLOSING = {"[": "]", "{": "}"}
+# Characters that can follow a complete number or literal
+_DELIMITERS = " \t\r\n,:]}"
+
+
+class _Buffer:
+    """Text window over a byte-chunk iterator; text before pos is dropped on each read"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self):
+        """
+        Append the next chunk, dropping the text before pos
+
+        Raises:
+            ValueError: if the body already ended
+        """
+        if self.eof:
+            raise ValueError("Truncated gridpoint response")
+        try:
+            chunk = self._decoder.decode(next(self._chunks))
+        except StopIteration:
+            chunk = self._decoder.decode(b"", final=True)
+            self.eof = True
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        """Next non-whitespace character (not consumed)"""
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            self.more()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in gridpoint response, got {self.text[self.pos]!r}")
+        self.pos += 1
+
+    def read_value(self):
+        """
+        Decode the value starting at pos
+
+        The value is decoded by the C JSON scanner once it is fully buffered; while it is not,
+        the buffer is grown to at least twice its size before retrying, so a value spanning
+        many chunks is still decoded in linear time.
+        """
+        first = self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise ValueError("Malformed gridpoint response")
+            else:
+                # A number (or literal) that reaches the end of the buffer, or stops short of it at a
+                # partial fraction or exponent ("12." / "1e"), may continue in the next chunk
+                if self.eof or first in '"[{' or (end < len(self.text) and self.text[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            target = 2 * (len(self.text) - self.pos)
+            self.more()
+            while len(self.text) < target and not self.eof:
+                self.more()
+
+    def skip_value(self):
+        """
+        Consume the value starting at pos without decoding it
+
+        Scalars are decoded (they are small); containers are skipped by matching brackets
+        outside strings, dropping the skipped text chunk by chunk.
+
+        Raises:
+            ValueError: if the brackets do not match or the body ends inside the value
+        """
+        if self.peek() not in _CLOSING:
+            self.read_value()
+            return
+        closing = [_CLOSING[self.text[self.pos]]]
+        pos = self.pos + 1
+        while True:
+            pos = _SKIP_RE.match(self.text, pos).end()
+            if pos == len(self.text) or self.text[pos] == '"':
+                # Buffer ends mid-run or mid-string: keep only the unfinished string and read on
+                self.pos = pos
+                self.more()
+                pos = 0
+                continue
+            char = self.text[pos]
+            pos += 1
+            if char in _CLOSING:
+                closing.append(_CLOSING[char])
+            elif not closing or closing.pop() != char:
+                raise ValueError("Malformed gridpoint response")
+            elif not closing:
+                self.pos = pos
+                return
+
+    def iter_keys(self):
+        """Yield the keys of the object starting at pos; the caller consumes each value"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+def parse_gridpoint(chunks, properties):
+    """
+    Decode a gridpoint payload from its body chunks, keeping only the wanted properties
+
+    Args:
+        chunks (iterable): Body as bytes chunks, e.g. response.iter_content(STREAM_CHUNK_BYTES)
+        properties (iterable): NOAA property names to keep, e.g. "windGust"
+
+    Returns:
+        dict: Payload with the same layout as the full document, holding "properties" with the
+            wanted properties and scalar metadata (updateTime, validTimes, ...) only
+
+    Raises:
+        ValueError: if the body is not a complete JSON object
+    """
+    wanted = set(properties)
+    buffer = _Buffer(chunks)
+    payload = {}
+    for key in buffer.iter_keys():
+        if key == "properties" and buffer.peek() == "{":
+            props = payload["properties"] = {}
+            for prop in buffer.iter_keys():
+                if prop in wanted or buffer.peek() not in "[{":
+                    props[prop] = buffer.read_value()
+                else:
+                    buffer.skip_value()
+        elif buffer.peek() in "[{":
+            buffer.skip_value()
+        else:
+            payload[key] = buffer.read_value()
+    return payload
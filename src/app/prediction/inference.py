@@ -0,0 +1,350 @@
+# app/inference.py
+# Prediction backends used by api.py.
+#
+# Two ways of scoring a feature matrix are supported:
+#   - "bigquery": ML.PREDICT against the model exported to BigQuery ML (one remote job per call)
+#   - "local":    the TF-DF forest trained by combined_model.build_and_train_model, loaded once
+#                 at process start and scored in-process
+#
+# Both take a (rows, features) matrix laid out by a FeatureSchema (see feature_schema.py).
+# Each backend also has an offline stand-in (LocalBigQueryClient / StandInForestModel) so both
+# code paths can be exercised without GCP credentials or a trained model on disk.
+
+import os
+import re
+import time
+import numpy as np
+
+
+# --- Local (in-process) backend ---
+
+def load_local_model(model_path):
+    """
+    Load a TF-DF model saved from combined_model.build_and_train_model
+
+    Args:
+        model_path (str): Path to the SavedModel directory (see combined_model.save_model)
+
+    Returns:
+        Keras model that accepts a dict of feature name -> 1-D array
+    """
+    import tensorflow as tf
+    # Importing TF-DF registers the custom ops the SavedModel needs
+    import tensorflow_decision_forests as tfdf  # noqa: F401
+
+    return tf.keras.models.load_model(model_path)
+
+
+class LocalModelBackend:
+    """Scores feature matrices with an in-process model. No network I/O per request."""
+
+    name = "local_model"
+
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+
+    def predict_proba(self, X):
+        """
+        Score a feature matrix in one model call
+
+        Args:
+            X (np.ndarray): (rows, features) matrix in schema order
+
+        Returns:
+            np.ndarray: Outage probability for each row
+        """
+        X32 = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        inputs = self.schema.columns(X32)
+        probs = np.asarray(self.model(inputs, training=False))
+        # Binary TF-DF models return P(class 1) as a single column
+        if probs.ndim > 1 and probs.shape[1] > 1:
+            probs = probs[:, 1]
+        return probs.reshape(-1).astype(np.float64)
+
+    def predict_batch(self, X, timeout=None):
+        """
+        Score a feature matrix (timeout is accepted for interface parity; the circuit breaker bounds the wait)
+
+        Returns:
+            tuple: (is_outage_likely array, probability array), in row order
+        """
+        probabilities = self.predict_proba(X)
+        return probabilities > 0.5, probabilities
+
+    def predict(self, row, timeout=None):
+        """
+        Score a single feature row
+
+        Returns:
+            tuple: (is_outage_likely, probability)
+        """
+        probability = float(self.predict_proba(row)[0])
+        return probability > 0.5, probability
+
+
+class StandInForestModel:
+    """
+    Offline stand-in for the trained TF-DF model.
+
+    Takes the same dict-of-arrays input as the Keras model and returns a [n, 1]
+    probability array using the same thresholds as api.calculate_probability_simple.
+    """
+
+    def __call__(self, inputs, training=False):
+        n = len(next(iter(inputs.values())))
+        zeros = np.zeros(n, dtype=np.float32)
+        gust = np.asarray(inputs.get("weather_windGust", zeros))
+        speed = np.asarray(inputs.get("weather_windSpeed", zeros))
+        precip = np.asarray(inputs.get("weather_probabilityOfPrecipitation", zeros))
+
+        prob = np.full(n, 0.05)
+        prob += np.where(gust > 50, 0.4, np.where(gust > 30, 0.25, 0.0))
+        prob += np.where(speed > 35, 0.3, np.where(speed > 20, 0.15, 0.0))
+        prob += np.where(precip > 80, 0.15, np.where(precip > 50, 0.05, 0.0))
+        return np.minimum(0.95, prob).reshape(-1, 1)
+
+
+# --- BigQuery ML backend ---
+
+# Feature names are used as column aliases and query parameter names
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def build_predict_query(model_id, schema):
+    """
+    Build the ML.PREDICT query template for a feature schema
+
+    Every feature is bound as an ARRAY query parameter named after the feature (one element
+    per row), so the query text never changes between requests and single-row and batch
+    predictions share it. row_id is passed through ML.PREDICT to restore input order.
+
+    Args:
+        model_id (str): Fully qualified BigQuery ML model id
+        schema (FeatureSchema): Feature layout
+
+    Returns:
+        str: SQL query
+
+    Raises:
+        ValueError: if a feature name is not a valid identifier
+    """
+    invalid = [name for name in schema.names if not _IDENTIFIER_RE.fullmatch(name)]
+    if invalid:
+        raise ValueError(f"Feature names are not valid BigQuery identifiers: {invalid}")
+
+    feature_select_string = ",\n            ".join(
+        f"@{name}[OFFSET(row_id)] AS {name}" for name in schema.names
+    )
+
+    return f"""
+    SELECT
+      row_id,
+      predicted_outage_occurred,
+      predicted_outage_occurred_probs
+    FROM
+      ML.PREDICT(MODEL `{model_id}`,
+        (
+          SELECT
+            row_id,
+            {feature_select_string}
+          FROM UNNEST(GENERATE_ARRAY(0, ARRAY_LENGTH(@{schema.names[0]}) - 1)) AS row_id
+        )
+      )
+    ORDER BY row_id
+    """
+
+
+def outage_probability_from_row(prediction_row):
+    """Return P(outage_occurred = 1) from an ML.PREDICT result row"""
+    # predicted_outage_occurred_probs is an array of structs: [{label:0, prob:0.X}, {label:1, prob:0.Y}]
+    for prob_info in prediction_row.predicted_outage_occurred_probs:
+        if prob_info['label'] == 1: # Assuming 1 is the "outage occurred" label
+            return float(prob_info['prob'])
+    return 0.0
+
+
+class BigQueryMLBackend:
+    """Scores feature matrices by running ML.PREDICT in BigQuery."""
+
+    name = "bigquery_ml"
+
+    def __init__(self, client, model_id, schema):
+        self.client = client
+        self.model_id = model_id
+        self.schema = schema
+        # Built once; per-request work is only binding parameter values
+        self.query = build_predict_query(model_id, schema)
+
+    def _job_config(self, X):
+        from google.cloud import bigquery
+
+        int_columns = np.rint(X).astype(np.int64)
+        query_parameters = [
+            bigquery.ArrayQueryParameter(
+                name,
+                bq_type,
+                (int_columns[:, i] if bq_type == "INT64" else X[:, i]).tolist(),
+            )
+            for i, (name, bq_type) in enumerate(zip(self.schema.names, self.schema.bq_types))
+        ]
+        return bigquery.QueryJobConfig(query_parameters=query_parameters)
+
+    def predict_batch(self, X, timeout=None):
+        """
+        Score every row of a feature matrix with a single ML.PREDICT job
+
+        Args:
+            X (np.ndarray): (rows, features) matrix in schema order
+            timeout (float, optional): Seconds to wait for job submission and for results
+
+        Returns:
+            tuple: (is_outage_likely array, probability array), in row order
+        """
+        X = np.atleast_2d(X)
+        n_rows = X.shape[0]
+        query_job = self.client.query(self.query, job_config=self._job_config(X), timeout=timeout)
+        results = list(query_job.result(timeout=timeout))
+
+        if len(results) != n_rows:
+            # This case should ideally not happen if the query is well-formed and the model exists.
+            raise RuntimeError(f"Prediction query returned {len(results)} rows for {n_rows} inputs")
+
+        is_outage_likely = np.zeros(n_rows, dtype=bool)
+        probabilities = np.zeros(n_rows, dtype=np.float64)
+        for prediction_row in results:
+            # BQML returns 0 or 1 for predicted_outage_occurred
+            is_outage_likely[prediction_row.row_id] = prediction_row.predicted_outage_occurred == 1
+            probabilities[prediction_row.row_id] = outage_probability_from_row(prediction_row)
+        return is_outage_likely, probabilities
+
+    def predict(self, row, timeout=None):
+        """
+        Score a single feature row with ML.PREDICT
+
+        Returns:
+            tuple: (is_outage_likely, probability)
+        """
+        is_outage_likely, probabilities = self.predict_batch(row, timeout)
+        return bool(is_outage_likely[0]), float(probabilities[0])
+
+
+class _StandInRow:
+    def __init__(self, probability, row_id=0):
+        self.row_id = row_id
+        self.predicted_outage_occurred = 1 if probability > 0.5 else 0
+        self.predicted_outage_occurred_probs = [
+            {"label": 1, "prob": probability},
+            {"label": 0, "prob": 1.0 - probability},
+        ]
+
+
+class _StandInJob:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def result(self, timeout=None):
+        return iter(self._rows)
+
+
+class LocalBigQueryClient:
+    """
+    Offline stand-in for google.cloud.bigquery.Client.
+
+    Reads the array query parameters bound by BigQueryMLBackend, scores them with
+    StandInForestModel and returns rows shaped like ML.PREDICT output.
+    """
+
+    def __init__(self, model=None):
+        self.model = model or StandInForestModel()
+        self.queries = []
+
+    def query(self, query, job_config=None, timeout=None):
+        self.queries.append(query)
+        params = job_config.query_parameters if job_config is not None else []
+        columns = {p.name: np.asarray(p.values, dtype=np.float32) for p in params}
+        if not columns:
+            return _StandInJob([])
+        probabilities = self.model(columns).reshape(-1)
+        return _StandInJob([_StandInRow(float(p), i) for i, p in enumerate(probabilities)])
+
+
+class FaultInjectingBigQueryClient:
+    """
+    Offline BigQuery stand-in that injects latency and failures.
+
+    Wraps LocalBigQueryClient. Each query sleeps latency_seconds (bounded by the caller's
+    timeout, after which it raises TimeoutError like a job that did not finish in time) and fails
+    with probability error_rate. Both attributes can be changed at runtime to script outages.
+
+    Args:
+        error_rate (float): Probability that a query raises
+        latency_seconds (float): Added latency per query
+        seed (int, optional): Seed for the failure draws
+    """
+
+    def __init__(self, error_rate=0.0, latency_seconds=0.0, seed=None, inner=None):
+        self.error_rate = error_rate
+        self.latency_seconds = latency_seconds
+        self.inner = inner or LocalBigQueryClient()
+        self._rng = np.random.default_rng(seed)
+        self.injected_errors = 0
+        self.injected_timeouts = 0
+
+    @property
+    def queries(self):
+        return self.inner.queries
+
+    def query(self, query, job_config=None, timeout=None):
+        if timeout is not None and self.latency_seconds > timeout:
+            time.sleep(timeout)
+            self.injected_timeouts += 1
+            raise TimeoutError(f"Injected timeout: query exceeded {timeout}s")
+        time.sleep(self.latency_seconds)
+        if self._rng.random() < self.error_rate:
+            self.injected_errors += 1
+            raise RuntimeError("Injected BigQuery failure")
+        return self.inner.query(query, job_config=job_config, timeout=timeout)
+
+
+# --- Backend selection ---
+
+def create_backend(backend_name, schema, bq_client=None, model_id=None, model_path=None, offline=False,
+                   fault_error_rate=0.0, fault_latency_seconds=0.0):
+    """
+    Create the prediction backend selected by configuration
+
+    Args:
+        backend_name (str): "bigquery" or "local"
+        schema (FeatureSchema): Feature layout shared by api.py and the backend
+        bq_client: BigQuery client (ignored for the local backend)
+        model_id (str): BigQuery ML model id
+        model_path (str): Path to the saved TF-DF model for the local backend
+        offline (bool): Use the offline stand-ins instead of BigQuery / the saved model
+        fault_error_rate (float): Offline BigQuery only: fraction of queries that fail
+        fault_latency_seconds (float): Offline BigQuery only: latency added to each query
+
+    Returns:
+        Backend instance, or None if the selected backend is unavailable
+    """
+    if backend_name == "local":
+        if offline:
+            return LocalModelBackend(StandInForestModel(), schema)
+        if not model_path or not os.path.exists(model_path):
+            print(f"WARNING: Local model not found at '{model_path}'.")
+            return None
+        return LocalModelBackend(load_local_model(model_path), schema)
+
+    if backend_name == "bigquery":
+        if offline:
+            if fault_error_rate or fault_latency_seconds:
+                client = FaultInjectingBigQueryClient(fault_error_rate, fault_latency_seconds)
+            else:
+                client = LocalBigQueryClient()
+            return BigQueryMLBackend(client, model_id, schema)
+        if bq_client is None:
+            return None
+        return BigQueryMLBackend(bq_client, model_id, schema)
+
+    print(f"WARNING: Unknown prediction backend '{backend_name}'.")
+    return None
@@ -0,0 +1,101 @@
+# app/interval_join.py
+# Sorted interval join: which outages fall inside an event of each type in their county.
+#
+# County and time are packed into one int64 key (county code * span + seconds since the earliest
+# time). For each event type, the events' [start, end] keys are sorted and overlapping intervals
+# merged, leaving disjoint sorted intervals; a single searchsorted over all counties then finds,
+# for every outage, the last interval starting at or before it, and the outage is inside an
+# event iff that interval ends at or after it. Sorting and searching make the join
+# O((N + M) log M) per event type instead of scanning every event for every outage.
+
+import numpy as np
+import pandas as pd
+
+
+def _seconds(times):
+    # datetime-like Series -> int64 seconds since the epoch (UTC if tz-aware); NaT -> the minimum int64
+    times = pd.to_datetime(times, errors="coerce")
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert(None)
+    return times.to_numpy(dtype="datetime64[ns]").astype("datetime64[s]").astype(np.int64)
+
+
+def contained(points_county, points_time, events_county, events_start, events_end):
+    """
+    For each point, whether some event of the same county contains its time (start <= t <= end)
+
+    Args:
+        points_county (np.ndarray): int64 county code per point (-1 for unknown)
+        points_time (np.ndarray): int64 seconds per point
+        events_county, events_start, events_end (np.ndarray): int64 county code and bounds per event
+
+    Returns:
+        np.ndarray: bool per point
+    """
+    result = np.zeros(len(points_time), dtype=bool)
+    known = points_county >= 0
+    if not len(events_start) or not known.any():
+        return result
+    points_county, points_time = points_county[known], points_time[known]
+
+    # Pack (county, time) into one sortable key; span exceeds every time offset, so every key of
+    # a county sorts after every key of the counties before it
+    origin = min(events_start.min(), points_time.min())
+    span = max(events_end.max(), points_time.max()) - origin + 1
+    starts = events_county * span + (events_start - origin)
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    ends = (events_county * span + (events_end - origin))[order]
+
+    # Merge overlapping intervals: a new one begins where the start is past every earlier end
+    # (county boundaries always qualify, since keys of the next county are larger)
+    running_end = np.maximum.accumulate(ends)
+    breaks = np.flatnonzero(np.r_[True, starts[1:] > running_end[:-1]])
+    interval_start = starts[breaks]
+    interval_end = np.maximum.reduceat(ends, breaks)
+
+    point_key = points_county * span + (points_time - origin)
+    pos = np.searchsorted(interval_start, point_key, side="right") - 1
+    inside = pos >= 0
+    inside[inside] = interval_end[pos[inside]] >= point_key[inside]
+    result[known] = inside
+    return result
+
+
+def event_flags(outages, events, type_column="Event Type", county_column="county", time_column="start_time",
+                start_column="start_time", end_column="end_time", column_of=None):
+    """
+    Boolean flag per event type: the outage starts inside an event of that type in its county
+
+    Args:
+        outages (pd.DataFrame): Outages with county and start time
+        events (pd.DataFrame): Events with county, type, start and end time
+        column_of (callable, optional): Event type -> flag column name; types mapping to the same
+            column are combined
+
+    Returns:
+        pd.DataFrame: One bool column per flag, indexed like outages
+    """
+    column_of = column_of or (lambda event_type: f"event_{event_type}")
+    columns = {}
+    for event_type in events[type_column].dropna().unique():
+        columns.setdefault(column_of(event_type), []).append(event_type)
+
+    # Shared county codes for outages and events
+    counties = pd.Index(pd.unique(events[county_column].dropna()))
+    points_county = counties.get_indexer(outages[county_column]).astype(np.int64)
+    points_time = _seconds(outages[time_column])
+    points_county[points_time == np.iinfo(np.int64).min] = -1
+
+    valid = events[county_column].notna() & events[start_column].notna() & events[end_column].notna()
+    events = events[valid]
+    events_county = counties.get_indexer(events[county_column]).astype(np.int64)
+    events_start = _seconds(events[start_column])
+    events_end = _seconds(events[end_column])
+    events_type = events[type_column].to_numpy()
+
+    flags = np.zeros((len(outages), len(columns)), dtype=bool)
+    for j, types in enumerate(columns.values()):
+        of_type = np.isin(events_type, types)
+        flags[:, j] = contained(points_county, points_time, events_county[of_type], events_start[of_type], events_end[of_type])
+    return pd.DataFrame(flags, columns=list(columns), index=outages.index)
@@ -0,0 +1,162 @@
+# app/negative_sampler.py
+# Synthetic non-outage rows for training, generated in one vectorized pass.
+#
+# Every outage row yields NEGATIVES_PER_POSITIVE negatives on average: copies of the row moved by
+# a random whole number of days (1-29, either direction), with the derived time features
+# recomputed and the wind/precipitation weather columns damped to reflect calmer conditions.
+# A shifted copy that lands in an hour with a real outage in the same county is not a negative
+# at all, so candidates are checked against a hashed (county, hour) index of the outages and
+# redrawn a few times before being dropped. Given an exposure grid (exposure_grid.py), shifts
+# into any hour during which the county had an outage in progress are rejected as well.
+# Everything is drawn from one seeded Generator, so a training run can be reproduced exactly.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+NEGATIVES_PER_POSITIVE = float(os.environ.get("NEGATIVES_PER_POSITIVE", "1"))
+# Fixed by default so repeated training runs draw the same negatives; override to vary them
+NEGATIVE_SEED = int(os.environ.get("NEGATIVE_SEED", "42"))
+
+MAX_SHIFT_DAYS = 29
+MAX_REDRAWS = 5
+
+# Weather column substring -> multiplier applied to negatives
+DEFAULT_DAMPING = {"wind": 0.7, "precip": 0.7}
+
+_HOUR_BITS = 32
+
+
+def _hours(times):
+    # datetime-like Series -> int64 hours since the epoch (UTC if tz-aware); NaT -> the minimum int64
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert(None)
+    return times.to_numpy(dtype="datetime64[ns]").astype("datetime64[h]").astype(np.int64)
+
+
+class OutageHourIndex:
+    """
+    Hash set of the (county, hour) pairs with a real outage
+
+    Args:
+        counties (pd.Series): County per outage, or None to treat all outages as one county
+        times (pd.Series): Outage start times
+
+    Attributes:
+        codes (np.ndarray): County code of each outage, as taken by contains (-1 if missing)
+        hours (np.ndarray): Hour of each outage since the epoch
+    """
+
+    def __init__(self, counties, times):
+        self.hours = _hours(times)
+        if counties is None:
+            self.codes = np.zeros(len(self.hours), dtype=np.int64)
+        else:
+            self.codes = pd.factorize(counties.to_numpy())[0].astype(np.int64)
+        known = (self.hours != np.iinfo(np.int64).min) & (self.codes >= 0)
+        self.keys = pd.Index(self._pack(self.codes[known], self.hours[known])).unique()
+
+    @staticmethod
+    def _pack(codes, hours):
+        # (county code, hour) -> one int64; hours are offset to stay non-negative
+        return (np.asarray(codes, dtype=np.int64) << _HOUR_BITS) + (hours + (1 << (_HOUR_BITS - 1)))
+
+    def contains(self, codes, hours):
+        """Whether each (county code, hour) pair has an outage"""
+        found = self.keys.get_indexer(self._pack(codes, hours)) >= 0
+        return found & (codes >= 0)
+
+
+def sample_negatives(df, ratio=None, seed=None, rng=None, time_column="start_time", county_column="county",
+                     damping=None, max_shift_days=MAX_SHIFT_DAYS, exposure=None):
+    """
+    Shifted, damped copies of outage rows labelled as non-outages
+
+    Args:
+        df (pd.DataFrame): Outage rows (one per positive) with a start time column
+        ratio (float, optional): Negatives per positive; a fraction gives floor(ratio) negatives
+            per row plus one more with the remaining probability. Defaults to NEGATIVES_PER_POSITIVE
+        seed (int, optional): Seed of the Generator; defaults to NEGATIVE_SEED
+        rng (np.random.Generator, optional): Generator to draw from instead of a seeded one
+        time_column (str): Start time column; rows without a time produce no negative
+        county_column (str): County column used to reject shifts onto real outages; if absent,
+            a shift onto any outage hour is rejected
+        damping (dict, optional): Weather column substring -> multiplier (default DEFAULT_DAMPING)
+        max_shift_days (int): Largest shift in days
+        exposure (exposure_grid.ExposureGrid, optional): Also reject shifts into any hour during
+            which the county had an outage in progress (needs the county column)
+
+    Returns:
+        pd.DataFrame: Negative rows with df's columns, outage_occurred = 0 and a fresh RangeIndex
+    """
+    ratio = NEGATIVES_PER_POSITIVE if ratio is None else ratio
+    rng = rng or np.random.default_rng(NEGATIVE_SEED if seed is None else seed)
+    damping = DEFAULT_DAMPING if damping is None else damping
+
+    times = pd.to_datetime(df[time_column], errors="coerce")
+    counties = df[county_column] if county_column in df.columns else None
+    index = OutageHourIndex(counties, times)
+
+    # Source row of every candidate negative
+    per_row = np.full(len(df), int(ratio), dtype=np.int64)
+    per_row += rng.random(len(df)) < ratio - int(ratio)
+    per_row[times.isna().to_numpy()] = 0
+    source = np.repeat(np.arange(len(df)), per_row)
+
+    source_hours = index.hours[source]
+    codes = index.codes[source]
+    if exposure is not None and counties is not None:
+        grid_rows = exposure.positions(counties)[source]
+    else:
+        exposure = None
+
+    # Draw shifts; redraw the ones landing on a real outage hour in the same county
+    shift_days = np.zeros(len(source), dtype=np.int64)
+    pending = np.arange(len(source))
+    for _ in range(MAX_REDRAWS):
+        if not len(pending):
+            break
+        draw = rng.integers(1, max_shift_days + 1, len(pending)) * rng.choice([-1, 1], len(pending))
+        shift_days[pending] = draw
+        hours = source_hours[pending] + 24 * draw
+        collides = index.contains(codes[pending], hours)
+        if exposure is not None:
+            collides |= exposure.occupied(grid_rows[pending], exposure.hour_offsets(hours.astype("datetime64[h]")))
+        pending = pending[collides]
+    keep = np.ones(len(source), dtype=bool)
+    keep[pending] = False
+    source, shift_days = source[keep], shift_days[keep]
+
+    negatives = df.iloc[source].reset_index(drop=True)
+    shifted = times.iloc[source].reset_index(drop=True) + pd.to_timedelta(shift_days, unit="D")
+    negatives[time_column] = shifted
+
+    # Derived time features, where the frame has them
+    month = shifted.dt.month.to_numpy()
+    derived = {
+        "month": month,
+        "day_of_week": shifted.dt.dayofweek.to_numpy(),
+        "hour_of_day": shifted.dt.hour.to_numpy(),
+        "sin_month": np.sin(2 * np.pi * month / 12),
+        "cos_month": np.cos(2 * np.pi * month / 12),
+    }
+    for column, values in derived.items():
+        if column in negatives.columns:
+            negatives[column] = values
+
+    # Calmer weather: damp the matching numeric weather_* columns
+    for column in negatives.columns:
+        if not (isinstance(column, str) and column.startswith("weather_")):
+            continue
+        if not pd.api.types.is_numeric_dtype(negatives[column]) or pd.api.types.is_bool_dtype(negatives[column]):
+            continue
+        factor = next((f for key, f in damping.items() if key in column), None)
+        if factor is not None:
+            negatives[column] = negatives[column] * factor
+
+    negatives["outage_occurred"] = 0
+    if len(pending):
+        print(f"Dropped {len(pending)} negative samples that kept landing on real outages")
+    return negatives
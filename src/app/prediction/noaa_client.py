@@ -0,0 +1,437 @@
+# app/noaa_client.py
+# api.weather.gov access for the serving path.
+#
+# combined_model.fetch_noaa_weather / extract_weather_features do the same job for training but
+# run inside the Colab pipeline (combined_model runs main() at import), so api.py uses this module.
+# Gridpoint values are kept in the units NOAA returns them in, as in training.
+
+import csv
+import re
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+
+from gridpoint_stream import STREAM_CHUNK_BYTES, parse_gridpoint
+
+
+NOAA_API_URL = "https://api.weather.gov"
+NOAA_HEADERS = {
+    'User-Agent': '(gemicast-project, fardeen.e.bablu@vanderbilt.edu)',
+    'Accept': 'application/geo+json',
+}
+
+# ISO-8601 durations as used in validTime, e.g. PT1H, PT12H, P1D, P1DT6H
+_DURATION_RE = re.compile(r"^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?$")
+# UTC offset trailing a validTime start, e.g. +00:00 or -05:00
+_OFFSET_RE = re.compile(r"^([+-])(\d{2}):?(\d{2})?$")
+
+# Gridpoint properties whose values are not numbers
+NON_NUMERIC_PROPERTIES = frozenset({"weather", "hazards"})
+
+
+def load_county_coordinates(path):
+    """
+    Load county centroids from the county boundaries CSV used by combined_model.get_county_coordinates
+
+    Args:
+        path (str): CSV with 'Geo Point' ("lat, lng"), 'NAME' and 'GEOID' columns
+
+    Returns:
+        dict: lowercase county name -> {"latitude", "longitude", "fips"}
+    """
+    coordinates = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            lat, lng = (float(v) for v in row["Geo Point"].split(","))
+            coordinates[row["NAME"].lower().strip()] = {
+                "latitude": lat,
+                "longitude": lng,
+                "fips": row.get("GEOID"),
+            }
+    return coordinates
+
+
+# redirected: the gridpoint URL answered with a redirect (the point -> gridpoint mapping moved)
+GridpointResponse = namedtuple("GridpointResponse", ["payload", "etag", "last_modified", "not_modified", "redirected"])
+
+
+def resolve_gridpoint(lat, lng, session=None, base_url=NOAA_API_URL, timeout=30):
+    """
+    Look up the forecast gridpoint for a location (/points)
+
+    Returns:
+        tuple: (gridId, gridX, gridY)
+    """
+    http = session or requests
+    response = http.get(f"{base_url}/points/{lat:.4f},{lng:.4f}", headers=NOAA_HEADERS, timeout=timeout)
+    response.raise_for_status()
+    point = response.json()["properties"]
+    return point['gridId'], int(point['gridX']), int(point['gridY'])
+
+
+def gridpoint_url(grid_id, grid_x, grid_y, base_url=NOAA_API_URL):
+    return f"{base_url}/gridpoints/{grid_id}/{grid_x},{grid_y}"
+
+
+def gridpoint_key(url):
+    """Host-independent key of a gridpoint URL: 'OHX/50,57'"""
+    return url.split("/gridpoints/", 1)[-1].split("?", 1)[0]
+
+
+def resolve_gridpoint_url(lat, lng, session=None, base_url=NOAA_API_URL, timeout=30):
+    """
+    Look up the gridpoint forecast URL for a location (/points)
+
+    Returns:
+        str: Gridpoint URL, e.g. https://api.weather.gov/gridpoints/OHX/50,57
+    """
+    return gridpoint_url(*resolve_gridpoint(lat, lng, session, base_url, timeout), base_url)
+
+
+def get_gridpoint(url, session=None, etag=None, last_modified=None, timeout=30):
+    """
+    GET a gridpoint payload, revalidating a cached copy when its validators are given
+
+    Args:
+        url (str): Gridpoint URL
+        session (requests.Session, optional): Session to reuse connections
+        etag (str, optional): ETag of the cached copy (sent as If-None-Match)
+        last_modified (str, optional): Last-Modified of the cached copy (sent as If-Modified-Since)
+        timeout (int): Request timeout in seconds
+
+    Returns:
+        GridpointResponse: payload is None when the server answered 304 Not Modified
+    """
+    http = session or requests
+    headers = dict(NOAA_HEADERS)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    response = http.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return GridpointResponse(None, etag, last_modified, True, bool(response.history))
+    response.raise_for_status()
+    return GridpointResponse(
+        response.json(),
+        response.headers.get("ETag"),
+        response.headers.get("Last-Modified"),
+        False,
+        bool(response.history),
+    )
+
+
+def open_gridpoint_stream(url, session=None, timeout=30):
+    """
+    GET a gridpoint without reading the body, for incremental decoding
+
+    Returns:
+        requests.Response: Streaming response; read it with iter_content
+    """
+    http = session or requests
+    response = http.get(url, headers=NOAA_HEADERS, timeout=timeout, stream=True)
+    response.raise_for_status()
+    return response
+
+
+def is_not_found(err):
+    """True if a requests exception is an HTTP 404"""
+    response = getattr(err, "response", None)
+    return response is not None and response.status_code == 404
+
+
+def fetch_gridpoint(lat, lng, session=None, base_url=NOAA_API_URL, max_retries=3, timeout=30, lookup=None,
+                    store=None, properties=None):
+    """
+    Fetch the raw gridpoint forecast for a location (points lookup, then gridpoint data)
+
+    With a GridpointLookup the /points request is skipped for known locations; the entry is
+    invalidated if the gridpoint URL redirects or returns 404. With a GridpointStore a fresh
+    stored response is returned without a request, and in replay mode nothing is fetched.
+    With properties the body is decoded as a stream and only those properties are kept
+    (see gridpoint_stream.py); the store still receives the full body.
+
+    Args:
+        lat (float): Latitude
+        lng (float): Longitude
+        session (requests.Session, optional): Session to reuse connections
+        base_url (str): API root
+        max_retries (int): Maximum number of attempts
+        timeout (int): Request timeout in seconds
+        lookup (GridpointLookup, optional): Persistent point -> gridpoint table
+        store (GridpointStore, optional): Compressed response store
+        properties (list, optional): Properties to keep; decodes the body incrementally
+
+    Returns:
+        dict: Gridpoint GeoJSON payload (projected onto properties when given)
+
+    Raises:
+        requests.exceptions.RequestException: if every attempt failed
+        gridpoint_store.ReplayMissError: in replay mode, if the response was never stored
+    """
+    if store is not None and store.replay:
+        url = lookup.peek(lat, lng, base_url) if lookup is not None else None
+        if url is None:
+            raise LookupError(f"No gridpoint mapping for {lat},{lng} in replay mode")
+        if properties is not None:
+            return store.fetch_stream(gridpoint_key(url), None, lambda chunks: parse_gridpoint(chunks, properties))
+        return store.fetch(gridpoint_key(url), None)
+
+    retries = 0
+    while True:
+        try:
+            if lookup is not None:
+                url = lookup.gridpoint_url(lat, lng, session, base_url, timeout)
+            else:
+                url = resolve_gridpoint_url(lat, lng, session, base_url, timeout)
+
+            if properties is not None:
+                def open_body():
+                    response = open_gridpoint_stream(url, session, timeout)
+                    if lookup is not None and response.history:
+                        lookup.invalidate(lat, lng)
+                    return response.iter_content(STREAM_CHUNK_BYTES)
+
+                def parse(chunks):
+                    return parse_gridpoint(chunks, properties)
+
+                if store is not None:
+                    return store.fetch_stream(gridpoint_key(url), open_body, parse)
+                return parse(open_body())
+
+            def fetch_payload():
+                response = get_gridpoint(url, session, timeout=timeout)
+                if lookup is not None and response.redirected:
+                    lookup.invalidate(lat, lng)
+                return response.payload
+
+            if store is not None:
+                return store.fetch(gridpoint_key(url), fetch_payload)
+            return fetch_payload()
+        except requests.exceptions.RequestException as err:
+            if lookup is not None and is_not_found(err):
+                lookup.invalidate(lat, lng)
+            retries += 1
+            if retries >= max_retries:
+                raise
+            wait_time = 2 ** retries
+            print(f"Retry {retries}/{max_retries} after {wait_time}s: {err}")
+            time.sleep(wait_time)
+
+
+def current_hour():
+    """The current UTC hour as np.datetime64[h]"""
+    return np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "h")
+
+
+def _duration_hours(duration):
+    match = _DURATION_RE.match(duration) if duration else None
+    if not match:
+        return 1
+    days, hrs, minutes = (int(g) if g else 0 for g in match.groups())
+    return max(1, days * 24 + hrs + (1 if minutes else 0))
+
+
+def _chars_from(strings, position):
+    # Vectorized strings[i][position:] for a fixed-width unicode array (4-byte code points)
+    width = strings.dtype.itemsize // 4
+    if width <= position:
+        return np.full(len(strings), "", dtype="U1")
+    codes = np.ascontiguousarray(strings).view(np.uint32).reshape(len(strings), width)
+    return np.ascontiguousarray(codes[:, position:]).view(f"U{width - position}").ravel()
+
+
+def _offset_minutes(offset):
+    # "+00:00" / "-05:00" / "Z" / "" -> minutes east of UTC
+    match = _OFFSET_RE.match(offset)
+    if not match:
+        return 0
+    sign = -1 if match.group(1) == "-" else 1
+    return sign * (int(match.group(2)) * 60 + int(match.group(3) or 0))
+
+
+def parse_valid_times(valid_times):
+    """
+    Parse many gridpoint validTime intervals at once
+
+    The date-time part is converted by numpy in one pass; UTC offsets and durations are parsed
+    once per distinct string (a payload uses a handful of each) and broadcast back.
+
+    Args:
+        valid_times (list): e.g. ["2025-04-02T06:00:00+00:00/PT3H", ...]
+
+    Returns:
+        tuple: (UTC starts as np.ndarray of datetime64[h], durations in whole hours as int64 array,
+            each at least 1)
+    """
+    valid_times = np.asarray(valid_times, dtype=str)
+    if valid_times.size == 0:
+        return np.array([], dtype="datetime64[h]"), np.array([], dtype=np.int64)
+
+    parts = np.char.partition(valid_times, "/")
+    start_strs, durations = parts[:, 0], parts[:, 2]
+    local = start_strs.astype("U19")
+    starts = local.astype("datetime64[m]")
+
+    offsets, offset_index = np.unique(_chars_from(start_strs, 19), return_inverse=True)
+    offset_minutes = np.array([_offset_minutes(o) for o in offsets], dtype=np.int64)
+    starts = (starts - offset_minutes[offset_index].astype("timedelta64[m]")).astype("datetime64[h]")
+
+    unique_durations, duration_index = np.unique(durations, return_inverse=True)
+    hours = np.array([_duration_hours(d) for d in unique_durations], dtype=np.int64)[duration_index]
+    return starts, hours
+
+
+def parse_valid_time(valid_time):
+    """
+    Parse a gridpoint validTime interval
+
+    Args:
+        valid_time (str): e.g. "2025-04-02T06:00:00+00:00/PT3H"
+
+    Returns:
+        tuple: (start as UTC np.datetime64[h], duration in whole hours, at least 1)
+    """
+    starts, hours = parse_valid_times([valid_time])
+    return starts[0], int(hours[0])
+
+
+def expand_intervals(starts, hours):
+    """
+    Expand intervals onto the hours they cover
+
+    Args:
+        starts (np.ndarray): Interval starts, datetime64[h]
+        hours (np.ndarray): Interval lengths in hours
+
+    Returns:
+        tuple: (datetime64[h] array of every covered hour, index of the interval each hour came from)
+    """
+    index = np.repeat(np.arange(len(hours)), hours)
+    # Position of each hour within its interval: running count minus the interval's first slot
+    first_slot = np.cumsum(hours) - hours
+    step = np.arange(index.size) - first_slot[index]
+    return starts[index] + step, index
+
+
+def expand_property(entries, dtype=float):
+    """
+    Hourly values of one gridpoint property
+
+    Each value is repeated over every hour of its validTime interval, so a "PT6H" value yields
+    six hourly values. Entries with a null value are skipped.
+
+    Args:
+        entries (list): The property's "values" list from a gridpoint payload
+        dtype: Value dtype (object for properties such as "weather" whose values are not numbers)
+
+    Returns:
+        tuple: (datetime64[h] array, value array) of equal length
+    """
+    entries = [e for e in entries if e.get("value") is not None]
+    values = np.empty(len(entries), dtype=dtype)
+    values[:] = [e["value"] for e in entries]
+    starts, hours = parse_valid_times([e["validTime"] for e in entries])
+    times, index = expand_intervals(starts, hours)
+    return times, values[index]
+
+
+def _assign_latest(column, offsets, values):
+    # Write hourly values into column; where intervals overlap, the later-listed (later-issued)
+    # value wins. Keeps only the last occurrence of each hour so the result does not depend on
+    # the order numpy applies repeated indices.
+    _, last_from_end = np.unique(offsets[::-1], return_index=True)
+    keep = len(offsets) - 1 - last_from_end
+    column[offsets[keep]] = values[keep]
+
+
+def hourly_columns(property_values, non_numeric=NON_NUMERIC_PROPERTIES):
+    """
+    Wide hourly columns for a set of gridpoint properties
+
+    Every property is written straight into one preallocated array on a shared hourly grid that
+    runs from the first to the last covered hour. Where intervals overlap, the later value
+    wins, as in hourly_series.
+
+    Args:
+        property_values (dict): property -> its "values" list; only these properties are parsed
+        non_numeric (set): Properties kept as object arrays (e.g. "hazards"); others are float64
+
+    Returns:
+        tuple: (datetime64[h] grid, dict property -> array on the grid, NaN/None where uncovered)
+    """
+    expanded = {}
+    for prop, entries in property_values.items():
+        times, values = expand_property(entries, dtype=object if prop in non_numeric else float)
+        if len(times):
+            expanded[prop] = (times, values)
+    if not expanded:
+        return np.array([], dtype="datetime64[h]"), {}
+
+    start = min(times.min() for times, _ in expanded.values())
+    end = max(times.max() for times, _ in expanded.values())
+    grid = start + np.arange(int((end - start) / np.timedelta64(1, "h")) + 1)
+
+    columns = {}
+    for prop, (times, values) in expanded.items():
+        if values.dtype == object:
+            column = np.full(grid.size, None, dtype=object)
+        else:
+            column = np.full(grid.size, np.nan)
+        _assign_latest(column, (times - start).astype(np.int64), values)
+        columns[prop] = column
+    return grid, columns
+
+
+def hourly_series(payload, properties, hours=168, start=None):
+    """
+    Expand gridpoint properties onto an hourly UTC grid
+
+    Each value covers its whole validTime interval, so a "PT6H" value fills six hours.
+    Where intervals overlap, the later value wins, as in hourly_columns. Hours with no value
+    are NaN.
+
+    Args:
+        payload (dict): Gridpoint payload from fetch_gridpoint
+        properties (list): NOAA property names, e.g. "windGust"
+        hours (int): Length of the grid
+        start (np.datetime64, optional): First hour of the grid; defaults to the current UTC hour
+
+    Returns:
+        tuple: (np.ndarray of datetime64[h] hours, dict property -> float64 array)
+    """
+    if start is None:
+        start = current_hour()
+    start = np.datetime64(start, "h")
+    times = start + np.arange(hours)
+    props = payload.get("properties", {})
+
+    series = {}
+    for prop in properties:
+        values = np.full(hours, np.nan)
+        prop_times, prop_values = expand_property(props.get(prop, {}).get("values", []))
+        offsets = (prop_times - start).astype(np.int64)
+        keep = (offsets >= 0) & (offsets < hours)
+        _assign_latest(values, offsets[keep], prop_values[keep])
+        series[prop] = values
+    return times, series
+
+
+def current_conditions(payload, properties, now=None):
+    """
+    Values of gridpoint properties for the current hour
+
+    Args:
+        payload (dict): Gridpoint payload
+        properties (list): NOAA property names
+        now (np.datetime64, optional): Hour to read; defaults to the current UTC hour
+
+    Returns:
+        dict: property -> value, for properties with a value covering that hour
+    """
+    _, series = hourly_series(payload, properties, hours=1, start=now)
+    return {prop: float(values[0]) for prop, values in series.items() if not np.isnan(values[0])}
@@ -0,0 +1,128 @@
+# app/noaa_fetcher.py
+# Concurrent, rate-limited fetching from api.weather.gov.
+#
+# RateLimitedSession is a requests.Session with a pooled keep-alive adapter that takes a token
+# from a shared token bucket before every request and retries 429/5xx/connection errors with
+# jittered exponential backoff (honoring Retry-After). iter_concurrent runs a fetch function over
+# many items in a bounded thread pool and yields each result as soon as it completes, so a
+# statewide refresh is bounded by the rate limit rather than by serial round trips.
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Statuses worth retrying: rate limited, or a transient server-side failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every request of a fetcher.
+
+    Args:
+        rate (float): Tokens added per second (sustained requests per second)
+        capacity (float, optional): Burst size; defaults to rate
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+
+class RateLimitedSession(requests.Session):
+    """
+    requests.Session that rate-limits and retries every request.
+
+    Args:
+        bucket (TokenBucket, optional): Shared rate limiter; defaults to 5 requests/second
+        max_retries (int): Retries after the first attempt
+        backoff_base (float): First backoff ceiling in seconds; doubles per retry
+        backoff_cap (float): Largest backoff in seconds
+        pool_size (int): Keep-alive connections kept per host (match the worker count)
+    """
+
+    def __init__(self, bucket=None, max_retries=4, backoff_base=0.5, backoff_cap=30.0, pool_size=16):
+        super().__init__()
+        self.bucket = bucket or TokenBucket(5)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.retry_count = 0
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(self.backoff_cap, float(retry_after))
+            except ValueError:
+                pass
+        # Full jitter: spread retries from many workers instead of retrying in lockstep
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            last_attempt = attempt == self.max_retries
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+                if last_attempt:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Retry {attempt + 1}/{self.max_retries} for {url} after {delay:.1f}s: {err}")
+            else:
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    return response
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                print(f"Retry {attempt + 1}/{self.max_retries} for {url} after {delay:.1f}s: HTTP {response.status_code}")
+                response.close()
+            self.retry_count += 1
+            time.sleep(delay)
+
+
+def iter_concurrent(items, fetch, max_workers=8):
+    """
+    Run fetch over items in a bounded thread pool, yielding results as they complete
+
+    Args:
+        items (iterable): Work items
+        fetch (callable): item -> result
+        max_workers (int): Concurrent fetches
+
+    Yields:
+        tuple: (item, result, error); error is the exception raised by fetch, or None
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="noaa-fetch")
+    try:
+        futures = {executor.submit(fetch, item): item for item in items}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+    finally:
+        # A consumer that stops early should not wait for queued fetches
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -32,6 +32,9 @@ from datetime import datetime, timedelta
 import os
 from google.cloud import storage
 from google.cloud import aiplatform
+from gridpoint_lookup import GridpointLookup
+from negative_sampler import NEGATIVE_SEED, sample_negatives
+from noaa_client import hourly_columns, is_not_found
 
 # Set up Google Cloud Authentication
 # Uncomment to use service account
@@ -42,7 +45,7 @@ from google.cloud import aiplatform
 # !mkdir -p /content/drive/MyDrive/2025_GDG_Solutions/model/data
 
 # 1. NOAA Weather API Functions
-def fetch_noaa_weather(lat, lng, start_date=None, end_date=None):
+def fetch_noaa_weather(lat, lng, start_date=None, end_date=None, lookup=None):
     """
     Fetch weather data from NOAA API for a specific location
 
@@ -51,6 +54,8 @@ def fetch_noaa_weather(lat, lng, start_date=None, end_date=None):
         lng (float): Longitude
         start_date (str, optional): Start date in YYYY-MM-DD format
         end_date (str, optional): End date in YYYY-MM-DD format
+        lookup (GridpointLookup, optional): Persistent point -> gridpoint table; known locations
+            skip the /points request
 
     Returns:
         dict: Weather data from NOAA API
@@ -66,18 +71,22 @@ def fetch_noaa_weather(lat, lng, start_date=None, end_date=None):
     point_url = f"https://api.weather.gov/points/{lat},{lng}"
 
     try:
-      # 1.1: Send request
-      response = requests.get(point_url, headers=headers)
-      response.raise_for_status()
-      point_data = response.json()
-
-      # 1.2: Extract grid info
-      grid_id = point_data['properties']['gridId']
-      grid_x = point_data['properties']['gridX']
-      grid_y = point_data['properties']['gridY']
-
-      # 1.3: Get forecast data
-      forecast_url = f"https://api.weather.gov/gridpoints/{grid_id}/{grid_x},{grid_y}"
+      if lookup is not None:
+        # 1.1-1.2: Grid info from the lookup table (calls /points only for new locations)
+        forecast_url = lookup.gridpoint_url(lat, lng)
+      else:
+        # 1.1: Send request
+        response = requests.get(point_url, headers=headers)
+        response.raise_for_status()
+        point_data = response.json()
+
+        # 1.2: Extract grid info
+        grid_id = point_data['properties']['gridId']
+        grid_x = point_data['properties']['gridX']
+        grid_y = point_data['properties']['gridY']
+
+        # 1.3: Get forecast data
+        forecast_url = f"https://api.weather.gov/gridpoints/{grid_id}/{grid_x},{grid_y}"
       if start_date and end_date:
           forecast_url += f"?start={start_date}&endDateTIme={end_date}"
 
@@ -86,19 +95,27 @@ def fetch_noaa_weather(lat, lng, start_date=None, end_date=None):
       foreceast_response.raise_for_status()
       forecast_data = foreceast_response.json()
 
+      # A redirected gridpoint means the cached mapping is stale
+      if lookup is not None and foreceast_response.history:
+        lookup.invalidate(lat, lng)
+
       return forecast_data
 
     except requests.exceptions.RequestException as err:
+      if lookup is not None and is_not_found(err):
+        lookup.invalidate(lat, lng)
       print(f"Error fetching weather data: {err}")
       return None
 
 
-def extract_weather_features(noaa_data):
+def extract_weather_features(noaa_data, properties=None):
     """
     Extract relevant weather features from NOAA API response
 
     Args:
         noaa_data (dict): NOAA API response
+        properties (list, optional): Properties to extract; everything else is skipped without
+            being parsed. Defaults to every supported property
 
     Returns:
         pd.DataFrame: DataFrame with weather features
@@ -106,7 +123,6 @@ def extract_weather_features(noaa_data):
     if not noaa_data or 'properties' not in noaa_data:
         return pd.DataFrame()
 
-    records = []
     props = noaa_data['properties']
 
     # Define the weather properties we're interested in
@@ -173,53 +189,17 @@ def extract_weather_features(noaa_data):
 
 
 
-    # Extract time series data for each property
-    for prop in weather_properties:
-        if prop in props:
-            for entry in props[prop]['values']:
-                valid_time = entry['validTime']
-
-
-                # https://www.w3.org/TR/NOTE-datetime
-                # 1994-11-05T08:15:30-05:00
-                # November 5, 1994, 8:15:30 am, US Eastern Standard Time.
-
-                time_parts = valid_time.split('T')
-                date_part = time_parts[0]
-                time_part = time_parts[1].split('-')[0] if '-' in time_parts[1] else time_parts[1].split('+')[0]
-
-                # Combine date and time parts
-                datetime_str = f"{date_part} {time_part}"
+    if properties is not None:
+        weather_properties = [prop for prop in weather_properties if prop in properties]
 
-                # Convert to datetime
-                try:
-                    dt = datetime.strptime(datetime_str, '%Y-%m-%d %H:%M:%S')
-                except ValueError:
-                    # Try alternative format if the first one fails
-                    dt = datetime.strptime(f"{date_part} {time_part}", '%Y-%m-%d %H:%M:%S')
-
-                # Create record
-                record = {
-                    'timestamp': dt,
-                    'property': prop,
-                    'value': entry['value']
-                }
-                records.append(record)
-
-    # Create DataFrame
-    df = pd.DataFrame(records)
-
-    # Pivot to create wide format
-    if not df.empty:
-        df_pivot = df.pivot_table(
-            index='timestamp',
-            columns='property',
-            values='value',
-            aggfunc='first'
-        ).reset_index()
-        return df_pivot
+    # Columnar build: each wanted property goes straight into an array on a shared hourly grid
+    times, columns = hourly_columns({prop: props[prop]['values'] for prop in weather_properties if prop in props})
+    if not columns:
+        return pd.DataFrame()
 
-    return pd.DataFrame()
+    data = {'timestamp': times.astype('datetime64[ns]')}
+    data.update((prop, columns[prop]) for prop in sorted(columns))
+    return pd.DataFrame(data)
 
 
 def fetch_historical_weather(locations, start_date, end_date):
@@ -235,10 +215,11 @@ def fetch_historical_weather(locations, start_date, end_date):
         pd.DataFrame: Combined weather data for all locations
     """
     all_data = []
+    lookup = GridpointLookup()
 
     for lat, lng, location_name in locations:
         print(f"Fetching weather data for {location_name}...")
-        noaa_data = fetch_noaa_weather(lat, lng, start_date, end_date)
+        noaa_data = fetch_noaa_weather(lat, lng, start_date, end_date, lookup=lookup)
 
         if noaa_data:
             weather_df = extract_weather_features(noaa_data)
@@ -542,47 +523,12 @@ def prepare_features(outages_df, grid_df, weather_df=None):
         dummies.columns = [col_name.replace(" ", "_").replace("-", "_").lower() for col_name in dummies.columns]
         combined_data = pd.concat([combined_data, dummies], axis=1)
 
-    # Generate negative examples (non-outage events)
-    non_outages = []
-
-    for idx, outage in combined_data.iterrows():
-        non_outage = outage.copy()
-
-        # Shift time by a random amount (1-30 days)
-        day_shift = np.random.randint(1, 30)
-        shift_direction = 1 if np.random.random() > 0.5 else -1
-
-        # Make sure we're working with datetime objects
-        if isinstance(non_outage['start_time'], str):
-            non_outage_time = datetime.strptime(non_outage['start_time'], '%Y-%m-%d %H:%M:%S')
-        else:
-            non_outage_time = non_outage['start_time']
-
-        non_outage_time = non_outage_time + timedelta(days=day_shift * shift_direction)
-        non_outage['start_time'] = non_outage_time
-
-        # Update derived time features
-        non_outage['month'] = non_outage_time.month
-        non_outage['day_of_week'] = non_outage_time.weekday()
-        non_outage['hour_of_day'] = non_outage_time.hour
-
-        # Lower the severity of weather conditions
-        if 'weather_wind_speed_kph' in non_outage:
-            non_outage['weather_wind_speed_kph'] *= 0.6
-        if 'weather_precipitation_mm' in non_outage:
-            non_outage['weather_precipitation_mm'] *= 0.4
-
-        # Set target to 0 (no outage)
-        non_outage['outage_occurred'] = 0
-
-        non_outages.append(non_outage)
-
-    # Combine outage and non-outage data
-    if non_outages:
-        non_outages_df = pd.DataFrame(non_outages)
-        all_data = pd.concat([combined_data, non_outages_df], ignore_index=True)
-    else:
-        all_data = combined_data
+    # Generate negative examples (non-outage events) with less severe weather
+    non_outages = sample_negatives(
+        combined_data, seed=NEGATIVE_SEED,
+        damping={'weather_wind_speed_kph': 0.6, 'weather_precipitation_mm': 0.4},
+    )
+    all_data = pd.concat([combined_data, non_outages], ignore_index=True)
 
     # Select features and target
     feature_cols = [
@@ -0,0 +1,156 @@
+# app/noaa_stub_server.py
+# Local stand-in for api.weather.gov (points + gridpoints) for testing the weather path offline.
+#
+# Serves deterministic synthetic hourly forecasts that change every --update-seconds, with ETag and
+# Last-Modified headers and 304 responses to conditional requests, like the real API.
+#
+# Usage:
+#   python noaa_stub_server.py --port 8081
+#   NOAA_API_URL=http://localhost:8081 python api.py
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+# (property, unit, low, high, hours per value)
+STUB_PROPERTIES = [
+    ("temperature", "wmoUnit:degC", -5, 35, 1),
+    ("dewpoint", "wmoUnit:degC", -10, 25, 1),
+    ("apparentTemperature", "wmoUnit:degC", -8, 38, 1),
+    ("heatIndex", "wmoUnit:degC", 0, 40, 1),
+    ("relativeHumidity", "wmoUnit:percent", 20, 100, 1),
+    ("skyCover", "wmoUnit:percent", 0, 100, 1),
+    ("windDirection", "wmoUnit:degree_(angle)", 0, 360, 1),
+    ("windSpeed", "wmoUnit:km_h-1", 0, 50, 1),
+    ("windGust", "wmoUnit:km_h-1", 0, 90, 1),
+    ("transportWindSpeed", "wmoUnit:km_h-1", 0, 60, 3),
+    ("mixingHeight", "wmoUnit:m", 100, 2500, 3),
+    ("probabilityOfPrecipitation", "wmoUnit:percent", 0, 100, 6),
+    ("quantitativePrecipitation", "wmoUnit:mm", 0, 10, 6),
+    ("iceAccumulation", "wmoUnit:mm", 0, 0, 6),
+    ("snowfallAmount", "wmoUnit:mm", 0, 0, 6),
+    ("visibility", "wmoUnit:m", 1000, 16093, 1),
+]
+
+_POINTS_RE = re.compile(r"^/points/(-?[\d.]+),(-?[\d.]+)$")
+_GRIDPOINT_RE = re.compile(r"^/gridpoints/(\w+)/(\d+),(\d+)$")
+
+
+def stub_gridpoint_payload(grid_id, grid_x, grid_y, version_start, hours=168):
+    """Deterministic synthetic gridpoint payload for one forecast version"""
+    seed = int(hashlib.sha1(f"{grid_id}/{grid_x},{grid_y}/{version_start.isoformat()}".encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    properties = {"updateTime": version_start.isoformat(), "gridId": grid_id, "gridX": grid_x, "gridY": grid_y}
+    first_hour = version_start.replace(minute=0, second=0, microsecond=0)
+    for prop, uom, low, high, step in STUB_PROPERTIES:
+        values = []
+        for h in range(0, hours, step):
+            valid_time = f"{(first_hour + timedelta(hours=h)).isoformat()}/PT{step}H"
+            values.append({"validTime": valid_time, "value": round(float(rng.uniform(low, high)), 1)})
+        properties[prop] = {"uom": uom, "values": values}
+    return {"type": "Feature", "properties": properties}
+
+
+class StubState:
+    def __init__(self, update_seconds):
+        self.update_seconds = update_seconds
+        self.requests = 0
+        self.not_modified = 0
+
+    def version_start(self):
+        """Start (UTC, whole second) of the current forecast version"""
+        now = int(time.time())
+        return datetime.fromtimestamp(now - now % self.update_seconds, timezone.utc)
+
+
+def make_handler(state):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/geo+json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            state.requests += 1
+            match = _POINTS_RE.match(self.path)
+            if match:
+                lat, lng = float(match.group(1)), float(match.group(2))
+                self._send_json(200, {"properties": {
+                    "gridId": "OHX",
+                    "gridX": int(abs(lng) * 10) % 100,
+                    "gridY": int(abs(lat) * 10) % 100,
+                }})
+                return
+
+            match = _GRIDPOINT_RE.match(self.path)
+            if not match:
+                self._send_json(404, {"title": "Not Found", "status": 404})
+                return
+
+            grid_id, grid_x, grid_y = match.group(1), int(match.group(2)), int(match.group(3))
+            version_start = state.version_start()
+            etag = '"' + hashlib.sha1(f"{self.path}/{version_start.isoformat()}".encode()).hexdigest()[:16] + '"'
+            last_modified = formatdate(version_start.timestamp(), usegmt=True)
+
+            if_none_match = self.headers.get("If-None-Match")
+            if_modified_since = self.headers.get("If-Modified-Since")
+            unchanged = if_none_match == etag if if_none_match else (
+                if_modified_since is not None and parsedate_to_datetime(if_modified_since) >= version_start
+            )
+            if unchanged:
+                state.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                return
+
+            payload = stub_gridpoint_payload(grid_id, grid_x, grid_y, version_start)
+            self._send_json(200, payload, {"ETag": etag, "Last-Modified": last_modified})
+
+    return StubHandler
+
+
+def start_stub_server(port=0, update_seconds=3600):
+    """
+    Start the stub server in a daemon thread
+
+    Args:
+        port (int): Port to bind on localhost (0 picks a free port)
+        update_seconds (int): How often the synthetic forecast changes
+
+    Returns:
+        tuple: (server, state, base_url)
+    """
+    state = StubState(update_seconds)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, name="noaa-stub", daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local api.weather.gov stub")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--update-seconds", type=int, default=3600)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), make_handler(StubState(args.update_seconds)))
+    print(f"NOAA stub listening on http://localhost:{args.port}")
+    server.serve_forever()
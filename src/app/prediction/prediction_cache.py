@@ -0,0 +1,213 @@
+# app/prediction_cache.py
+# Bounded TTL/LRU cache for model outputs, keyed by a quantized feature row.
+#
+# Requests whose weather inputs differ only by sensor noise (e.g. wind 31.2 vs 31.4 mph) map to
+# the same key and share one backend call until the entry expires. Entries live for roughly one
+# weather refresh interval. An optional Redis tier lets several gunicorn workers share entries.
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Model features are in NOAA gridpoint units: wind speeds in km/h, temperatures in °C
+KMH_PER_MPH = 1.609344
+
+# Quantization step per feature, in feature units; features not listed are matched exactly.
+# Wind speeds are rounded to 1 mph, temperatures to 0.5 °C.
+DEFAULT_QUANTIZATION_STEPS = {
+    "weather_windSpeed": KMH_PER_MPH,
+    "weather_windGust": KMH_PER_MPH,
+    "weather_transportWindSpeed": KMH_PER_MPH,
+    "weather_windDirection": 10.0,
+    "weather_temperature": 0.5,
+    "weather_apparentTemperature": 0.5,
+    "weather_heatIndex": 0.5,
+    "weather_dewpoint": 0.5,
+    "weather_relativeHumidity": 1.0,
+    "weather_probabilityOfPrecipitation": 1.0,
+    "weather_skyCover": 1.0,
+    "weather_quantitativePrecipitation": 0.1,
+    "weather_iceAccumulation": 0.1,
+    "weather_snowfallAmount": 0.1,
+    "weather_mixingHeight": 10.0,
+    "weather_visibility": 100.0,
+}
+
+
+class FeatureQuantizer:
+    """
+    Turns feature rows into cache keys by rounding each column to its step.
+
+    Args:
+        names (list): Feature names in schema order
+        steps (dict, optional): Feature name -> quantization step
+    """
+
+    def __init__(self, names, steps=None):
+        steps = DEFAULT_QUANTIZATION_STEPS if steps is None else steps
+        self.steps = np.array([steps.get(name, 0.0) for name in names], dtype=np.float64)
+        self._quantized = self.steps > 0
+        # Divide by 1 where the column is matched exactly
+        self._divisor = np.where(self._quantized, self.steps, 1.0)
+
+    def quantize(self, X):
+        """Quantize a row or matrix; exact columns are passed through unchanged"""
+        X = np.asarray(X, dtype=np.float64)
+        return np.where(self._quantized, np.round(X / self._divisor), X)
+
+    def key(self, row):
+        """Cache key for a single feature row"""
+        return self.quantize(row).tobytes()
+
+    def keys(self, X):
+        """Cache keys for every row of a feature matrix"""
+        Q = self.quantize(np.atleast_2d(X))
+        return [q.tobytes() for q in Q]
+
+
+class RedisCacheTier:
+    """
+    Shared cache tier backed by Redis (optional dependency).
+
+    Values are stored as small JSON blobs with a server-side TTL.
+    """
+
+    def __init__(self, url, ttl_seconds, prefix="gemicast:pred:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def _key(self, key):
+        return self.prefix.encode() + key.hex().encode()
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return tuple(json.loads(raw)) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.setex(self._key(key), int(self.ttl_seconds), json.dumps(list(value)))
+
+
+class PredictionCache:
+    """
+    In-process TTL/LRU cache with an optional shared tier.
+
+    Args:
+        max_entries (int): Maximum entries held in this process
+        ttl_seconds (float): Lifetime of an entry
+        shared (RedisCacheTier, optional): Tier consulted on local misses and written on sets
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=600, shared=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_errors = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                print(f"WARNING: Shared prediction cache read failed: {e}")
+                value = None
+                with self._lock:
+                    self.shared_errors += 1
+            if value is not None:
+                self._store(key, value, now)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """Store value under key (and in the shared tier, if configured)"""
+        self._store(key, value, time.monotonic())
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                print(f"WARNING: Shared prediction cache write failed: {e}")
+                with self._lock:
+                    self.shared_errors += 1
+
+    def _store(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "shared_errors": self.shared_errors,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "shared_backend": "redis" if self.shared is not None else None,
+            }
+
+
+def create_prediction_cache(names, max_entries, ttl_seconds, shared_url=None):
+    """
+    Create the prediction cache and its quantizer
+
+    Args:
+        names (list): Feature names in schema order
+        max_entries (int): Maximum in-process entries
+        ttl_seconds (float): Entry lifetime
+        shared_url (str, optional): redis:// URL for a cache shared across workers
+
+    Returns:
+        tuple: (PredictionCache, FeatureQuantizer)
+    """
+    shared = None
+    if shared_url:
+        try:
+            shared = RedisCacheTier(shared_url, ttl_seconds)
+        except Exception as e:
+            print(f"WARNING: Shared prediction cache unavailable ({e}). Using in-process cache only.")
+    return PredictionCache(max_entries, ttl_seconds, shared), FeatureQuantizer(names)
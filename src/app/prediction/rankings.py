@@ -0,0 +1,118 @@
+# app/rankings.py
+# Background-precomputed county risk rankings.
+#
+# A daemon thread scores every county in one batched model call every few minutes and swaps in
+# an immutable snapshot. /api/rankings serves the snapshot's pre-serialized JSON body, so a
+# request does no scoring or sorting.
+
+import json
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+
+RankingsSnapshot = namedtuple(
+    "RankingsSnapshot",
+    ["rankings", "high_risk", "low_risk", "last_updated", "prediction_source", "body"],
+)
+
+
+def build_snapshot(counties, probabilities, prediction_source, k=5, now=None):
+    """
+    Build an immutable rankings snapshot
+
+    Args:
+        counties (list): County names, aligned with probabilities
+        probabilities (array-like): Outage probability per county
+        prediction_source (str): Backend that produced the scores
+        k (int): Size of the high/low risk slices
+        now (datetime, optional): Snapshot time
+
+    Returns:
+        RankingsSnapshot
+    """
+    now = now or datetime.now()
+    probabilities = np.round(np.asarray(probabilities, dtype=np.float64), 3)
+    # Stable sort so ties keep county order
+    order = np.argsort(-probabilities, kind="stable")
+    rankings = tuple(
+        {"county": counties[i].capitalize(), "probability": float(probabilities[i])}
+        for i in order
+    )
+    high_risk = rankings[:k]
+    low_risk = tuple(reversed(rankings[-k:])) if rankings else ()
+    last_updated = now.isoformat()
+
+    body = json.dumps({
+        "high_risk": list(high_risk),
+        "low_risk": list(low_risk),
+        "lastUpdated": last_updated,
+        "prediction_source": prediction_source,
+    })
+    return RankingsSnapshot(rankings, high_risk, low_risk, last_updated, prediction_source, body)
+
+
+class RankingsRefresher:
+    """
+    Periodically rebuilds the rankings snapshot in a background thread.
+
+    Args:
+        counties (list): Counties to rank
+        score_counties (callable): counties -> (probabilities, prediction_source); should score
+            all counties with a single batched model call
+        interval_seconds (float): Time between refreshes
+        k (int): Size of the high/low risk slices
+    """
+
+    def __init__(self, counties, score_counties, interval_seconds=600, k=5):
+        self.counties = list(counties)
+        self.score_counties = score_counties
+        self.interval_seconds = interval_seconds
+        self.k = k
+        self.refresh_count = 0
+        self.error_count = 0
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def snapshot(self):
+        """Latest snapshot (a single attribute read; snapshots are never mutated)"""
+        return self._snapshot
+
+    def refresh(self):
+        """Score all counties and swap in a new snapshot"""
+        try:
+            probabilities, prediction_source = self.score_counties(self.counties)
+            self._snapshot = build_snapshot(self.counties, probabilities, prediction_source, self.k)
+            self.refresh_count += 1
+        except Exception as e:
+            self.error_count += 1
+            print(f"Error refreshing county rankings: {e}")
+        return self._snapshot
+
+    def start(self):
+        """Build and keep refreshing in a daemon thread (the first build does not block the caller)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="rankings-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.refresh()
+        while not self._stop.wait(self.interval_seconds):
+            self.refresh()
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "interval_seconds": self.interval_seconds,
+            "refresh_count": self.refresh_count,
+            "error_count": self.error_count,
+            "last_updated": snapshot.last_updated if snapshot else None,
+        }
@@ -0,0 +1,153 @@
+# app/risk_surface.py
+# Statewide counties x hours risk surface for the map.
+#
+# The surface is one dense float32 array (row = county, column = forecast hour) behind a small JSON
+# header with the county index, so the map can scrub through time after a single download.
+# It is rebuilt in the background only when its inputs (forecast versions, start hour, backend)
+# change, and the gzip-compressed body and ETags are computed once per build. The gzip and
+# identity bodies are different representations, so each has its own strong ETag.
+#
+# Wire format (little-endian):
+#   uint32 header length | JSON header | float32[counties * hours], row-major
+# NaN marks counties with no forecast.
+
+import gzip
+import hashlib
+import json
+import struct
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+
+RiskSurface = namedtuple(
+    "RiskSurface",
+    ["counties", "start", "values", "prediction_source", "fingerprint", "etag", "gzip_etag", "body", "gzip_body",
+     "generated_at"],
+)
+
+
+def encode_surface(counties, start, values, prediction_source, generated_at):
+    """
+    Serialize a surface to the wire format
+
+    Args:
+        counties (list): County names, one per row
+        start (str): ISO time of the first column
+        values (np.ndarray): (counties, hours) probabilities
+        prediction_source (str): Backend that produced the values
+        generated_at (str): ISO build time
+
+    Returns:
+        bytes: Uncompressed body
+    """
+    values = np.ascontiguousarray(values, dtype="<f4")
+    header = json.dumps({
+        "counties": list(counties),
+        "start": start,
+        "hours": int(values.shape[1]),
+        "step_hours": 1,
+        "dtype": "float32",
+        "shape": list(values.shape),
+        "prediction_source": prediction_source,
+        "generated_at": generated_at,
+    }).encode()
+    return struct.pack("<I", len(header)) + header + values.tobytes()
+
+
+def decode_surface(body):
+    """
+    Parse a body produced by encode_surface
+
+    Returns:
+        tuple: (header dict, (counties, hours) float32 array)
+    """
+    (header_length,) = struct.unpack_from("<I", body)
+    header = json.loads(body[4:4 + header_length])
+    values = np.frombuffer(body, dtype="<f4", offset=4 + header_length).reshape(header["shape"])
+    return header, values
+
+
+def build_surface(counties, start, values, prediction_source, fingerprint):
+    """Build an immutable surface with its compressed body and ETag"""
+    generated_at = datetime.now().isoformat()
+    body = encode_surface(counties, start, values, prediction_source, generated_at)
+    etag = hashlib.sha1(fingerprint.encode()).hexdigest()[:20]
+    return RiskSurface(
+        tuple(counties), start, values, prediction_source, fingerprint, etag, f"{etag}-gz",
+        body, gzip.compress(body, compresslevel=6), generated_at,
+    )
+
+
+class RiskSurfaceRefresher:
+    """
+    Rebuilds the risk surface in a background thread when its inputs change.
+
+    Args:
+        inputs (callable): () -> (fingerprint, state): a string identifying everything the
+            surface depends on, and the inputs it was computed from (e.g. the forecast entries)
+        compute (callable): state -> (counties, start, values, prediction_source); should score
+            the whole surface with a single batched model call
+        interval_seconds (float): How often the inputs are checked
+    """
+
+    def __init__(self, inputs, compute, interval_seconds=600):
+        self.inputs = inputs
+        self.compute = compute
+        self.interval_seconds = interval_seconds
+        self.build_count = 0
+        self.skip_count = 0
+        self.error_count = 0
+        self._surface = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def surface(self):
+        """Latest surface (a single attribute read; surfaces are never mutated)"""
+        return self._surface
+
+    def refresh(self):
+        """Rebuild the surface if its inputs changed since the last build"""
+        try:
+            fingerprint, state = self.inputs()
+            if self._surface is not None and self._surface.fingerprint == fingerprint:
+                self.skip_count += 1
+                return self._surface
+            counties, start, values, prediction_source = self.compute(state)
+            self._surface = build_surface(counties, start, values, prediction_source, fingerprint)
+            self.build_count += 1
+        except Exception as e:
+            self.error_count += 1
+            print(f"Error building risk surface: {e}")
+        return self._surface
+
+    def start(self):
+        """Build and keep refreshing in a daemon thread (the first build does not block the caller)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="risk-surface-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.refresh()
+        while not self._stop.wait(self.interval_seconds):
+            self.refresh()
+
+    def stats(self):
+        surface = self._surface
+        return {
+            "interval_seconds": self.interval_seconds,
+            "build_count": self.build_count,
+            "skip_count": self.skip_count,
+            "error_count": self.error_count,
+            "generated_at": surface.generated_at if surface else None,
+            "shape": list(surface.values.shape) if surface else None,
+            "body_bytes": len(surface.body) if surface else None,
+            "gzip_bytes": len(surface.gzip_body) if surface else None,
+        }
@@ -0,0 +1,120 @@
+# app/single_flight.py
+# Request coalescing for concurrent identical predictions.
+#
+# When many requests for the same (quantized) feature key arrive while a backend call for that key
+# is already running, they wait for that call and share its result instead of starting their own.
+
+import threading
+from collections import Counter
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same keys into one in-flight computation.
+
+    Args:
+        wait_timeout (float): Seconds a waiter blocks on another request's call before giving up
+        max_tracked_keys (int): Number of keys kept in the per-key waiter counters
+    """
+
+    def __init__(self, wait_timeout=30.0, max_tracked_keys=500):
+        self.wait_timeout = wait_timeout
+        self.max_tracked_keys = max_tracked_keys
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leader_keys = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self.waiters_by_key = Counter()
+
+    def do_many(self, keys, compute, label_of=None):
+        """
+        Resolve distinct keys, computing only those no other request is already computing
+
+        Args:
+            keys (list): Distinct keys
+            compute (callable): List of keys -> list of values (same order); called at most once
+            label_of (callable, optional): Key -> readable label for the per-key counters
+
+        Returns:
+            dict: key -> value
+        """
+        owned, joined = [], []
+        with self._lock:
+            for key in keys:
+                call = self._calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    owned.append((key, call))
+                else:
+                    call.waiters += 1
+                    joined.append((key, call))
+            self.leader_keys += len(owned)
+            self.coalesced += len(joined)
+
+        results = {}
+        if owned:
+            try:
+                values = compute([key for key, _ in owned])
+                for (key, call), value in zip(owned, values):
+                    call.result = value
+                    results[key] = value
+            except Exception as e:
+                for _, call in owned:
+                    call.error = e
+                raise
+            finally:
+                with self._lock:
+                    for key, call in owned:
+                        self._calls.pop(key, None)
+                        if call.waiters:
+                            self._record_waiters(key, call.waiters, label_of)
+                for _, call in owned:
+                    call.event.set()
+
+        for key, call in joined:
+            if not call.event.wait(self.wait_timeout):
+                raise TimeoutError("Timed out waiting for an in-flight prediction")
+            if call.error is not None:
+                raise call.error
+            results[key] = call.result
+
+        return results
+
+    def do(self, key, compute, label_of=None):
+        """Single-key form of do_many; compute takes no arguments"""
+        return self.do_many([key], lambda keys: [compute()], label_of)[key]
+
+    def _record_waiters(self, key, waiters, label_of):
+        # Called with the lock held
+        label = label_of(key) if label_of else key.hex()[:16] if isinstance(key, bytes) else str(key)
+        self.waiters_by_key[label] += waiters
+        self.max_waiters = max(self.max_waiters, waiters)
+        if len(self.waiters_by_key) > self.max_tracked_keys:
+            self.waiters_by_key = Counter(dict(self.waiters_by_key.most_common(self.max_tracked_keys // 2)))
+
+    def stats(self, top=10):
+        """Counters for monitoring; coalesced is the number of backend calls avoided"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "in_flight_waiters": sum(call.waiters for call in self._calls.values()),
+                "leader_keys": self.leader_keys,
+                "coalesced": self.coalesced,
+                "max_waiters": self.max_waiters,
+                "top_keys": [
+                    {"key": label, "waiters": count}
+                    for label, count in self.waiters_by_key.most_common(top)
+                ],
+            }
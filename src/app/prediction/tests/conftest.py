@@ -0,0 +1,11 @@
+# app/tests/conftest.py
+# The prediction modules import each other as flat siblings (as api.py does), so the tests run
+# with src/app/prediction on the import path.
+#
+# Usage:
+#   python -m pytest src/app/prediction/tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,129 @@
+# app/tests/test_circuit_breaker.py
+# CircuitBreaker state transitions with failures and latency scripted by FaultInjectingBigQueryClient.
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+from inference import FaultInjectingBigQueryClient
+
+
+JOB_CONFIG = SimpleNamespace(query_parameters=[
+    SimpleNamespace(name="weather_windGust", values=[60.0]),
+    SimpleNamespace(name="weather_windSpeed", values=[10.0]),
+])
+
+
+def backend_call(client):
+    return lambda timeout: list(client.query("SELECT 1", job_config=JOB_CONFIG, timeout=timeout).result())
+
+
+def make_breaker(client, **kwargs):
+    settings = dict(deadline_seconds=0.5, window_size=4, min_calls=4, error_rate_threshold=0.5,
+                    latency_threshold_seconds=0.4, probe_interval_seconds=0.05, max_workers=4)
+    settings.update(kwargs)
+    return CircuitBreaker(backend_call(client), **settings)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_healthy_backend_stays_closed():
+    client = FaultInjectingBigQueryClient(seed=0)
+    breaker = make_breaker(client)
+    for _ in range(10):
+        rows = breaker.call(backend_call(client))
+        assert len(rows) == 1
+    stats = breaker.stats()
+    assert stats["state"] == CLOSED
+    assert stats["trip_count"] == 0
+    assert stats["error_rate"] == 0
+
+
+def test_errors_trip_the_breaker_and_a_probe_closes_it():
+    client = FaultInjectingBigQueryClient(error_rate=1.0, seed=0)
+    # Long probe interval: the breaker stays open until the outage is over
+    breaker = make_breaker(client, probe_interval_seconds=0.3)
+    for _ in range(4):
+        with pytest.raises(RuntimeError, match="Injected BigQuery failure"):
+            breaker.call(backend_call(client))
+    assert breaker.state == OPEN
+    assert breaker.trip_count == 1
+
+    queries = len(client.queries)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(backend_call(client))
+    assert breaker.rejected_count == 1
+    assert len(client.queries) == queries  # rejected calls never reach the backend
+
+    client.error_rate = 0.0
+    assert wait_for(lambda: breaker.state == CLOSED)
+    assert breaker.probe_count >= 1
+    assert breaker.stats()["window_calls"] == 0
+    assert len(breaker.call(backend_call(client))) == 1
+
+
+def test_probe_failures_keep_the_breaker_open():
+    client = FaultInjectingBigQueryClient(error_rate=1.0, seed=0)
+    breaker = make_breaker(client)
+    for _ in range(4):
+        with pytest.raises(RuntimeError):
+            breaker.call(backend_call(client))
+    assert wait_for(lambda: breaker.probe_count >= 3)
+    assert breaker.state == OPEN
+    assert breaker.trip_count == 1
+    client.error_rate = 0.0
+    assert wait_for(lambda: breaker.state == CLOSED)
+
+
+def test_timeouts_trip_the_breaker():
+    client = FaultInjectingBigQueryClient(latency_seconds=1.0, seed=0)
+    breaker = make_breaker(client, deadline_seconds=0.05, probe_interval_seconds=60)
+    for _ in range(4):
+        with pytest.raises(TimeoutError):
+            breaker.call(backend_call(client))
+    assert breaker.state == OPEN
+    assert client.injected_timeouts + breaker.timeout_count >= 4
+
+
+def test_slow_calls_trip_on_p95_latency():
+    client = FaultInjectingBigQueryClient(latency_seconds=0.1, seed=0)
+    breaker = make_breaker(client, latency_threshold_seconds=0.08, probe_interval_seconds=60)
+    for _ in range(4):
+        breaker.call(backend_call(client))
+    assert breaker.state == OPEN
+    assert breaker.stats()["p95_latency_ms"] >= 80
+
+
+def test_saturated_pool_fails_fast():
+    release = threading.Event()
+
+    def hung(timeout):
+        # A backend that ignores its timeout
+        release.wait(5)
+
+    breaker = CircuitBreaker(hung, deadline_seconds=0.02, window_size=10, min_calls=10, max_workers=2,
+                             probe_interval_seconds=60)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            breaker.call(hung)
+    assert breaker.in_flight == 2
+
+    start = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(hung)
+    assert time.monotonic() - start < 0.02
+    assert breaker.saturated_count == 1
+
+    release.set()
+    assert wait_for(lambda: breaker.in_flight == 0)
+    assert breaker.call(lambda timeout: "ok") == "ok"
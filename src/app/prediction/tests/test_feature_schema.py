@@ -0,0 +1,81 @@
+# app/tests/test_feature_schema.py
+# FeatureSchema.encode (batch) must produce exactly the rows encode_one produces per record.
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from climatology import STATS, ClimatologyCube
+from feature_schema import FeatureSchema
+
+
+WEATHER_SPEC = [
+    ("weather_temperature", "temperature", None, 20.5),
+    ("weather_apparentTemperature", "apparentTemperature", "temperature", 20.5),
+    ("weather_windGust", "windGust", None, 25.9),
+    ("weather_windSpeed", "windSpeed", None, 9.26),
+    ("weather_transportWindSpeed", "transportWindSpeed", "windSpeed", 16.6),
+    ("weather_probabilityOfPrecipitation", "precipitationChance", None, 18.0),
+]
+COUNTIES = ["davidson", "knox", "shelby", "van_buren"]
+NOW = datetime(2026, 10, 18, 13, 30)
+
+RECORDS = [
+    {"county": "Davidson", "windGust": 55, "windSpeed": 40, "precipitationChance": 90, "alertCount": 2},
+    {"county": "shelby", "month": 4, "dayOfWeek": 2, "hour": 7, "severeAlert": True},
+    {"county": "Van Buren", "temperature": -3.5, "month": 7},
+    {"county": "Nowhere", "windSpeed": 12.25},
+    {"county": "knox", "month": 13},
+    {"county": "knox", "month": 0, "apparentTemperature": 11},
+    {"county": "davidson", "month": 12, "hour": 23, "dayOfWeek": 6},
+    {},
+]
+
+
+def get_season(month):
+    return {12: "winter", 1: "winter", 2: "winter", 3: "spring", 4: "spring", 5: "spring",
+            6: "summer", 7: "summer", 8: "summer"}.get(month, "fall")
+
+
+def make_cube():
+    # Distinct per county/day/feature values so a wrong lookup shows up
+    features = ["temperature", "windGust"]
+    cube = np.full((2, 366, len(features), len(STATS)), np.nan, dtype=np.float32)
+    cube[..., STATS.index("median")] = (np.arange(2)[:, None, None] * 1000 + np.arange(366)[None, :, None]
+                    + 0.25 * np.arange(len(features))[None, None, :])
+    return ClimatologyCube(cube, ["davidson", "knox"], features)
+
+
+@pytest.mark.parametrize("climatology", [None, make_cube()], ids=["static-defaults", "climatology"])
+@pytest.mark.parametrize("seasons", [["spring", "summer"], ["winter", "spring", "summer", "fall"]])
+def test_encode_matches_encode_one(climatology, seasons):
+    schema = FeatureSchema(WEATHER_SPEC, COUNTIES, seasons, get_season, climatology=climatology)
+    X = schema.encode(RECORDS, now=NOW)
+    assert X.shape == (len(RECORDS), len(schema))
+    for i, record in enumerate(RECORDS):
+        np.testing.assert_array_equal(X[i], schema.encode_one(record, now=NOW), err_msg=str(record))
+
+
+def test_out_of_range_months_have_no_season():
+    schema = FeatureSchema(WEATHER_SPEC, COUNTIES, ["winter", "summer"], get_season)
+    winter = schema.index["season_winter"]
+    X = schema.encode([{"month": 12}, {"month": 13}, {"month": 0}], now=NOW)
+    assert X[:, winter].tolist() == [1, 0, 0]
+    assert schema.encode_one({"month": 13}, now=NOW)[winter] == 0
+
+
+def test_encode_hourly_matches_encode():
+    schema = FeatureSchema(WEATHER_SPEC, COUNTIES, ["spring", "summer"], get_season)
+    times = np.arange(np.datetime64("2026-06-30T20", "h"), np.datetime64("2026-07-01T04", "h"))
+    gust = np.linspace(10, 80, len(times))
+    gust[3] = np.nan
+    hourly = schema.encode_hourly("knox", times, {"weather_windGust": gust})
+
+    records = []
+    for t, g in zip(times.astype(datetime), gust):
+        record = {"county": "knox", "month": t.month, "dayOfWeek": t.weekday(), "hour": t.hour}
+        if not np.isnan(g):
+            record["windGust"] = g
+        records.append(record)
+    np.testing.assert_allclose(hourly, schema.encode(records, now=NOW))
@@ -0,0 +1,69 @@
+# app/tests/test_gridpoint_stream.py
+# parse_gridpoint must decode exactly what json.loads decodes, projected to the wanted properties.
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from gridpoint_stream import parse_gridpoint
+from noaa_stub_server import stub_gridpoint_payload
+
+
+WANTED = ["windGust", "windSpeed", "temperature", "tricky"]
+
+
+def make_payload():
+    payload = stub_gridpoint_payload("OHX", 50, 57, datetime(2026, 10, 18, 6, tzinfo=timezone.utc), hours=24)
+    props = payload["properties"]
+    # Skipped and kept values with brackets and quotes inside strings, escapes, nesting and literals
+    props["geometryNote"] = {"text": 'a "quoted" ] } [ { string \\" with \\\\ escapes', "n": [[1, [2]], {}]}
+    props["tricky"] = {"values": [{"v": "]}", "w": [None, True, False, -1.5e-3]}, [], {"": "é☃"}]}
+    props["emptyList"] = []
+    props["validTimes"] = "2026-10-18T06:00:00+00:00/P7DT1H"
+    props["elevation"] = {"unitCode": "wmoUnit:m", "value": 182.88}
+    payload["id"] = "https://api.weather.gov/gridpoints/OHX/50,57"
+    payload["geometry"] = {"type": "Polygon", "coordinates": [[[-86.8, 36.1], [-86.7, 36.1]]]}
+    payload["@context"] = ["https://geojson.org/geojson-ld/geojson-context.jsonld", {"@version": "1.1"}]
+    return payload
+
+
+def reference(payload, properties):
+    # What parse_gridpoint promises: top-level scalars, wanted properties and scalar properties
+    projected = {key: value for key, value in payload.items() if not isinstance(value, (dict, list))}
+    projected["properties"] = {
+        prop: value for prop, value in payload["properties"].items()
+        if prop in properties or not isinstance(value, (dict, list))
+    }
+    return projected
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 4096, 1 << 20])
+def test_matches_json_loads(chunk_size, indent):
+    body = json.dumps(make_payload(), indent=indent, ensure_ascii=False).encode("utf-8")
+    expected = reference(json.loads(body), WANTED)
+    assert parse_gridpoint(chunked(body, chunk_size), WANTED) == expected
+
+
+def test_no_wanted_properties_keeps_scalar_metadata():
+    body = json.dumps(make_payload()).encode()
+    parsed = parse_gridpoint(chunked(body, 512), [])
+    assert parsed == reference(json.loads(body), [])
+    assert parsed["properties"]["updateTime"] == "2026-10-18T06:00:00+00:00"
+
+
+@pytest.mark.parametrize("body", [
+    b'{"properties": {"windGust": {"values": [1, 2',
+    b'{"properties": {"skipped": {"values": [1, 2]}',
+    b'{"properties": {"skipped": [1, 2}}}',
+    b'{"properties": {"windGust": 1,, "x": 2}}',
+    b'',
+])
+def test_malformed_bodies_raise_value_error(body):
+    with pytest.raises(ValueError):
+        parse_gridpoint(chunked(body, 5), ["windGust"])
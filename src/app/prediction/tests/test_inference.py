@@ -0,0 +1,90 @@
+# app/tests/test_inference.py
+# The ML.PREDICT query template and the offline BigQuery stand-in must keep rows in input order.
+
+import re
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from feature_schema import FeatureSchema
+from inference import (BigQueryMLBackend, LocalBigQueryClient, StandInForestModel, _StandInJob,
+                       build_predict_query)
+
+
+WEATHER_SPEC = [
+    ("weather_windGust", "windGust", None, 25.9),
+    ("weather_windSpeed", "windSpeed", None, 9.26),
+    ("weather_probabilityOfPrecipitation", "precipitationChance", None, 18.0),
+]
+
+
+def make_schema():
+    return FeatureSchema(WEATHER_SPEC, ["davidson", "knox"], ["summer"], lambda month: "summer")
+
+
+def job_config(schema, X):
+    # Stands in for bigquery.QueryJobConfig: ArrayQueryParameter objects expose .name and .values
+    params = [SimpleNamespace(name=name, values=X[:, i].tolist()) for i, name in enumerate(schema.names)]
+    return SimpleNamespace(query_parameters=params)
+
+
+def distinct_rows(schema):
+    # One row per (gust, speed, precip) band, so every row gets a different stand-in probability
+    records = [{"windGust": gust, "windSpeed": speed, "precipitationChance": precip}
+               for gust in (10, 40, 60) for speed in (10, 30) for precip in (10, 60, 90)]
+    return schema.encode(records)
+
+
+def test_query_selects_every_feature_in_schema_order():
+    schema = make_schema()
+    query = build_predict_query("project.dataset.model", schema)
+    aliases = re.findall(r"@(\w+)\[OFFSET\(row_id\)\] AS (\w+)", query)
+    assert [name for name, _ in aliases] == schema.names
+    assert all(param == alias for param, alias in aliases)
+    assert f"ARRAY_LENGTH(@{schema.names[0]})" in query
+    assert query.strip().endswith("ORDER BY row_id")
+
+
+def test_query_rejects_invalid_feature_names():
+    schema = FeatureSchema(WEATHER_SPEC + [("weather_wind-chill", "windChill", None, 0.0)],
+                           ["davidson"], [], lambda month: "summer")
+    with pytest.raises(ValueError, match="weather_wind-chill"):
+        build_predict_query("project.dataset.model", schema)
+
+
+def test_local_client_returns_rows_in_input_order():
+    schema = make_schema()
+    X = distinct_rows(schema)
+    client = LocalBigQueryClient()
+    rows = list(client.query(build_predict_query("m", schema), job_config=job_config(schema, X)).result())
+
+    expected = StandInForestModel()(schema.columns(X)).reshape(-1)
+    assert [row.row_id for row in rows] == list(range(len(X)))
+    probabilities = [next(p["prob"] for p in row.predicted_outage_occurred_probs if p["label"] == 1) for row in rows]
+    np.testing.assert_allclose(probabilities, expected, rtol=1e-6)
+    assert [row.predicted_outage_occurred for row in rows] == (expected > 0.5).astype(int).tolist()
+    assert len(client.queries) == 1
+
+
+class ShuffledClient:
+    """Returns the stand-in rows in a random order, as BigQuery may without ORDER BY"""
+
+    def __init__(self, seed):
+        self.inner = LocalBigQueryClient()
+        self.rng = np.random.default_rng(seed)
+
+    def query(self, query, job_config=None, timeout=None):
+        rows = list(self.inner.query(query, job_config, timeout).result())
+        return _StandInJob([rows[i] for i in self.rng.permutation(len(rows))])
+
+
+def test_bigquery_backend_restores_row_order():
+    pytest.importorskip("google.cloud.bigquery")
+    schema = make_schema()
+    X = distinct_rows(schema)
+    expected = StandInForestModel()(schema.columns(X)).reshape(-1)
+
+    is_outage_likely, probabilities = BigQueryMLBackend(ShuffledClient(0), "m", schema).predict_batch(X)
+    np.testing.assert_allclose(probabilities, expected, rtol=1e-6)
+    assert is_outage_likely.tolist() == (expected > 0.5).tolist()
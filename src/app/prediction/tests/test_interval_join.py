@@ -0,0 +1,92 @@
+# app/tests/test_interval_join.py
+# The sorted interval join in event_flags must agree with a brute-force scan of every event.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from interval_join import event_flags
+
+
+COUNTIES = ["Davidson", "Knox", "Shelby", "Van Buren"]
+TYPES = ["Flood", "Thunderstorm Wind", "Winter Storm"]
+
+
+def random_frames(seed, n_outages=300, n_events=80):
+    rng = np.random.default_rng(seed)
+    origin = pd.Timestamp("2024-01-01")
+
+    def times(n):
+        return origin + pd.to_timedelta(rng.integers(0, 30 * 24 * 3600, n), unit="s")
+
+    outages = pd.DataFrame({
+        "county": rng.choice(COUNTIES + ["Unknown"], n_outages),
+        "start_time": times(n_outages),
+    }, index=rng.permutation(n_outages) + 1000)
+    outages.loc[outages.index[::37], "start_time"] = pd.NaT
+
+    start = times(n_events)
+    events = pd.DataFrame({
+        "county": rng.choice(COUNTIES, n_events),
+        "Event Type": rng.choice(TYPES, n_events),
+        "start_time": start,
+        # Zero-length, short and multi-day events, so intervals nest and overlap
+        "end_time": start + pd.to_timedelta(rng.choice([0, 600, 6 * 3600, 3 * 86400], n_events), unit="s"),
+    })
+    events.loc[5, "end_time"] = pd.NaT
+    events.loc[6, "county"] = None
+    # An outage exactly on an event boundary counts as inside
+    outages.iloc[0] = [events.loc[0, "county"], events.loc[0, "start_time"]]
+    outages.iloc[1] = [events.loc[1, "county"], events.loc[1, "end_time"]]
+    return outages, events
+
+
+def brute_force(outages, events, column_of):
+    events = events.dropna(subset=["county", "start_time", "end_time"])
+    columns = {}
+    for event_type in pd.unique(events["Event Type"]):
+        columns.setdefault(column_of(event_type), set()).add(event_type)
+    expected = pd.DataFrame(False, index=outages.index, columns=list(columns))
+    for idx, outage in outages.iterrows():
+        if pd.isna(outage["start_time"]):
+            continue
+        for _, event in events.iterrows():
+            if (event["county"] == outage["county"]
+                    and event["start_time"] <= outage["start_time"] <= event["end_time"]):
+                for column, types in columns.items():
+                    if event["Event Type"] in types:
+                        expected.loc[idx, column] = True
+    return expected
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_brute_force(seed):
+    outages, events = random_frames(seed)
+    column_of = lambda event_type: f"event_{event_type}"
+    flags = event_flags(outages, events)
+    expected = brute_force(outages, events, column_of)
+    pd.testing.assert_frame_equal(flags[sorted(flags.columns)], expected[sorted(expected.columns)])
+    assert flags.loc[outages.index[:2]].any(axis=1).all()
+
+
+def test_combined_columns_match_brute_force():
+    outages, events = random_frames(3)
+    column_of = lambda event_type: "event_wind" if "Wind" in event_type or "Storm" in event_type else "event_other"
+    flags = event_flags(outages, events, column_of=column_of)
+    expected = brute_force(outages, events, column_of)
+    pd.testing.assert_frame_equal(flags[sorted(flags.columns)], expected[sorted(expected.columns)])
+
+
+def test_timezone_aware_times_match_naive():
+    outages, events = random_frames(4)
+    aware_outages = outages.assign(start_time=outages["start_time"].dt.tz_localize("UTC").dt.tz_convert("US/Central"))
+    aware_events = events.assign(start_time=events["start_time"].dt.tz_localize("UTC"),
+                                 end_time=events["end_time"].dt.tz_localize("UTC"))
+    pd.testing.assert_frame_equal(event_flags(aware_outages, aware_events), event_flags(outages, events))
+
+
+def test_no_events_gives_no_columns():
+    outages, events = random_frames(5)
+    flags = event_flags(outages, events.iloc[:0])
+    assert flags.shape == (len(outages), 0)
+    assert flags.index.equals(outages.index)
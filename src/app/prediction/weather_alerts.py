@@ -0,0 +1,137 @@
+# app/weather_alerts.py
+# Statewide weather alert ingestion.
+#
+# Active alerts for the whole state are fetched with one request and reduced to a table indexed
+# by county zone ("TNC037") with the alert count and a severe flag. Outage rows are then joined
+# to the table in one merge on the zone derived from their FIPS code, so the cost scales with
+# the number of zones rather than the number of rows.
+
+import pandas as pd
+import requests
+
+import noaa_client
+from noaa_fetcher import RateLimitedSession, iter_concurrent
+
+
+# Alert events that count as severe (matched as substrings, e.g. "Tornado Warning")
+SEVERE_ALERT_TYPES = ['Tornado', 'Severe Thunderstorm', 'Flood', 'Winter Storm']
+
+ALERT_COLUMNS = ['weather_alert_count', 'weather_severe_alert']
+
+
+def zone_ids_from_fips(fips):
+    """
+    County zone ids (NWS format 'TNC047') for a Series of FIPS codes, as in fetch_weather_alerts
+
+    Args:
+        fips (pd.Series): FIPS codes (int, float or str); missing values stay missing
+
+    Returns:
+        pd.Series: Zone ids aligned with fips
+    """
+    numeric = pd.to_numeric(fips, errors='coerce')
+    county_part = (numeric % 1000).astype('Int64').astype('string').str.zfill(3)
+    return ('TNC' + county_part).astype(object).where(numeric.notna(), None)
+
+
+def fetch_active_alerts(area='TN', session=None, base_url=noaa_client.NOAA_API_URL, timeout=30):
+    """
+    Fetch every active alert for a state with one request
+
+    Returns:
+        dict: Alerts GeoJSON (FeatureCollection)
+    """
+    http = session or requests
+    response = http.get(f"{base_url}/alerts/active", params={'area': area},
+                        headers=noaa_client.NOAA_HEADERS, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_zone_alerts(zone_ids, session=None, base_url=noaa_client.NOAA_API_URL, max_workers=8, timeout=30):
+    """
+    Fetch active alerts once per distinct zone (fallback when the statewide request fails)
+
+    Returns:
+        dict: Alerts GeoJSON with the features of every zone combined
+    """
+    session = session or RateLimitedSession(pool_size=max_workers)
+
+    def fetch(zone_id):
+        response = session.get(f"{base_url}/alerts/active/zone/{zone_id}",
+                               headers=noaa_client.NOAA_HEADERS, timeout=timeout)
+        response.raise_for_status()
+        return response.json().get('features', [])
+
+    features = []
+    for zone_id, zone_features, error in iter_concurrent(sorted(set(zone_ids)), fetch, max_workers):
+        if error is not None:
+            print(f"Error fetching alerts for zone {zone_id}: {error}")
+            continue
+        features.extend(zone_features)
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def alert_zone_table(alerts, state_prefix='TN', state_fips='47'):
+    """
+    Reduce an alerts FeatureCollection to one row per county zone
+
+    An alert is counted once per zone it covers, whether the zone appears as a county UGC code
+    ('TNC037') or as a SAME code ('047037'). Alerts repeated across zone responses (same id)
+    are counted once.
+
+    Args:
+        alerts (dict): Alerts GeoJSON
+        state_prefix (str): Two-letter state code used in zone ids
+        state_fips (str): State FIPS code used in SAME codes
+
+    Returns:
+        pd.DataFrame: Indexed by zone id, with weather_alert_count and weather_severe_alert
+    """
+    county_ugc = f"{state_prefix}C"
+    same_prefix = f"0{state_fips}"
+    records = []
+    for i, feature in enumerate((alerts or {}).get('features', [])):
+        props = feature.get('properties', {})
+        alert_id = props.get('id') or feature.get('id') or i
+        event = props.get('event') or ''
+        severe = any(t in event for t in SEVERE_ALERT_TYPES)
+        geocode = props.get('geocode') or {}
+        zones = {code for code in geocode.get('UGC', []) if code.startswith(county_ugc)}
+        zones.update(f"{county_ugc}{code[-3:]}" for code in geocode.get('SAME', []) if code.startswith(same_prefix))
+        records.extend((alert_id, zone, severe) for zone in zones)
+
+    if not records:
+        return pd.DataFrame(columns=ALERT_COLUMNS, index=pd.Index([], name='zone')).astype({
+            'weather_alert_count': 'int64', 'weather_severe_alert': 'bool'})
+
+    exploded = pd.DataFrame.from_records(records, columns=['alert_id', 'zone', 'severe']).drop_duplicates(['alert_id', 'zone'])
+    return exploded.groupby('zone').agg(
+        weather_alert_count=('alert_id', 'size'),
+        weather_severe_alert=('severe', 'any'),
+    )
+
+
+def join_alerts(df, zone_table, fips_column='fips'):
+    """
+    Add weather_alert_count / weather_severe_alert to every row in one vectorized join
+
+    Rows whose zone has no active alert get 0 / False.
+
+    Args:
+        df (pd.DataFrame): Frame with a FIPS column
+        zone_table (pd.DataFrame): Output of alert_zone_table
+        fips_column (str): Name of the FIPS column
+
+    Returns:
+        pd.DataFrame: df with the two alert columns set (index preserved)
+    """
+    df = df.drop(columns=[c for c in ALERT_COLUMNS if c in df.columns])
+    if fips_column not in df.columns:
+        zones = pd.Series(None, index=df.index, dtype=object)
+    else:
+        zones = zone_ids_from_fips(df[fips_column])
+    joined = zone_table.reindex(zones.to_numpy())
+    df['weather_alert_count'] = joined['weather_alert_count'].fillna(0).astype('int64').to_numpy()
+    df['weather_severe_alert'] = joined['weather_severe_alert'].fillna(False).astype(bool).to_numpy()
+    return df
@@ -0,0 +1,294 @@
+# app/weather_archive.py
+# Local archive of historical hourly weather, partitioned by county and year.
+#
+# The gridpoint endpoint only serves current forecasts, so history has to come from observation
+# files exported elsewhere. ingest_directory loads those files into a columnar store with one
+# directory per county and year: a sorted int64 hour index plus one float32 .npy file per weather
+# column. Reads memory-map a partition and slice it with searchsorted, so joining outages to the
+# weather at their hour is a range read rather than a network call.
+#
+# Layout:
+#   {root}/manifest.json
+#   {root}/{county}/{year}/hours.npy          (hours since 1970-01-01 UTC, sorted, unique)
+#   {root}/{county}/{year}/{column}.npy       (float32, aligned with hours.npy)
+#
+# Usage:
+#   python weather_archive.py SOURCE_DIR [--root data/weather_archive] [--time-column timestamp]
+#       [--county-column county] [--rename wind_speed=windSpeed ...]
+
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_ARCHIVE_PATH = os.environ.get("WEATHER_ARCHIVE_PATH", "data/weather_archive")
+
+HOUR = np.timedelta64(1, "h")
+
+
+def county_slug(county):
+    """Directory name of a county, e.g. "Van Buren" -> "van_buren" """
+    return re.sub(r"[^a-z0-9]+", "_", str(county).strip().lower()).strip("_")
+
+
+def _hours_since_epoch(times):
+    # datetime-like Series -> int64 hours (NaT becomes the minimum int64)
+    return times.to_numpy(dtype="datetime64[ns]").astype("datetime64[h]").astype(np.int64)
+
+
+def load_observation_file(path, time_column="timestamp", county_column="county", rename=None):
+    """
+    Load one observation file as hourly rows
+
+    Timestamps are converted to naive UTC (offsets honored) and floored to the hour; several
+    observations in the same county-hour are averaged. Every other column is coerced to a number
+    and columns with no numeric value are dropped.
+
+    Args:
+        path (str): CSV file (optionally compressed, e.g. .csv.gz)
+        time_column (str): Column holding observation times
+        county_column (str): Column holding county names
+        rename (dict, optional): Source column -> archive column (e.g. model property names)
+
+    Returns:
+        pd.DataFrame: county, timestamp and float32 weather columns
+    """
+    df = pd.read_csv(path)
+    if rename:
+        df = df.rename(columns=rename)
+    times = pd.to_datetime(df[time_column], utc=True, errors="coerce").dt.tz_convert(None).dt.floor("h")
+
+    values = df.drop(columns=[time_column, county_column]).apply(pd.to_numeric, errors="coerce")
+    values = values.loc[:, values.notna().any()].astype(np.float32)
+    values.insert(0, "timestamp", times)
+    values.insert(0, "county", df[county_column].astype(str).str.strip())
+    values = values[values["timestamp"].notna() & (values["county"] != "")]
+    return values.groupby(["county", "timestamp"], as_index=False).mean()
+
+
+class WeatherArchive:
+    """
+    Args:
+        root (str): Archive directory (created on first write)
+    """
+
+    def __init__(self, root=DEFAULT_ARCHIVE_PATH):
+        self.root = root
+        self._lock = threading.Lock()
+        try:
+            with open(os.path.join(root, "manifest.json")) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        self.columns = manifest.get("columns", [])
+        self.partitions = manifest.get("partitions", {})
+
+    def _partition_dir(self, slug, year):
+        return os.path.join(self.root, slug, str(year))
+
+    def _open(self, slug, year):
+        """Memory-mapped (hours, {column: values}) of a partition, or None if it does not exist"""
+        if f"{slug}/{year}" not in self.partitions:
+            return None
+        directory = self._partition_dir(slug, year)
+        hours = np.load(os.path.join(directory, "hours.npy"), mmap_mode="r")
+        columns = {
+            column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+            for column in self.partitions[f"{slug}/{year}"]["columns"]
+        }
+        return hours, columns
+
+    def write(self, frame):
+        """
+        Merge hourly rows into the archive
+
+        Rows for hours already archived replace the stored values of the columns they carry.
+
+        Args:
+            frame (pd.DataFrame): county, timestamp and numeric weather columns (see load_observation_file)
+
+        Returns:
+            int: Number of partitions written
+        """
+        value_columns = [c for c in frame.columns if c not in ("county", "timestamp")]
+        frame = frame.assign(slug=frame["county"].map(county_slug), year=frame["timestamp"].dt.year)
+        written = 0
+        for (slug, year), rows in frame.groupby(["slug", "year"]):
+            new = rows.set_index(_hours_since_epoch(rows["timestamp"]))[value_columns].astype(np.float32)
+            new = new.groupby(level=0).last()
+            existing = self._open(slug, year)
+            if existing is not None:
+                hours, columns = existing
+                old = pd.DataFrame({c: np.asarray(v) for c, v in columns.items()}, index=np.asarray(hours))
+                new = new.combine_first(old)
+            new = new.sort_index()
+            self._write_partition(slug, year, rows["county"].iloc[0], new)
+            written += 1
+        return written
+
+    def _write_partition(self, slug, year, county, table):
+        directory = self._partition_dir(slug, year)
+        os.makedirs(directory, exist_ok=True)
+        arrays = {"hours": table.index.to_numpy(dtype=np.int64)}
+        arrays.update((column, table[column].to_numpy(dtype=np.float32)) for column in table.columns)
+        for name, array in arrays.items():
+            # Write-then-rename so readers never see a torn file
+            path = os.path.join(directory, f"{name}.npy")
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, path)
+
+        hours = arrays["hours"].astype("datetime64[h]")
+        with self._lock:
+            self.partitions[f"{slug}/{year}"] = {
+                "county": county,
+                "year": int(year),
+                "rows": int(len(hours)),
+                "start": str(hours[0]),
+                "end": str(hours[-1]),
+                "columns": list(table.columns),
+            }
+            self.columns = sorted(set(self.columns) | set(table.columns))
+            self._save_manifest()
+
+    def _save_manifest(self):
+        # Called with the lock held
+        path = os.path.join(self.root, "manifest.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"columns": self.columns, "partitions": self.partitions}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def read(self, county, start, end, columns=None):
+        """
+        Hourly weather of a county between two times (inclusive)
+
+        Args:
+            county (str): County name
+            start, end (str or datetime-like): Range bounds, naive UTC
+            columns (list, optional): Columns to read; defaults to every archived column
+
+        Returns:
+            pd.DataFrame: timestamp plus one column per requested column (NaN where not archived)
+        """
+        columns = columns or self.columns
+        first = int(np.datetime64(pd.Timestamp(start), "h").astype(np.int64))
+        last = int(np.datetime64(pd.Timestamp(end), "h").astype(np.int64))
+        slug = county_slug(county)
+        frames = []
+        for year in range(pd.Timestamp(start).year, pd.Timestamp(end).year + 1):
+            partition = self._open(slug, year)
+            if partition is None:
+                continue
+            hours, stored = partition
+            lo, hi = np.searchsorted(hours, [first, last + 1])
+            data = {"timestamp": np.asarray(hours[lo:hi]).astype("datetime64[h]").astype("datetime64[ns]")}
+            for column in columns:
+                data[column] = np.asarray(stored[column][lo:hi]) if column in stored else np.full(hi - lo, np.nan, np.float32)
+            frames.append(pd.DataFrame(data))
+        if not frames:
+            return pd.DataFrame(columns=["timestamp"] + list(columns))
+        return pd.concat(frames, ignore_index=True)
+
+    def join_outages(self, outages, columns=None, time_column="start_time", county_column="county", tolerance_hours=1):
+        """
+        Attach the archived weather at each outage's hour
+
+        Each outage takes the latest archived hour at or before its start (within its year's
+        partition), if that hour is at most tolerance_hours old. Outages are grouped by county
+        and year, so every partition is opened once.
+
+        Args:
+            outages (pd.DataFrame): Outage rows with a county and a start time (naive UTC)
+            columns (list, optional): Weather columns to attach; defaults to every archived column
+            time_column (str): Outage start time column
+            county_column (str): County name column
+            tolerance_hours (int): Largest gap between the outage and the archived hour
+
+        Returns:
+            pd.DataFrame: outages with weather_{column} float32 columns, NaN where nothing matched
+        """
+        columns = columns or self.columns
+        times = pd.to_datetime(outages[time_column], errors="coerce")
+        hours = _hours_since_epoch(times)
+        keys = pd.DataFrame({"slug": outages[county_column].map(county_slug).to_numpy(), "year": times.dt.year.to_numpy()})
+        weather = {column: np.full(len(outages), np.nan, dtype=np.float32) for column in columns}
+
+        for (slug, year), rows in keys.groupby(["slug", "year"]).indices.items():
+            partition = self._open(slug, int(year))
+            if partition is None:
+                continue
+            part_hours, stored = partition
+            pos = np.searchsorted(part_hours, hours[rows], side="right") - 1
+            found = pos >= 0
+            found[found] &= hours[rows][found] - np.asarray(part_hours)[pos[found]] <= tolerance_hours
+            for column in columns:
+                if column in stored:
+                    weather[column][rows[found]] = np.asarray(stored[column])[pos[found]]
+
+        result = outages.copy()
+        for column in columns:
+            result[f"weather_{column}"] = weather[column]
+        return result
+
+    def stats(self):
+        return {
+            "partitions": len(self.partitions),
+            "counties": len({p["county"] for p in self.partitions.values()}),
+            "rows": sum(p["rows"] for p in self.partitions.values()),
+            "columns": len(self.columns),
+        }
+
+
+def ingest_directory(source_dir, archive=None, pattern="*.csv*", time_column="timestamp", county_column="county",
+                     rename=None):
+    """
+    Load every observation file in a directory into the archive
+
+    Args:
+        source_dir (str): Directory of observation files
+        archive (WeatherArchive, optional): Target archive; defaults to WEATHER_ARCHIVE_PATH
+        pattern (str): Glob of files to load
+        time_column, county_column, rename: See load_observation_file
+
+    Returns:
+        WeatherArchive: The archive written to
+    """
+    archive = archive or WeatherArchive()
+    paths = sorted(glob.glob(os.path.join(source_dir, pattern)))
+    for path in paths:
+        try:
+            frame = load_observation_file(path, time_column, county_column, rename)
+        except (OSError, KeyError, ValueError, pd.errors.ParserError) as err:
+            print(f"Error loading {path}: {err}")
+            continue
+        partitions = archive.write(frame)
+        print(f"Loaded {len(frame)} hourly rows from {path} into {partitions} partitions")
+    return archive
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load historical hourly weather observations into the local archive")
+    parser.add_argument("source_dir")
+    parser.add_argument("--root", default=DEFAULT_ARCHIVE_PATH)
+    parser.add_argument("--pattern", default="*.csv*")
+    parser.add_argument("--time-column", default="timestamp")
+    parser.add_argument("--county-column", default="county")
+    parser.add_argument("--rename", nargs="*", default=[], metavar="SOURCE=COLUMN")
+    args = parser.parse_args()
+
+    archive = ingest_directory(
+        args.source_dir,
+        WeatherArchive(args.root),
+        args.pattern,
+        args.time_column,
+        args.county_column,
+        dict(item.split("=", 1) for item in args.rename),
+    )
+    print(archive.stats())
@@ -0,0 +1,179 @@
+# app/weather_cache.py
+# Per-county cache of NOAA gridpoint forecasts.
+#
+# Requests read the cached payload and never wait on api.weather.gov once a county is warm.
+# A daemon thread revalidates every cached county each interval with If-None-Match /
+# If-Modified-Since, so an unchanged forecast costs a single 304 with no body.
+
+import threading
+import time
+from collections import namedtuple
+
+import requests
+
+import noaa_client
+from noaa_fetcher import RateLimitedSession, TokenBucket, iter_concurrent
+
+
+GridpointEntry = namedtuple(
+    "GridpointEntry",
+    ["url", "payload", "etag", "last_modified", "fetched_at", "validated_at"],
+)
+
+
+class GridpointCache:
+    """
+    Args:
+        coordinates (dict): County -> {"latitude", "longitude", ...} (see noaa_client.load_county_coordinates)
+        refresh_seconds (float): Time between background revalidations
+        base_url (str): NOAA API root (point at noaa_stub_server for local testing)
+        session (requests.Session, optional): Shared HTTP session; defaults to a rate-limited,
+            pooled session (see noaa_fetcher.py)
+        timeout (float): Per-request timeout in seconds
+        max_workers (int): Concurrent fetches during refresh / prefetch
+        requests_per_second (float): Rate limit of the default session
+        lookup (GridpointLookup, optional): Persistent point -> gridpoint table, so cold fetches
+            skip the /points request
+    """
+
+    def __init__(self, coordinates, refresh_seconds=600, base_url=noaa_client.NOAA_API_URL,
+                 session=None, timeout=30, max_workers=8, requests_per_second=5, lookup=None):
+        self.coordinates = coordinates
+        self.refresh_seconds = refresh_seconds
+        self.base_url = base_url
+        self.session = session or RateLimitedSession(TokenBucket(requests_per_second), pool_size=max_workers)
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.lookup = lookup
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.hits = 0
+        self.cold_fetches = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        self.updated = 0
+        self.errors = 0
+        self.last_error = None
+
+    def get(self, county):
+        """
+        Cached gridpoint entry for a county, fetched synchronously on first use
+
+        Returns:
+            GridpointEntry, or None if the county has no coordinates
+
+        Raises:
+            requests.exceptions.RequestException: if a cold fetch fails
+        """
+        entry = self._entries.get(county)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        if county not in self.coordinates:
+            return None
+        self.cold_fetches += 1
+        return self.refresh_county(county)
+
+    def peek(self, county):
+        """Cached gridpoint entry for a county, or None if it is not cached (never fetches)"""
+        entry = self._entries.get(county)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def refresh_county(self, county):
+        """Fetch or revalidate one county and store the result"""
+        entry = self._entries.get(county)
+        coords = self.coordinates[county]
+        now = time.time()
+        try:
+            if entry is None or entry.url is None:
+                if self.lookup is not None:
+                    url = self.lookup.gridpoint_url(
+                        coords["latitude"], coords["longitude"], self.session, self.base_url, self.timeout
+                    )
+                else:
+                    url = noaa_client.resolve_gridpoint_url(
+                        coords["latitude"], coords["longitude"], self.session, self.base_url, self.timeout
+                    )
+                response = noaa_client.get_gridpoint(url, self.session, timeout=self.timeout)
+            else:
+                url = entry.url
+                self.revalidations += 1
+                response = noaa_client.get_gridpoint(
+                    url, self.session, entry.etag, entry.last_modified, timeout=self.timeout
+                )
+        except requests.exceptions.RequestException as err:
+            if noaa_client.is_not_found(err):
+                # Gridpoint moved: forget the mapping so the next fetch resolves it again
+                self._forget_gridpoint(county)
+            raise
+
+        if response.not_modified:
+            self.not_modified += 1
+            entry = entry._replace(validated_at=now)
+        else:
+            self.updated += 1
+            entry = GridpointEntry(url, response.payload, response.etag, response.last_modified, now, now)
+        if response.redirected:
+            # Serve this payload, but resolve the gridpoint again on the next refresh
+            self._forget_gridpoint(county, keep_entry=True)
+            entry = entry._replace(url=None)
+        with self._lock:
+            self._entries[county] = entry
+        return entry
+
+    def _forget_gridpoint(self, county, keep_entry=False):
+        coords = self.coordinates[county]
+        if self.lookup is not None:
+            self.lookup.invalidate(coords["latitude"], coords["longitude"])
+        if not keep_entry:
+            with self._lock:
+                self._entries.pop(county, None)
+
+    def _refresh_many(self, counties):
+        for county, _, error in iter_concurrent(counties, self.refresh_county, self.max_workers):
+            if error is not None:
+                self.errors += 1
+                self.last_error = str(error)
+                print(f"Error refreshing weather for {county}: {error}")
+
+    def refresh(self):
+        """Revalidate every cached county concurrently; failures keep serving the previous payload"""
+        self._refresh_many(list(self._entries))
+
+    def prefetch(self, counties):
+        """Concurrently fetch counties that have coordinates but no cached entry yet"""
+        missing = [c for c in counties if c in self.coordinates and c not in self._entries]
+        self.cold_fetches += len(missing)
+        self._refresh_many(missing)
+
+    def start(self):
+        """Start the background revalidation thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="weather-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+
+    def stats(self):
+        return {
+            "counties_cached": len(self._entries),
+            "refresh_seconds": self.refresh_seconds,
+            "hits": self.hits,
+            "cold_fetches": self.cold_fetches,
+            "revalidations": self.revalidations,
+            "not_modified": self.not_modified,
+            "updated": self.updated,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
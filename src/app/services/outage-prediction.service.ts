@@ -1,7 +1,7 @@
 // src/app/services/outage-prediction.service.ts
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { Observable, map } from 'rxjs';
 
 export interface PredictionRequest {
   windDirection: number;
@@ -31,6 +31,44 @@ export interface PredictionResponse {
   risk_factors: RiskFactor[];
 }
 
+export interface BatchPredictionItem extends PredictionResponse {
+  county: string;
+  hour?: number;
+}
+
+export interface BatchPredictionResponse {
+  predictions: BatchPredictionItem[];
+  lastUpdated: string;
+  prediction_source: string;
+}
+
+export interface TimelineResponse {
+  county: string;
+  times: string[];
+  probability: number[];
+  outage_likely: boolean[];
+  peak: { time: string; probability: number };
+  peak_window: {
+    start: string;
+    end: string;
+    hours: number;
+    mean_probability: number;
+  };
+  forecastUpdated: string | null;
+  lastUpdated: string;
+  prediction_source: string;
+}
+
+export interface RiskSurface {
+  counties: string[];
+  start: string;
+  hours: number;
+  prediction_source: string;
+  generated_at: string;
+  // Row-major [county][hour]; NaN where a county has no forecast
+  values: Float32Array;
+}
+
 @Injectable({
   providedIn: 'root',
 })
@@ -43,6 +81,41 @@ export class OutagePredictionService {
     return this.http.post<PredictionResponse>(this.apiUrl, data);
   }
 
+  // Scores many counties/hours in one request; predictions come back in input order
+  predictOutageBatch(
+    records: PredictionRequest[]
+  ): Observable<BatchPredictionResponse> {
+    return this.http.post<BatchPredictionResponse>(`${this.apiUrl}/batch`, {
+      records,
+    });
+  }
+
+  // Hourly probability curve over the NOAA forecast horizon (~7 days) for one county
+  getTimeline(county: string, hours = 168): Observable<TimelineResponse> {
+    return this.http.get<TimelineResponse>(`${this.apiUrl}/timeline`, {
+      params: { county, hours },
+    });
+  }
+
+  // Statewide counties x hours surface in one download (see prediction/risk_surface.py)
+  getRiskSurface(): Observable<RiskSurface> {
+    return this.http
+      .get(`${this.apiUrl.replace(/\/predict$/, '')}/risk-surface`, {
+        responseType: 'arraybuffer',
+      })
+      .pipe(
+        map((buffer) => {
+          const headerLength = new DataView(buffer).getUint32(0, true);
+          const header = JSON.parse(
+            new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)),
+          );
+          // Copy so the float32 view is 4-byte aligned regardless of header length
+          const values = new Float32Array(buffer.slice(4 + headerLength));
+          return { ...header, values } as RiskSurface;
+        }),
+      );
+  }
+
   // Mock data method for testing without API
   getMockPrediction(): PredictionResponse {
     return {